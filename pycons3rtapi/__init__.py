@@ -4,14 +4,14 @@ pycons3rtapi
 :copyright: (c) 2018 by Jackpine Technologies Corporation.
 :license: ISC, see LICENSE for more details.
 
+
+Submodules are imported on first use so the cons3rt CLI only loads requests
+and pycons3rt for the commands that need them.  pycons3rtapi.cons3rtapi and
+the other submodules in __all__ still work after import pycons3rtapi.
 """
-from . import cons3rtapi
-from . import cons3rtclient
-from . import httpclient
-from . import pycons3rtlibs
-from . import cons3rtcli
-from . import cons3rtconfig
-from . import cons3rt
+import importlib
+import sys
+import types
 
 __title__ = 'pycons3rtapi'
 __all__ = [
@@ -21,5 +21,36 @@ __all__ = [
     'pycons3rtlibs',
     'cons3rtcli',
     'cons3rtconfig',
-    'cons3rt'
+    'cons3rt',
+    'cons3rtsync',
+    'cons3rtdaemon',
+    'cons3rtrecords',
+    'cons3rtwaiter',
+    'cons3rtlauncher',
+    'cons3rtscheduler',
+    'cons3rtpool',
+    'cons3rtsites',
+    'cons3rtusers',
+    'cons3rttracing',
+    'cons3rtmetrics'
 ]
+
+
+class LazyPackage(types.ModuleType):
+    """Package module that imports a submodule in __all__ when it is first accessed
+    """
+
+    def __getattr__(self, name):
+        if name not in self.__all__:
+            raise AttributeError('module {m} has no attribute {n}'.format(m=self.__name__, n=name))
+        module = importlib.import_module('.' + name, self.__name__)
+        setattr(self, name, module)
+        return module
+
+
+# Keep a reference to this module, Python 2 clears the globals of a module that is
+# garbage collected
+lazy_package = LazyPackage(__name__, __doc__)
+lazy_package.__dict__.update(sys.modules[__name__].__dict__)
+lazy_package.original_module = sys.modules[__name__]
+sys.modules[__name__] = lazy_package
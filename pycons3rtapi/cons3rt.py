@@ -9,12 +9,10 @@ setup -- configures
 
 """
 
+import os
 import sys
 import argparse
 
-from cons3rtconfig import manual_config
-from cons3rtcli import CloudspaceCli, ProjectCli, CloudCli, TeamCli
-
 # Commands for setting up the cons3rtapi configuration
 setup_command_options = [
     'setup',
@@ -24,6 +22,7 @@ setup_command_options = [
 
 # List of valid CLI commands
 valid_commands = setup_command_options + [
+    'daemon',
     'cloudspace',
     'project',
     'cloud',
@@ -34,35 +33,78 @@ valid_commands = setup_command_options + [
 valid_commands_str = 'Valid commands: {c}'.format(c=', '.join(valid_commands))
 
 
-def cloudspace_cli(args):
-    c = CloudspaceCli(args)
+# The CLI modules import requests and pycons3rt, which are slow to load, so
+# each command imports only what it needs
+
+def config_cli():
+    from cons3rtconfig import manual_config
+    return manual_config()
+
+
+def cloudspace_cli(args, c5t=None, stdout=None, stderr=None):
+    from cons3rtcli import CloudspaceCli
+    c = CloudspaceCli(args, c5t=c5t, stdout=stdout, stderr=stderr)
     if c.process_args():
         return 0
     return 1
 
 
-def project_cli(args):
-    c = ProjectCli(args)
+def project_cli(args, c5t=None, stdout=None, stderr=None):
+    from cons3rtcli import ProjectCli
+    c = ProjectCli(args, c5t=c5t, stdout=stdout, stderr=stderr)
     if c.process_args():
         return 0
     return 1
 
 
-def cloud_cli(args):
-    c = CloudCli(args)
+def cloud_cli(args, c5t=None, stdout=None, stderr=None):
+    from cons3rtcli import CloudCli
+    c = CloudCli(args, c5t=c5t, stdout=stdout, stderr=stderr)
     if c.process_args():
         return 0
     return 1
 
 
-def team_cli(args):
-    c = TeamCli(args)
+def team_cli(args, c5t=None, stdout=None, stderr=None):
+    from cons3rtcli import TeamCli
+    c = TeamCli(args, c5t=c5t, stdout=stdout, stderr=stderr)
     if c.process_args():
         return 0
     return 1
 
 
-def main():
+def daemon_cli(args):
+    from cons3rtdaemon import daemon_status, run_daemon, stop_daemon
+    if args.stop:
+        return stop_daemon()
+    elif args.status:
+        return daemon_status()
+    return run_daemon()
+
+
+def run_command(args, c5t=None, stdout=None, stderr=None):
+    """Runs a command that uses the CONS3RT API, in this process or in the daemon
+
+    :param args: (argparse.Namespace) parsed CLI args
+    :param c5t: (Cons3rtApi) API to use, one is created from your config file if None
+    :param stdout: (file) output stream, default sys.stdout
+    :param stderr: (file) status stream, default sys.stderr
+    :return: (int) exit code
+    """
+    if args.command == 'cloudspace':
+        return cloudspace_cli(args, c5t=c5t, stdout=stdout, stderr=stderr)
+    elif args.command == 'project':
+        return project_cli(args, c5t=c5t, stdout=stdout, stderr=stderr)
+    elif args.command == 'cloud':
+        return cloud_cli(args, c5t=c5t, stdout=stdout, stderr=stderr)
+    elif args.command == 'team':
+        return team_cli(args, c5t=c5t, stdout=stdout, stderr=stderr)
+    out = stdout if stdout else sys.stdout
+    out.write('Command is not yet supported: {c}\n'.format(c=args.command))
+    return 0
+
+
+def get_parser():
     parser = argparse.ArgumentParser(description='CONS3RT command line interface (CLI)')
     parser.add_argument('command', help='Command for the cons3rt CLI')
     parser.add_argument('--delete', help='Delete action relative to the command provided', action='store_true')
@@ -74,7 +116,20 @@ def main():
     parser.add_argument('--all', help='All action relative to the command provided', action='store_true')
     parser.add_argument('--id', help='ID relative to the command provided', required=False)
     parser.add_argument('--ids', help='List of IDs relative to the command provided', required=False)
-    args = parser.parse_args()
+    parser.add_argument('--parallel', help='Number of IDs to process at the same time', required=False, type=int)
+    parser.add_argument('--journal', help='Journal file to resume an interrupted delete or release of runs',
+                        required=False)
+    parser.add_argument('--output', help='Output format for list actions: table, json, jsonl, or csv',
+                        required=False, default='table')
+    parser.add_argument('--no_daemon', help='Run in this process even when the cons3rt daemon is running',
+                        action='store_true')
+    parser.add_argument('--stop', help='Stop the cons3rt daemon', action='store_true')
+    parser.add_argument('--status', help='Show the cons3rt daemon status', action='store_true')
+    return parser
+
+
+def main():
+    args = get_parser().parse_args()
 
     # Get the command
     command = args.command.strip()
@@ -83,18 +138,28 @@ def main():
         print('Invalid command found [{c}]\n'.format(c=command) + valid_commands_str)
 
     if args.command in setup_command_options:
-        manual_config()
-    elif args.command == 'cloudspace':
-        return cloudspace_cli(args)
-    elif args.command == 'project':
-        return project_cli(args)
-    elif args.command == 'cloud':
-        return cloud_cli(args)
-    elif args.command == 'team':
-        return team_cli(args)
-    else:
-        print('Command is not yet supported: {c}'.format(c=args.command))
-    return 0
+        return config_cli()
+    elif args.command == 'daemon':
+        return daemon_cli(args)
+
+    # The daemon runs in its own working directory, so a relative journal path is resolved
+    # here, the last --journal arg overrides the one given
+    argv = sys.argv[1:]
+    if args.journal:
+        args.journal = os.path.abspath(args.journal)
+        argv.append('--journal={j}'.format(j=args.journal))
+
+    # Use the daemon when it is running, otherwise run in this process
+    if not args.no_daemon:
+        from cons3rtdaemon import Cons3rtDaemonError, run_in_daemon
+        try:
+            exit_code = run_in_daemon(argv=argv)
+        except Cons3rtDaemonError as ex:
+            sys.stderr.write('ERROR: {e}\n'.format(e=str(ex)))
+            return 1
+        if exit_code is not None:
+            return exit_code
+    return run_command(args)
 
 
 if __name__ == '__main__':
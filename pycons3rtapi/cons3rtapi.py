@@ -1,21 +1,36 @@
 #!/usr/bin/env python
 
+import copy
 import json
 import logging
 import os
 import sys
+import threading
 import time
 
 from pycons3rt.logify import Logify
 
 from cons3rtclient import Cons3rtClient
-from pycons3rtlibs import RestUser, Cons3rtClientError, Cons3rtApiError
+from pycons3rtlibs import RestUser, Cons3rtClientError, Cons3rtApiError, Journal, RateLimiter, \
+    default_log_body_limit, default_max_workers, map_concurrently, truncate_body
 from cons3rtconfig import cons3rtapi_config_file
+from cons3rtrecords import CloudRecord, DeploymentRunRecord, ProjectRecord, TeamRecord, UserRecord, \
+    VirtualizationRealmRecord, to_records
+from cons3rttracing import trace_methods, untraced
+from httpclient import get_pool_gauges
+from cons3rtwaiter import DeploymentRunWaiter
 
 
 # Set up logger name for this module
 mod_logger = Logify.get_name() + '.pycons3rtapi.cons3rtapi'
 
+# Valid asset states and visibility values
+valid_asset_states = ['DEVELOPMENT', 'PUBLISHED', 'CERTIFIED', 'DEPRECATED', 'OFFLINE']
+valid_asset_visibility = ['OWNER', 'OWNING_PROJECT', 'TRUSTED_PROJECTS', 'COMMUNITY']
+
+# Deployment run statuses that no longer need to be released
+released_run_statuses = ['RELEASE_REQUESTED', 'RELEASING', 'RELEASED', 'CANCELED', 'COMPLETED']
+
 
 class Scenario(object):
 
@@ -80,10 +95,124 @@ class Cons3rtApi(object):
         self.config_file = config_file
         self.config_data = {}
         self.user_list = []
+        self.users_by_project = {}
+        self.project_apis = {}
+        self.project_apis_lock = threading.Lock()
+        self.log_body_limit = default_log_body_limit
+
+        # Cons3rtApi this is a project view of, see get_project_api
+        self.view_of = None
         if self.user is None:
             self.load_config()
         self.cons3rt_client = Cons3rtClient(base=self.url_base, user=self.user)
 
+    @untraced
+    def check_not_view(self, method_name):
+        """Raises when called on a project view, views are cached and shared between threads,
+        and share the HTTP client of the Cons3rtApi they were created from
+
+        :param method_name: (str) name of the method that changes settings
+        :return: None
+        :raises: Cons3rtApiError
+        """
+        if self.view_of is not None:
+            raise Cons3rtApiError('{m} cannot be called on the project view for project {p}, call it on the '
+                                  'Cons3rtApi the view was created from'.format(m=method_name, p=self.project))
+
+    def set_log_body_limit(self, limit):
+        """Sets the maximum number of characters of request and response bodies included
+        in logs and error messages, shared by the project views of this Cons3rtApi
+
+        :param limit: (int) maximum number of characters, None to include full bodies
+        :return: None
+        :raises: Cons3rtApiError when called on a project view
+        """
+        self.check_not_view('set_log_body_limit')
+        self.log_body_limit = limit
+        self.cons3rt_client.http_client.log_body_limit = limit
+
+    def warm_up(self, connections=1):
+        """Opens pooled connections to the site ahead of the first requests.  On cert-auth sites
+        this pays the TLS handshake up front, and the loaded cert is shared by every Cons3rtApi
+        in the process using the same cert file.
+
+        :param connections: (int) number of connections to open
+        :return: (int) number of pooled connections ready for requests
+        :raises: Cons3rtApiError
+        """
+        try:
+            return self.cons3rt_client.http_client.warm_up(rest_user=self.user, connections=connections)
+        except Cons3rtClientError:
+            _, ex, trace = sys.exc_info()
+            msg = '{n}: Unable to warm up connections to: {u}\n{e}'.format(
+                n=ex.__class__.__name__, u=self.url_base, e=str(ex))
+            raise Cons3rtApiError, msg, trace
+
+    def get_transfer_stats(self):
+        """Returns the bytes received on the wire and after decompression for responses
+        from the site, to check how much compression saves on slow links
+
+        :return: (dict) of responses, compressed_responses, bytes_received, bytes_decoded, and
+            not_modified
+        """
+        return self.cons3rt_client.http_client.get_stats()
+
+    @untraced
+    def set_tracer(self, tracer):
+        """Records each method call and HTTP request as a span, shared by the project views of
+        this Cons3rtApi
+
+        :param tracer: (Tracer) tracer, None to stop tracing
+        :return: None
+        :raises: Cons3rtApiError when called on a project view
+        """
+        self.check_not_view('set_tracer')
+        self.cons3rt_client.http_client.tracer = tracer
+
+    @untraced
+    def get_tracer(self):
+        # The client does not exist yet while the config is loaded in __init__
+        cons3rt_client = getattr(self, 'cons3rt_client', None)
+        if cons3rt_client is None:
+            return None
+        return cons3rt_client.http_client.tracer
+
+    @untraced
+    def set_metrics(self, metrics):
+        """Records request counts, latency, bytes, retries, cache lookups, and connection pool
+        use in a registry, shared by the project views of this Cons3rtApi
+
+        :param metrics: (MetricsRegistry) registry, None to stop recording
+        :return: None
+        :raises: Cons3rtApiError when called on a project view
+        """
+        self.check_not_view('set_metrics')
+        self.cons3rt_client.http_client.metrics = metrics
+        if metrics is not None:
+            metrics.add_collector(get_pool_gauges)
+
+    @untraced
+    def wait_before_retry(self, seconds, operation):
+        """Sleeps before a retry, counted in the retries of the current span and recorded
+        as a sleep span when tracing, and counted in the retries metric for the operation
+
+        :param seconds: (float) seconds to sleep
+        :param operation: (str) name of the operation being retried
+        :return: None
+        """
+        metrics = self.cons3rt_client.http_client.metrics
+        if metrics is not None:
+            metrics.inc('cons3rt_retries_total', labels={'operation': operation})
+        tracer = self.get_tracer()
+        if tracer is None:
+            time.sleep(seconds)
+            return
+        span = tracer.current_span()
+        if span is not None:
+            span.increment_attribute('retries')
+        with tracer.span('sleep', seconds=seconds):
+            time.sleep(seconds)
+
     def load_config(self):
         """Loads the default config file
 
@@ -91,6 +220,7 @@ class Cons3rtApi(object):
         :raises: Cons3rtApiError
         """
         log = logging.getLogger(self.cls_logger + '.load_config')
+        self.check_not_view('load_config')
         log.info('Loading pycons3rtapi configuration...')
 
         # Ensure the file_path file exists
@@ -170,6 +300,8 @@ class Cons3rtApi(object):
             raise Cons3rtApiError('A ReST API token was not found in config file: {f}'.format(f=self.config_file))
 
         log.info('Found {n} project/token pairs'.format(n=str(len(self.user_list))))
+        for rest_user in self.user_list:
+            self.users_by_project.setdefault(rest_user.project_name, rest_user)
 
         # Select the first user to use as the default
         self.user = self.user_list[0]
@@ -186,26 +318,49 @@ class Cons3rtApi(object):
         :raises: Cons3rtApiError
         """
         log = logging.getLogger(self.cls_logger + '.set_project_token')
+        self.check_not_view('set_project_token')
 
         # Ensure the project_name is a string
         if not isinstance(project_name, basestring):
             raise Cons3rtApiError('The arg project_name must be a string, found: {t}'.format(
                 t=project_name.__class__.__name__))
 
-        # Loop through the projects until the project matches
-        found = False
-        log.info('Attempting to set the project token pair for project: {p}'.format(p=project_name))
-        for rest_user in self.user_list:
-            log.debug('Checking if rest user matches project [{p}]: {u}'.format(p=project_name, u=str(rest_user)))
-            if rest_user.project_name == project_name:
-                log.info('Found matching rest user: {u}'.format(u=str(rest_user)))
-                self.user = rest_user
-                found = True
-                break
-        if found:
-            log.info('Set project to [{p}] and ReST API token: {t}'.format(p=self.user.project_name, t=self.user.token))
-        else:
+        rest_user = self.users_by_project.get(project_name)
+        if rest_user is None:
             log.warn('Matching ReST User not found for project: {p}'.format(p=project_name))
+            return
+        self.user = rest_user
+        if hasattr(self, 'cons3rt_client'):
+            self.cons3rt_client.set_user(rest_user)
+        log.info('Set project to [{p}] and ReST API token: {t}'.format(p=self.user.project_name, t=self.user.token))
+
+    def get_project_api(self, project_name):
+        """Returns a view of this Cons3rtApi that uses the token for a project, without
+        changing the project of this one.  Views share the connections, caches, and settings
+        of this Cons3rtApi, and are created once per project.  Views are shared between
+        threads, so methods that change the project or shared settings raise on a view.
+
+        :param project_name: (str) name of a project in the config data
+        :return: (Cons3rtApi)
+        :raises: Cons3rtApiError
+        """
+        if self.view_of is not None:
+            return self.view_of.get_project_api(project_name=project_name)
+        project_api = self.project_apis.get(project_name)
+        if project_api is not None:
+            return project_api
+        rest_user = self.users_by_project.get(project_name)
+        if rest_user is None:
+            raise Cons3rtApiError('ReST User not found for project: {p}'.format(p=project_name))
+        with self.project_apis_lock:
+            if project_name not in self.project_apis:
+                project_api = copy.copy(self)
+                project_api.user = rest_user
+                project_api.project = project_name
+                project_api.cons3rt_client = self.cons3rt_client.for_user(user=rest_user)
+                project_api.view_of = self
+                self.project_apis[project_name] = project_api
+            return self.project_apis[project_name]
 
     def get_asset_type(self, asset_type):
         """Translates the user-provided asset type to an actual ReST target
@@ -377,76 +532,146 @@ class Cons3rtApi(object):
         log.info('Allocated new Virtualization Realm ID {v} to Cloud ID: {c}'.format(v=str(vr_id), c=str(cloud_id)))
         return vr_id
 
-    def list_projects(self):
-        """Query CONS3RT to return a list of projects for the current user
+    def fetch_batch(self, fetch, ids, max_workers=default_max_workers):
+        """Calls the fetch method concurrently for each unique ID
 
-        :return: (list) of Project info
+        :param fetch: function that takes a single ID and returns its details
+        :param ids: (iterable) of IDs, repeated IDs are only fetched once
+        :param max_workers: (int) maximum number of concurrent requests
+        :return: (dict) with keys: results (dict of ID to details), and errors (dict of ID to error message)
         """
-        log = logging.getLogger(self.cls_logger + '.list_projects')
-        log.info('Attempting to list all user projects...')
-        projects = []
+        log = logging.getLogger(self.cls_logger + '.fetch_batch')
+
+        # De-duplicate the IDs, treating '123' and 123 as the same ID
+        unique_ids = []
+        seen = set()
+        for an_id in ids:
+            try:
+                an_id = int(an_id)
+            except (TypeError, ValueError):
+                pass
+            if an_id in seen:
+                continue
+            seen.add(an_id)
+            unique_ids.append(an_id)
+
+        log.info('Fetching details for {n} IDs with up to {w} concurrent requests'.format(
+            n=str(len(unique_ids)), w=str(max_workers)))
+        batch = {'results': {}, 'errors': {}}
+        for an_id, result, ex in map_concurrently(fetch, unique_ids, max_workers=max_workers):
+            if ex is None:
+                batch['results'][an_id] = result
+            else:
+                batch['errors'][an_id] = '{n}: {e}'.format(n=ex.__class__.__name__, e=str(ex))
+        log.info('Fetched details for {n} IDs with {e} errors'.format(
+            n=str(len(batch['results'])), e=str(len(batch['errors']))))
+        return batch
+
+    def iter_projects(self, fields=None, as_records=False):
+        """Query CONS3RT for projects for the current user, yielding each project as its page arrives
+
+        :param fields: (tuple) of keys to keep in each record, None for all keys
+        :param as_records: (bool) set True to return compact records instead of dicts
+        :return: (generator) of Project info
+        """
+        log = logging.getLogger(self.cls_logger + '.iter_projects')
         page_num = 0
         max_results = 40
         while True:
-            log.debug('Attempting to list projects for user: {u}, page: {p}, max results: {m}'.format(
-                u=self.user.username, p=str(page_num), m=str(max_results)))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Attempting to list projects for user: {u}, page: {p}, max results: {m}'.format(
+                    u=self.user.username, p=str(page_num), m=str(max_results)))
             try:
                 page_of_projects = self.cons3rt_client.list_projects(
                     max_results=max_results,
-                    page_num=page_num
+                    page_num=page_num,
+                    fields=fields
                 )
             except Cons3rtClientError:
                 _, ex, trace = sys.exc_info()
                 msg = 'There was a problem querying CONS3RT for a list of projects\n{e}'.format(e=str(ex))
                 raise Cons3rtClientError, msg, trace
-            projects += page_of_projects
+            if as_records:
+                page_of_projects = to_records(ProjectRecord, page_of_projects)
+            for project in page_of_projects:
+                yield project
             if len(page_of_projects) < max_results:
                 break
             else:
                 page_num += 1
+
+    def list_projects(self, fields=None, as_records=False):
+        """Query CONS3RT to return a list of projects for the current user
+
+        :param fields: (tuple) of keys to keep in each record, None for all keys
+        :param as_records: (bool) set True to return compact records instead of dicts
+        :return: (list) of Project info
+        """
+        log = logging.getLogger(self.cls_logger + '.list_projects')
+        log.info('Attempting to list all user projects...')
+        projects = list(self.iter_projects(fields=fields, as_records=as_records))
         log.info('Found {n} user projects'.format(n=str(len(projects))))
         return projects
 
-    def list_expanded_projects(self):
-        """Query CONS3RT to return a list of projects the current user is not a member of
+    def iter_expanded_projects(self, fields=None, as_records=False):
+        """Query CONS3RT for projects the current user is not a member of, yielding each project as
+        its page arrives
 
-        :return: (list) of Project info
+        :param fields: (tuple) of keys to keep in each record, None for all keys
+        :param as_records: (bool) set True to return compact records instead of dicts
+        :return: (generator) of Project info
         """
-        log = logging.getLogger(self.cls_logger + '.list_expanded_projects')
-        log.info('Attempting to list expanded projects...')
-        projects = []
+        log = logging.getLogger(self.cls_logger + '.iter_expanded_projects')
         page_num = 0
         max_results = 40
         while True:
-            log.debug('Attempting to list non-member projects for user: {u}, page: {p}, max results: {m}'.format(
-                u=self.user.username, p=str(page_num), m=str(max_results)))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Attempting to list non-member projects for user: {u}, page: {p}, max results: {m}'.format(
+                    u=self.user.username, p=str(page_num), m=str(max_results)))
             try:
                 page_of_projects = self.cons3rt_client.list_expanded_projects(
                     max_results=max_results,
-                    page_num=page_num
+                    page_num=page_num,
+                    fields=fields
                 )
             except Cons3rtClientError:
                 _, ex, trace = sys.exc_info()
                 msg = 'There was a problem querying CONS3RT for a list of expanded projects\n{e}'.format(e=str(ex))
                 raise Cons3rtClientError, msg, trace
-            projects += page_of_projects
+            if as_records:
+                page_of_projects = to_records(ProjectRecord, page_of_projects)
+            for project in page_of_projects:
+                yield project
             if len(page_of_projects) < max_results:
                 break
             else:
                 page_num += 1
+
+    def list_expanded_projects(self, fields=None, as_records=False):
+        """Query CONS3RT to return a list of projects the current user is not a member of
+
+        :param fields: (tuple) of keys to keep in each record, None for all keys
+        :param as_records: (bool) set True to return compact records instead of dicts
+        :return: (list) of Project info
+        """
+        log = logging.getLogger(self.cls_logger + '.list_expanded_projects')
+        log.info('Attempting to list expanded projects...')
+        projects = list(self.iter_expanded_projects(fields=fields, as_records=as_records))
         log.info('Found {n} non-member projects'.format(n=str(len(projects))))
         return projects
 
-    def list_all_projects(self):
+    def list_all_projects(self, fields=None, as_records=False):
         """Query CONS3RT to return a list of all projects on the site
 
+        :param fields: (tuple) of keys to keep in each record, None for all keys
+        :param as_records: (bool) set True to return compact records instead of dicts
         :return: (list) of Project info
         """
         log = logging.getLogger(self.cls_logger + '.list_all_projects')
         log.info('Attempting to list all projects...')
         try:
-            member_projects = self.list_projects()
-            non_member_projects = self.list_expanded_projects()
+            member_projects = self.list_projects(fields=fields, as_records=as_records)
+            non_member_projects = self.list_expanded_projects(fields=fields, as_records=as_records)
         except Cons3rtClientError:
             _, ex, trace = sys.exc_info()
             msg = 'There was a problem querying CONS3RT for a list of projects\n{e}'.format(e=str(ex))
@@ -518,10 +743,12 @@ class Cons3rtApi(object):
         # Return the list of IDs
         return project_id_list
 
-    def list_projects_in_virtualization_realm(self, vr_id):
+    def list_projects_in_virtualization_realm(self, vr_id, fields=None, as_records=False):
         """Queries CONS3RT for a list of projects in the virtualization realm
 
         :param vr_id: (int) virtualization realm ID
+        :param fields: (tuple) of keys to keep in each record, None for all keys
+        :param as_records: (bool) set True to return compact records instead of dicts
         :return: (list) of projects
         :raises: Cons3rtApiError
         """
@@ -540,13 +767,15 @@ class Cons3rtApi(object):
         page_num = 0
         max_results = 40
         while True:
-            log.debug('Attempting to list projects in virtualization realm ID: {i}, page: {p}, max results: {m}'.format(
-                i=str(vr_id), p=str(page_num), m=str(max_results)))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Attempting to list projects in virtualization realm ID: {i}, '
+                          'page: {p}, max results: {m}'.format(i=str(vr_id), p=str(page_num), m=str(max_results)))
             try:
                 page_of_projects = self.cons3rt_client.list_projects_in_virtualization_realm(
                     vr_id=vr_id,
                     max_results=max_results,
-                    page_num=page_num
+                    page_num=page_num,
+                    fields=fields
                 )
             except Cons3rtClientError:
                 _, ex, trace = sys.exc_info()
@@ -554,6 +783,8 @@ class Cons3rtApi(object):
                       'page: {p}, max results: {m}\n{e}'.format(i=str(vr_id), p=str(page_num), m=str(max_results),
                                                                 e=str(ex))
                 raise Cons3rtClientError, msg, trace
+            if as_records:
+                page_of_projects = to_records(ProjectRecord, page_of_projects)
             projects += page_of_projects
             if len(page_of_projects) < max_results:
                 break
@@ -562,59 +793,212 @@ class Cons3rtApi(object):
         log.info('Found {n} projects in virtualization realm ID: {i}'.format(n=str(len(projects)), i=str(vr_id)))
         return projects
 
-    def list_clouds(self):
-        """Query CONS3RT to return a list of the currently configured Clouds
+    def add_project_to_virtualization_realm(self, vr_id, project_id):
+        """Adds a project to a virtualization realm
 
-        :return: (list) of Cloud Info
+        :param vr_id: (int) virtualization realm ID
+        :param project_id: (int) project ID
+        :return: None
         :raises: Cons3rtApiError
         """
-        log = logging.getLogger(self.cls_logger + '.list_clouds')
-        log.info('Attempting to list clouds...')
-        clouds = []
+        log = logging.getLogger(self.cls_logger + '.add_project_to_virtualization_realm')
+        try:
+            self.cons3rt_client.add_project_to_virtualization_realm(vr_id=vr_id, project_id=project_id)
+        except Cons3rtClientError:
+            _, ex, trace = sys.exc_info()
+            msg = '{n}: Unable to add project ID {p} to virtualization realm ID: {i}\n{e}'.format(
+                n=ex.__class__.__name__, p=str(project_id), i=str(vr_id), e=str(ex))
+            raise Cons3rtApiError, msg, trace
+        log.info('Added project ID {p} to virtualization realm ID: {i}'.format(p=str(project_id), i=str(vr_id)))
+
+    def remove_project_from_virtualization_realm(self, vr_id, project_id):
+        """Removes a project from a virtualization realm
+
+        :param vr_id: (int) virtualization realm ID
+        :param project_id: (int) project ID
+        :return: None
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.remove_project_from_virtualization_realm')
+        try:
+            self.cons3rt_client.remove_project_from_virtualization_realm(vr_id=vr_id, project_id=project_id)
+        except Cons3rtClientError:
+            _, ex, trace = sys.exc_info()
+            msg = '{n}: Unable to remove project ID {p} from virtualization realm ID: {i}\n{e}'.format(
+                n=ex.__class__.__name__, p=str(project_id), i=str(vr_id), e=str(ex))
+            raise Cons3rtApiError, msg, trace
+        log.info('Removed project ID {p} from virtualization realm ID: {i}'.format(p=str(project_id), i=str(vr_id)))
+
+    def plan_virtualization_realm_projects(self, desired, remove_extra=True, max_workers=default_max_workers):
+        """Compares the projects in each virtualization realm to the desired projects
+
+        :param desired: (dict) of VR ID to a list of the project IDs that should be in the VR
+        :param remove_extra: (bool) set False to only add projects, leaving other projects in the VRs
+        :param max_workers: (int) maximum number of concurrent requests
+        :return: (dict) with keys: changes (list of dicts with keys: vr_id, add, and remove,
+            for VRs that need changes), and errors (dict of VR ID to error message for VRs
+            whose projects could not be listed)
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.plan_virtualization_realm_projects')
+        try:
+            wanted = dict((int(vr_id), set(int(p) for p in project_ids)) for vr_id, project_ids in desired.iteritems())
+        except (AttributeError, TypeError, ValueError):
+            raise Cons3rtApiError('desired must be a dict of Integer VR IDs to lists of Integer project IDs')
+
+        batch = self.fetch_batch(
+            fetch=lambda vr_id: self.list_projects_in_virtualization_realm(vr_id=vr_id, fields=('id',)),
+            ids=sorted(wanted.keys()),
+            max_workers=max_workers
+        )
+        plan = {'changes': [], 'errors': batch['errors']}
+        for vr_id in sorted(batch['results'].keys()):
+            current = set(project['id'] for project in batch['results'][vr_id])
+            add = sorted(wanted[vr_id] - current)
+            remove = sorted(current - wanted[vr_id]) if remove_extra else []
+            if add or remove:
+                plan['changes'].append({'vr_id': vr_id, 'add': add, 'remove': remove})
+        log.info('Planned {a} project adds and {r} project removes in {n} virtualization realms'.format(
+            a=str(sum(len(c['add']) for c in plan['changes'])), r=str(sum(len(c['remove']) for c in plan['changes'])),
+            n=str(len(plan['changes']))))
+        return plan
+
+    def reconcile_virtualization_realm_projects(self, desired, dry_run=False, remove_extra=True,
+                                                max_workers=default_max_workers, rate_per_sec=None):
+        """Adds and removes projects so each virtualization realm has the desired projects,
+        making only the changes needed
+
+        :param desired: (dict) of VR ID to a list of the project IDs that should be in the VR
+        :param dry_run: (bool) set True to return the plan without making changes
+        :param remove_extra: (bool) set False to only add projects, leaving other projects in the VRs
+        :param max_workers: (int) maximum number of concurrent requests
+        :param rate_per_sec: (float) maximum changes per second, None for no limit
+        :return: (dict) plan from plan_virtualization_realm_projects, with keys applied (list of
+            (action, VR ID, project ID) tuples that succeeded) and failed (list of (action, VR ID,
+            project ID, error message) tuples) added when dry_run is False
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.reconcile_virtualization_realm_projects')
+        plan = self.plan_virtualization_realm_projects(
+            desired=desired, remove_extra=remove_extra, max_workers=max_workers)
+        if dry_run:
+            for change in plan['changes']:
+                log.info('Dry run, virtualization realm ID {i} would add projects {a} and remove projects {r}'.format(
+                    i=str(change['vr_id']), a=str(change['add']), r=str(change['remove'])))
+            return plan
+
+        operations = []
+        for change in plan['changes']:
+            operations += [('add', change['vr_id'], project_id) for project_id in change['add']]
+            operations += [('remove', change['vr_id'], project_id) for project_id in change['remove']]
+        rate_limiter = RateLimiter(rate_per_sec=rate_per_sec)
+
+        def apply_change(operation):
+            action, vr_id, project_id = operation
+            rate_limiter.acquire()
+            if action == 'add':
+                self.add_project_to_virtualization_realm(vr_id=vr_id, project_id=project_id)
+            else:
+                self.remove_project_from_virtualization_realm(vr_id=vr_id, project_id=project_id)
+
+        plan['applied'] = []
+        plan['failed'] = []
+        for operation, _, ex in map_concurrently(apply_change, operations, max_workers=max_workers):
+            if ex is None:
+                plan['applied'].append(operation)
+            else:
+                plan['failed'].append(operation + ('{n}: {e}'.format(n=ex.__class__.__name__, e=str(ex)),))
+        log.info('Applied {a} of {n} project changes to virtualization realms'.format(
+            a=str(len(plan['applied'])), n=str(len(operations))))
+        return plan
+
+    def iter_clouds(self, fields=None, as_records=False):
+        """Query CONS3RT for the currently configured Clouds, yielding each Cloud as its page arrives
+
+        :param fields: (tuple) of keys to keep in each record, None for all keys
+        :param as_records: (bool) set True to return compact records instead of dicts
+        :return: (generator) of Cloud Info
+        :raises: Cons3rtClientError
+        """
+        log = logging.getLogger(self.cls_logger + '.iter_clouds')
         page_num = 0
         max_results = 40
         while True:
-            log.debug('Attempting to list clouds with {m} max results for page number: {p}'.format(
-                m=str(max_results), p=str(page_num)))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Attempting to list clouds with {m} max results for page number: {p}'.format(
+                    m=str(max_results), p=str(page_num)))
             try:
-                page_of_clouds = self.cons3rt_client.list_clouds(max_results=max_results, page_num=page_num)
+                page_of_clouds = self.cons3rt_client.list_clouds(
+                    max_results=max_results, page_num=page_num, fields=fields)
             except Cons3rtClientError:
                 _, ex, trace = sys.exc_info()
                 msg = 'Unable to query CONS3RT for a list of Clouds\n{e}'.format(e=str(ex))
                 raise Cons3rtClientError, msg, trace
-            clouds += page_of_clouds
+            if as_records:
+                page_of_clouds = to_records(CloudRecord, page_of_clouds)
+            for cloud in page_of_clouds:
+                yield cloud
             if len(page_of_clouds) < max_results:
                 break
             else:
                 page_num += 1
+
+    def list_clouds(self, fields=None, as_records=False):
+        """Query CONS3RT to return a list of the currently configured Clouds
+
+        :param fields: (tuple) of keys to keep in each record, None for all keys
+        :param as_records: (bool) set True to return compact records instead of dicts
+        :return: (list) of Cloud Info
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.list_clouds')
+        log.info('Attempting to list clouds...')
+        clouds = list(self.iter_clouds(fields=fields, as_records=as_records))
         log.info('Found {n} clouds'.format(n=str(len(clouds))))
         return clouds
 
-    def list_teams(self):
-        """Query CONS3RT to return a list of Teams
+    def iter_teams(self, fields=None, as_records=False):
+        """Query CONS3RT for Teams, yielding each Team as its page arrives
 
-        :return: (list) of Team Info
-        :raises: Cons3rtApiError
+        :param fields: (tuple) of keys to keep in each record, None for all keys
+        :param as_records: (bool) set True to return compact records instead of dicts
+        :return: (generator) of Team Info
+        :raises: Cons3rtClientError
         """
-        log = logging.getLogger(self.cls_logger + '.list_teams')
-        log.info('Attempting to list teams...')
-        teams = []
+        log = logging.getLogger(self.cls_logger + '.iter_teams')
         page_num = 0
         max_results = 40
         while True:
-            log.debug('Attempting to list teams with {m} max results for page number: {p}'.format(
-                m=str(max_results), p=str(page_num)))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Attempting to list teams with {m} max results for page number: {p}'.format(
+                    m=str(max_results), p=str(page_num)))
             try:
-                page_of_teams = self.cons3rt_client.list_teams(max_results=max_results, page_num=page_num)
+                page_of_teams = self.cons3rt_client.list_teams(
+                    max_results=max_results, page_num=page_num, fields=fields)
             except Cons3rtClientError:
                 _, ex, trace = sys.exc_info()
                 msg = 'Unable to query CONS3RT for a list of Teams\n{e}'.format(e=str(ex))
                 raise Cons3rtClientError, msg, trace
-            teams += page_of_teams
+            if as_records:
+                page_of_teams = to_records(TeamRecord, page_of_teams)
+            for team in page_of_teams:
+                yield team
             if len(page_of_teams) < max_results:
                 break
             else:
                 page_num += 1
+
+    def list_teams(self, fields=None, as_records=False):
+        """Query CONS3RT to return a list of Teams
+
+        :param fields: (tuple) of keys to keep in each record, None for all keys
+        :param as_records: (bool) set True to return compact records instead of dicts
+        :return: (list) of Team Info
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.list_teams')
+        log.info('Attempting to list teams...')
+        teams = list(self.iter_teams(fields=fields, as_records=as_records))
         log.info('Found {n} teams'.format(n=str(len(teams))))
         return teams
 
@@ -652,6 +1036,19 @@ class Cons3rtApi(object):
             raise Cons3rtApiError, msg, trace
         return team_details
 
+    def get_team_details_batch(self, team_ids, max_workers=default_max_workers):
+        """Query CONS3RT concurrently for details of each team ID
+
+        :param team_ids: (iterable) of team IDs, repeated IDs are only queried once
+        :param max_workers: (int) maximum number of concurrent requests
+        :return: (dict) with keys: results (dict of ID to details), and errors (dict of ID to error message)
+        """
+        return self.fetch_batch(
+            fetch=lambda an_id: self.get_team_details(team_id=an_id),
+            ids=team_ids,
+            max_workers=max_workers
+        )
+
     def get_system_details(self, system_id):
         """Query CONS3RT to retrieve system details
 
@@ -678,6 +1075,19 @@ class Cons3rtApi(object):
             raise Cons3rtApiError, msg, trace
         return system_details
 
+    def get_system_details_batch(self, system_ids, max_workers=default_max_workers):
+        """Query CONS3RT concurrently for details of each system ID
+
+        :param system_ids: (iterable) of system IDs, repeated IDs are only queried once
+        :param max_workers: (int) maximum number of concurrent requests
+        :return: (dict) with keys: results (dict of ID to details), and errors (dict of ID to error message)
+        """
+        return self.fetch_batch(
+            fetch=lambda an_id: self.get_system_details(system_id=an_id),
+            ids=system_ids,
+            max_workers=max_workers
+        )
+
     def list_scenarios(self):
         """Query CONS3RT to return a list of Scenarios
 
@@ -720,6 +1130,19 @@ class Cons3rtApi(object):
             raise Cons3rtApiError, msg, trace
         return scenario_details
 
+    def get_scenario_details_batch(self, scenario_ids, max_workers=default_max_workers):
+        """Query CONS3RT concurrently for details of each scenario ID
+
+        :param scenario_ids: (iterable) of scenario IDs, repeated IDs are only queried once
+        :param max_workers: (int) maximum number of concurrent requests
+        :return: (dict) with keys: results (dict of ID to details), and errors (dict of ID to error message)
+        """
+        return self.fetch_batch(
+            fetch=lambda an_id: self.get_scenario_details(scenario_id=an_id),
+            ids=scenario_ids,
+            max_workers=max_workers
+        )
+
     def list_deployments(self):
         """Query CONS3RT to return a list of Deployments
 
@@ -762,6 +1185,19 @@ class Cons3rtApi(object):
             raise Cons3rtApiError, msg, trace
         return deployment_details
 
+    def get_deployment_details_batch(self, deployment_ids, max_workers=default_max_workers):
+        """Query CONS3RT concurrently for details of each deployment ID
+
+        :param deployment_ids: (iterable) of deployment IDs, repeated IDs are only queried once
+        :param max_workers: (int) maximum number of concurrent requests
+        :return: (dict) with keys: results (dict of ID to details), and errors (dict of ID to error message)
+        """
+        return self.fetch_batch(
+            fetch=lambda an_id: self.get_deployment_details(deployment_id=an_id),
+            ids=deployment_ids,
+            max_workers=max_workers
+        )
+
     def get_deployment_bindings_for_virtualization_realm(self, deployment_id, vr_id):
         """Get virtualization realm bindings for a deployment
 
@@ -802,15 +1238,19 @@ class Cons3rtApi(object):
             raise Cons3rtApiError, msg, trace
         return deployment_bindings
 
-    def list_deployment_runs_in_virtualization_realm(self, vr_id, search_type='SEARCH_ALL'):
-        """Query CONS3RT to return a list of deployment runs in a virtualization realm
+    def iter_deployment_runs_in_virtualization_realm(self, vr_id, search_type='SEARCH_ALL', fields=None,
+                                                     as_records=False):
+        """Query CONS3RT for deployment runs in a virtualization realm, yielding each run as its
+        page arrives
 
         :param: vr_id: (int) virtualization realm ID
         :param: search_type (str) the run status to filter the search on
-        :return: (list) of deployment runs
+        :param fields: (tuple) of keys to keep in each record, None for all keys
+        :param as_records: (bool) set True to return compact records instead of dicts
+        :return: (generator) of deployment runs
         :raises: Cons3rtApiError
         """
-        log = logging.getLogger(self.cls_logger + '.list_deployment_runs_in_virtualization_realm')
+        log = logging.getLogger(self.cls_logger + '.iter_deployment_runs_in_virtualization_realm')
 
         # Ensure the vr_id is an int
         if not isinstance(vr_id, int):
@@ -838,18 +1278,19 @@ class Cons3rtApi(object):
         log.info('Attempting to get a list of deployment runs with search_type {s} in '
                  'virtualization realm ID: {i}'.format(i=str(vr_id), s=search_type))
 
-        drs = []
         page_num = 0
         max_results = 40
         while True:
-            log.debug('Attempting to list runs in virtualization realm ID: {i}, page: {p}, max results: {m}'.format(
-                i=str(vr_id), p=str(page_num), m=str(max_results)))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Attempting to list runs in virtualization realm ID: {i}, page: {p}, max results: {m}'.format(
+                    i=str(vr_id), p=str(page_num), m=str(max_results)))
             try:
                 page_of_drs = self.cons3rt_client.list_deployment_runs_in_virtualization_realm(
                     vr_id=vr_id,
                     max_results=max_results,
                     page_num=page_num,
-                    search_type=search_type
+                    search_type=search_type,
+                    fields=fields
                 )
             except Cons3rtClientError:
                 _, ex, trace = sys.exc_info()
@@ -857,11 +1298,29 @@ class Cons3rtApi(object):
                       'page: {p}, max results: {m}\n{e}'.format(i=str(vr_id), p=str(page_num), m=str(max_results),
                                                                 e=str(ex))
                 raise Cons3rtClientError, msg, trace
-            drs += page_of_drs
+            if as_records:
+                page_of_drs = to_records(DeploymentRunRecord, page_of_drs)
+            for dr in page_of_drs:
+                yield dr
             if len(page_of_drs) < max_results:
                 break
             else:
                 page_num += 1
+
+    def list_deployment_runs_in_virtualization_realm(self, vr_id, search_type='SEARCH_ALL', fields=None,
+                                                     as_records=False):
+        """Query CONS3RT to return a list of deployment runs in a virtualization realm
+
+        :param: vr_id: (int) virtualization realm ID
+        :param: search_type (str) the run status to filter the search on
+        :param fields: (tuple) of keys to keep in each record, None for all keys
+        :param as_records: (bool) set True to return compact records instead of dicts
+        :return: (list) of deployment runs
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.list_deployment_runs_in_virtualization_realm')
+        drs = list(self.iter_deployment_runs_in_virtualization_realm(
+            vr_id=vr_id, search_type=search_type, fields=fields, as_records=as_records))
         log.info('Found {n} runs in virtualization realm ID: {i}'.format(n=str(len(drs)), i=str(vr_id)))
         return drs
 
@@ -893,10 +1352,25 @@ class Cons3rtApi(object):
             raise Cons3rtApiError, msg, trace
         return dr_details
 
-    def list_virtualization_realms_for_cloud(self, cloud_id):
+    def retrieve_deployment_run_details_batch(self, dr_ids, max_workers=default_max_workers):
+        """Query CONS3RT concurrently for details of each deployment run ID
+
+        :param dr_ids: (iterable) of deployment run IDs, repeated IDs are only queried once
+        :param max_workers: (int) maximum number of concurrent requests
+        :return: (dict) with keys: results (dict of ID to details), and errors (dict of ID to error message)
+        """
+        return self.fetch_batch(
+            fetch=lambda an_id: self.retrieve_deployment_run_details(dr_id=an_id),
+            ids=dr_ids,
+            max_workers=max_workers
+        )
+
+    def list_virtualization_realms_for_cloud(self, cloud_id, fields=None, as_records=False):
         """Query CONS3RT to return a list of VRs for a specified Cloud ID
 
         :param cloud_id: (int) Cloud ID
+        :param fields: (tuple) of keys to keep in each record, None for all keys
+        :param as_records: (bool) set True to return compact records instead of dicts
         :return: (list) of Virtualization Realm data
         :raises: Cons3rtApiError
         """
@@ -908,13 +1382,15 @@ class Cons3rtApi(object):
         page_num = 0
         max_results = 40
         while True:
-            log.debug('Attempting to list virtualization realms in Cloud ID: {i}, page: {p}, max results: {m}'.format(
-                i=str(cloud_id), p=str(page_num), m=str(max_results)))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Attempting to list virtualization realms in Cloud ID: {i}, '
+                          'page: {p}, max results: {m}'.format(i=str(cloud_id), p=str(page_num), m=str(max_results)))
             try:
                 page_of_vrs = self.cons3rt_client.list_virtualization_realms_for_cloud(
                     cloud_id=cloud_id,
                     max_results=max_results,
-                    page_num=page_num
+                    page_num=page_num,
+                    fields=fields
                 )
             except Cons3rtClientError:
                 _, ex, trace = sys.exc_info()
@@ -922,6 +1398,8 @@ class Cons3rtApi(object):
                       'page: {p}, max results: {m}\n{e}'.format(i=str(cloud_id), p=str(page_num), m=str(max_results),
                                                                 e=str(ex))
                 raise Cons3rtClientError, msg, trace
+            if as_records:
+                page_of_vrs = to_records(VirtualizationRealmRecord, page_of_vrs)
             vrs += page_of_vrs
             if len(page_of_vrs) < max_results:
                 break
@@ -1057,11 +1535,10 @@ class Cons3rtApi(object):
             raise Cons3rtApiError('Unable to determine the target from provided asset_type: {t}'.format(t=asset_type))
 
         # Ensure state is valid
-        valid_states = ['DEVELOPMENT', 'PUBLISHED', 'CERTIFIED', 'DEPRECATED', 'OFFLINE']
         state = state.upper().strip()
-        if state not in valid_states:
+        if state not in valid_asset_states:
             raise Cons3rtApiError('Provided state is not valid: {s}, must be one of: {v}'.format(
-                s=state, v=valid_states))
+                s=state, v=valid_asset_states))
 
         # Attempt to update the asset ID
         try:
@@ -1107,14 +1584,11 @@ class Cons3rtApi(object):
         if target == '':
             raise Cons3rtApiError('Unable to determine the target from provided asset_type: {t}'.format(t=asset_type))
 
-        # Valid values for visibility
-        valid_visibility = ['OWNER', 'OWNING_PROJECT', 'TRUSTED_PROJECTS', 'COMMUNITY']
-
         # Ensure visibility is valid
         visibility = visibility.upper().strip()
-        if visibility not in valid_visibility:
+        if visibility not in valid_asset_visibility:
             raise Cons3rtApiError('Provided visibility is not valid: {s}, must be one of: {v}'.format(
-                s=visibility, v=valid_visibility))
+                s=visibility, v=valid_asset_visibility))
 
         # If a list of trusted project was provided, add them to the asset
         if trusted_projects and visibility == 'TRUSTED_PROJECTS':
@@ -1140,6 +1614,110 @@ class Cons3rtApi(object):
             raise Cons3rtApiError, msg, trace
         log.info('Successfully updated visibility for Asset ID {i} to: {s}'.format(i=str(asset_id), s=visibility))
 
+    def update_assets_batch(self, updates, max_workers=default_max_workers, rate_per_sec=None):
+        """Updates the state and visibility of many assets concurrently
+
+        Trusted projects and states are updated first, then the visibility of each asset whose
+        trusted projects were all added.
+
+        :param updates: (list) of dicts with keys: asset_type, asset_id, and any of: state,
+            visibility, and trusted_projects (list of int project IDs)
+        :param max_workers: (int) maximum number of concurrent requests
+        :param rate_per_sec: (float) maximum requests per second, None for no limit
+        :return: (list) of dicts in the order of updates with keys: asset_type, asset_id, updated
+            (list of state, visibility, and trusted_project:<ID> that succeeded), and errors (list
+            of error messages)
+        :raises: Cons3rtApiError if an update is not valid, before any update is made
+        """
+        log = logging.getLogger(self.cls_logger + '.update_assets_batch')
+
+        # Validate every update before making any change
+        reports = []
+        for update in updates:
+            try:
+                asset_id = int(update['asset_id'])
+                asset_type = update['asset_type']
+            except (KeyError, TypeError, ValueError):
+                raise Cons3rtApiError('Each update requires an asset_type and an Integer asset_id, found: {u}'.format(
+                    u=str(update)))
+            if self.get_asset_type(asset_type=asset_type) == '':
+                raise Cons3rtApiError('Unable to determine the target from provided asset_type: {t}'.format(
+                    t=asset_type))
+            state = update.get('state')
+            if state is not None and str(state).upper().strip() not in valid_asset_states:
+                raise Cons3rtApiError('Provided state is not valid for asset ID {i}: {s}, must be one of: {v}'.format(
+                    i=str(asset_id), s=state, v=valid_asset_states))
+            visibility = update.get('visibility')
+            if visibility is not None and str(visibility).upper().strip() not in valid_asset_visibility:
+                raise Cons3rtApiError('Provided visibility is not valid for asset ID {i}: {s}, must be one of: '
+                                      '{v}'.format(i=str(asset_id), s=visibility, v=valid_asset_visibility))
+            reports.append({
+                'asset_type': asset_type,
+                'asset_id': asset_id,
+                'state': state,
+                'visibility': visibility,
+                'trusted_projects': update.get('trusted_projects') or [],
+                'updated': [],
+                'failed': [],
+                'errors': []
+            })
+
+        rate_limiter = RateLimiter(rate_per_sec=rate_per_sec)
+
+        def run(operation):
+            report, action, value = operation
+            rate_limiter.acquire()
+            if action == 'state':
+                self.update_asset_state(asset_type=report['asset_type'], asset_id=report['asset_id'], state=value)
+            elif action == 'visibility':
+                self.update_asset_visibility(
+                    asset_type=report['asset_type'], asset_id=report['asset_id'], visibility=value)
+            else:
+                try:
+                    self.cons3rt_client.add_trusted_project_to_asset(
+                        asset_id=report['asset_id'], trusted_project_id=value)
+                except Cons3rtClientError:
+                    _, ex, trace = sys.exc_info()
+                    msg = 'Problem adding trusted project ID [{p}] to asset ID: {i}\n{e}'.format(
+                        p=str(value), i=str(report['asset_id']), e=str(ex))
+                    raise Cons3rtApiError, msg, trace
+
+        def run_all(operations):
+            for (report, action, value), _, ex in map_concurrently(run, operations, max_workers=max_workers):
+                if action == 'trusted_project':
+                    action = 'trusted_project:{p}'.format(p=str(value))
+                if ex is None:
+                    report['updated'].append(action)
+                else:
+                    report['failed'].append(action)
+                    report['errors'].append('{n}: {e}'.format(n=ex.__class__.__name__, e=str(ex)))
+
+        # Trusted projects must be added before the visibility is set to TRUSTED_PROJECTS
+        first = []
+        for report in reports:
+            if report['state'] is not None:
+                first.append((report, 'state', report['state']))
+            if str(report['visibility']).upper().strip() == 'TRUSTED_PROJECTS':
+                for trusted_project in report['trusted_projects']:
+                    first.append((report, 'trusted_project', trusted_project))
+        run_all(first)
+        second = []
+        for report in reports:
+            if report['visibility'] is None:
+                continue
+            if [action for action in report['failed'] if action.startswith('trusted_project')]:
+                report['errors'].append('Visibility not updated because trusted projects could not be added')
+                continue
+            second.append((report, 'visibility', report['visibility']))
+        run_all(second)
+
+        results = []
+        for report in reports:
+            results.append(dict((key, report[key]) for key in ['asset_type', 'asset_id', 'updated', 'errors']))
+        log.info('Updated {n} assets with {e} errors'.format(
+            n=str(len(results)), e=str(len([r for r in results if r['errors']]))))
+        return results
+
     def import_asset(self, asset_zip_file):
         """Imports an asset zip file into CONS3RT
 
@@ -1308,7 +1886,7 @@ class Cons3rtApi(object):
                     i=str(vr_id), e=str(ex)))
                 log.info('Retrying in {t} sec...'.format(t=str(retry_time_sec)))
                 disable_try_num += 1
-                time.sleep(retry_time_sec)
+                self.wait_before_retry(seconds=retry_time_sec, operation='toggle_remote_access')
                 continue
             break
 
@@ -1341,7 +1919,7 @@ class Cons3rtApi(object):
                         log.info('Found remote access status for VR ID {i}: {s}'.format(
                             i=str(vr_id), s=ra_status))
             check_try_num += 1
-            time.sleep(retry_time_sec)
+            self.wait_before_retry(seconds=retry_time_sec, operation='toggle_remote_access')
 
         # Attempt to enable RA with the specified size
         log.info('Attempting to enable remote access in cloudspace ID [{i}] with size: {s}'.format(
@@ -1357,32 +1935,36 @@ class Cons3rtApi(object):
                 n=str(enable_try_num), m=str(max_enable_retries)))
             try:
                 self.enable_remote_access(vr_id=vr_id, size=size)
-            except Cons3rtApi:
+            except Cons3rtApiError:
                 _, ex, trace = sys.exc_info()
                 log.warn('Cons3rtApiError: There was a problem enabling remote access, could not complete '
                          'the remote access enable for cloudspace id [{i}] with size: {s}'.format(i=str(vr_id), s=size))
                 log.info('Retrying in {t} sec...'.format(t=str(retry_time_sec)))
                 enable_try_num += 1
-                time.sleep(retry_time_sec)
+                self.wait_before_retry(seconds=retry_time_sec, operation='toggle_remote_access')
                 continue
             break
         log.info('Remote access toggle complete for VR ID: {i}'.format(i=str(vr_id)))
 
-    def retrieve_all_users(self):
+    def retrieve_all_users(self, fields=None, as_records=False):
         """Retrieve all users from the CONS3RT site
 
+        :param fields: (tuple) of keys to keep in each record, None for all keys
+        :param as_records: (bool) set True to return compact records instead of dicts
         :return: (list) containing all site users
         :raises: Cons3rtApiError
         """
         log = logging.getLogger(self.cls_logger + '.query_all_users')
         log.info('Attempting to query CONS3RT to retrieve all users...')
         try:
-            users = self.cons3rt_client.retrieve_all_users()
+            users = self.cons3rt_client.retrieve_all_users(fields=fields)
         except Cons3rtClientError:
             _, ex, trace = sys.exc_info()
             msg = '{n}: There was a problem querying for all users\n{e}'.format(n=ex.__class__.__name__, e=str(ex))
             raise Cons3rtApiError, msg, trace
         log.info('Successfully retrieved all site users')
+        if as_records:
+            users = to_records(UserRecord, users)
         return users
 
     def list_all_users(self):
@@ -1423,6 +2005,29 @@ class Cons3rtApi(object):
             raise Cons3rtApiError, msg, trace
         log.info('Successfully created User from file: {f}'.format(f=json_file))
 
+    def create_user(self, user_data):
+        """Creates a single CONS3RT user using the provided data
+
+        :param user_data: (dict) user data, as in the JSON file for create_user_from_json
+        :return: None
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.create_user')
+
+        # Ensure the user_data arg is a dict
+        if not isinstance(user_data, dict):
+            raise Cons3rtApiError('The user_data arg must be a dict, found: {t}'.format(
+                t=user_data.__class__.__name__))
+
+        try:
+            self.cons3rt_client.create_user_from_data(user_data=user_data)
+        except Cons3rtClientError:
+            _, ex, trace = sys.exc_info()
+            msg = '{n}: Unable to create User: {u}\n{e}'.format(
+                n=ex.__class__.__name__, u=str(user_data.get('username')), e=str(ex))
+            raise Cons3rtApiError, msg, trace
+        log.info('Successfully created User: {u}'.format(u=str(user_data.get('username'))))
+
     def add_user_to_project(self, username, project_id):
         """Add the username to the specified project ID
 
@@ -1552,13 +2157,15 @@ class Cons3rtApi(object):
             else:
                 raise Cons3rtApiError('subType must be virtualHost or physicalHost, found: {s}'.format(s=subtype))
 
-        log.debug('Attempting to create system with content: {d}'.format(d=content))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('Attempting to create system with content: {d}'.format(
+                d=truncate_body(str(content), limit=self.log_body_limit)))
         try:
             system_id = self.cons3rt_client.create_system(system_data=content)
         except Cons3rtClientError:
             _, ex, trace = sys.exc_info()
             msg = '{n}: Unable to create a system using contents: {d}\n{e}'.format(
-                n=ex.__class__.__name__, d=str(content), e=str(ex))
+                n=ex.__class__.__name__, d=truncate_body(str(content), limit=self.log_body_limit), e=str(ex))
             raise Cons3rtApiError, msg, trace
         log.info('Successfully created system ID: {i}'.format(i=str(system_id)))
         return system_id
@@ -1606,7 +2213,7 @@ class Cons3rtApi(object):
         except Cons3rtClientError:
             _, ex, trace = sys.exc_info()
             msg = '{n}: Unable to create a scenario using JSON content: {c}\n{e}'.format(
-                n=ex.__class__.__name__, c=str(content), e=str(ex))
+                n=ex.__class__.__name__, c=truncate_body(str(content), limit=self.log_body_limit), e=str(ex))
             raise Cons3rtApiError, msg, trace
         log.info('Successfully created scenario ID: {i}'.format(i=str(scenario_id)))
         return scenario_id
@@ -1700,7 +2307,7 @@ class Cons3rtApi(object):
         except Cons3rtClientError:
             _, ex, trace = sys.exc_info()
             msg = '{n}: Unable to create a deployment using data: {d}\n{e}'.format(
-                n=ex.__class__.__name__, d=str(content), e=str(ex))
+                n=ex.__class__.__name__, d=truncate_body(str(content), limit=self.log_body_limit), e=str(ex))
             raise Cons3rtApiError, msg, trace
         log.info('Successfully created deployment ID: {i}'.format(i=deployment_id))
         return deployment_id
@@ -1824,10 +2431,180 @@ class Cons3rtApi(object):
             i=str(dr_id), d=str(deployment_id)))
         return dr_id
 
-    def delete_inactive_runs_in_virtualization_realm(self, vr_id):
+    def wait_for_deployment_runs(self, dr_ids, fap_statuses, timeout_sec=3600, on_transition=None):
+        """Waits for deployment runs to reach a fapStatus, polling runs in the same
+        virtualization realm together
+
+        :param dr_ids: (list) of deployment run IDs
+        :param fap_statuses: (str) or (list) of fapStatus values to wait for
+        :param timeout_sec: (float) maximum seconds to wait, None to wait forever
+        :param on_transition: function called as on_transition(dr_id, old_status, new_status, run)
+            when a run's fapStatus changes
+        :return: (dict) of DR ID to the fapStatus it reached
+        :raises: Cons3rtApiError
+        """
+        waiter = DeploymentRunWaiter(cons3rt_api=self, on_transition=on_transition)
+        for dr_id in dr_ids:
+            waiter.add(dr_id=dr_id, fap_statuses=fap_statuses)
+        return waiter.wait(timeout_sec=timeout_sec)
+
+    def run_journaled_job(self, job, vr_id, list_dr_ids, action, is_done, journal_file=None, max_attempts=3):
+        """Runs an action on each deployment run returned by list_dr_ids.  With a journal
+        file, the run IDs and each attempt are recorded, so a job that stops part way resumes
+        with the runs that were not completed, without listing the runs again.
+
+        A run that was attempted before, or whose action fails, is checked with is_done first,
+        since an attempt interrupted by a crash, or a failed response, may still have taken
+        effect.  A run still not done after max_attempts attempts is abandoned, so the job
+        can complete.
+
+        :param job: (str) job name, e.g. delete_inactive_runs
+        :param vr_id: (int) virtualization realm ID
+        :param list_dr_ids: function with no args that returns the list of run IDs
+        :param action: function that takes a run ID
+        :param is_done: function that takes a run ID and returns True when the action is
+            no longer needed, e.g. the run was deleted
+        :param journal_file: (str) path to the journal file, None to run without a journal
+        :param max_attempts: (int) attempts for each run before it is abandoned
+        :return: (dict) with keys: done (list of run IDs), failed (dict of run ID to error
+            message for runs to retry), and abandoned (dict of run ID to error message)
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.run_journaled_job')
+        job_key = '{j}:{v}'.format(j=job, v=str(vr_id))
+        journal = Journal(journal_file=journal_file) if journal_file else None
+
+        def record(event, dr_id=None, **kwargs):
+            if journal:
+                entry = {'event': event, 'job': job_key, 'time': time.time()}
+                if dr_id is not None:
+                    entry['dr_id'] = dr_id
+                entry.update(kwargs)
+                journal.append(entry)
+
+        # Find a job that was planned and not completed, with the attempts made for each run
+        dr_ids = None
+        done = set()
+        attempts = {}
+        if journal:
+            for entry in journal.read():
+                if entry.get('job') != job_key:
+                    continue
+                if entry['event'] in ['planned', 'completed']:
+                    dr_ids = entry['dr_ids'] if entry['event'] == 'planned' else None
+                    done = set()
+                    attempts = {}
+                elif entry['event'] == 'started':
+                    attempts[entry['dr_id']] = attempts.get(entry['dr_id'], 0) + 1
+                elif entry['event'] in ['done', 'abandoned']:
+                    done.add(entry['dr_id'])
+        if dr_ids is None:
+            dr_ids = list_dr_ids()
+            record('planned', dr_ids=dr_ids)
+        else:
+            log.info('Resuming {j} for VR ID {v} from journal file {f}, {d} of {n} runs are finished'.format(
+                j=job, v=str(vr_id), f=journal_file, d=str(len(done)), n=str(len(dr_ids))))
+
+        def check_done(dr_id):
+            try:
+                return is_done(dr_id)
+            except Cons3rtApiError:
+                _, ex, _ = sys.exc_info()
+                log.warn('Unable to check the state of run ID {i}\n{e}'.format(i=str(dr_id), e=str(ex)))
+                return False
+
+        result = {'done': [], 'failed': {}, 'abandoned': {}}
+        for dr_id in dr_ids:
+            if dr_id in done:
+                continue
+
+            # An earlier attempt may have finished before the job stopped
+            if attempts.get(dr_id) and check_done(dr_id):
+                result['done'].append(dr_id)
+                record('done', dr_id=dr_id, checked=True)
+                continue
+            if attempts.get(dr_id, 0) >= max_attempts:
+                result['abandoned'][dr_id] = 'Not done after {n} attempts'.format(n=str(attempts[dr_id]))
+                record('abandoned', dr_id=dr_id, error=result['abandoned'][dr_id])
+                continue
+
+            attempts[dr_id] = attempts.get(dr_id, 0) + 1
+            record('started', dr_id=dr_id)
+            try:
+                action(dr_id)
+            except Cons3rtApiError:
+                _, ex, _ = sys.exc_info()
+                if check_done(dr_id):
+                    result['done'].append(dr_id)
+                    record('done', dr_id=dr_id, checked=True)
+                elif attempts[dr_id] >= max_attempts:
+                    result['abandoned'][dr_id] = str(ex)
+                    record('abandoned', dr_id=dr_id, error=str(ex))
+                else:
+                    result['failed'][dr_id] = str(ex)
+                    record('failed', dr_id=dr_id, error=str(ex))
+                continue
+            result['done'].append(dr_id)
+            record('done', dr_id=dr_id)
+
+        # Runs that failed are retried when the job runs again with the same journal
+        if not result['failed']:
+            record('completed')
+        return result
+
+    def is_deployment_run_gone(self, dr_id, released_ok=False):
+        """Returns True when a deployment run is not found, or with released_ok, when it has
+        been released or cancelled
+
+        :param dr_id: (int) deployment run ID
+        :param released_ok: (bool) set True to also return True for released runs
+        :return: (bool)
+        :raises: Cons3rtApiError
+        """
+        try:
+            dr = self.cons3rt_client.retrieve_deployment_run_details(dr_id=dr_id)
+        except Cons3rtClientError:
+            _, ex, trace = sys.exc_info()
+            if getattr(ex, 'status_code', None) == 404:
+                return True
+            msg = '{n}: Unable to query the state of deployment run ID: {i}\n{e}'.format(
+                n=ex.__class__.__name__, i=str(dr_id), e=str(ex))
+            raise Cons3rtApiError, msg, trace
+        if not released_ok:
+            return False
+        return dr.get('deploymentRunStatus') in released_run_statuses or \
+            dr.get('fapStatus') in released_run_statuses
+
+    def list_dr_ids_in_virtualization_realm(self, vr_id, search_type):
+        """Returns the IDs of runs in a virtualization realm
+
+        :param vr_id: (int) virtualization realm ID
+        :param search_type: (str) the run status to filter the search on
+        :return: (list) of run IDs
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.list_dr_ids_in_virtualization_realm')
+        try:
+            drs = self.list_deployment_runs_in_virtualization_realm(
+                vr_id=vr_id, search_type=search_type, fields=('id',))
+        except Cons3rtApiError:
+            _, ex, trace = sys.exc_info()
+            msg = 'Cons3rtApiError: There was a problem listing deployment runs with search type {s} in VR ID: ' \
+                  '{i}\n{e}'.format(s=search_type, i=str(vr_id), e=str(ex))
+            raise Cons3rtApiError, msg, trace
+        dr_ids = []
+        for dr in drs:
+            try:
+                dr_ids.append(dr['id'])
+            except KeyError:
+                log.warn('Unable to determine the run ID from run: {r}'.format(r=str(dr)))
+        return dr_ids
+
+    def delete_inactive_runs_in_virtualization_realm(self, vr_id, journal_file=None):
         """Deletes all inactive runs in a virtualization realm
 
         :param vr_id: (int) virtualization realm ID
+        :param journal_file: (str) path to a journal file to resume the job if it stops part way
         :return: None
         :raises: Cons3rtApiError
         """
@@ -1841,36 +2618,27 @@ class Cons3rtApi(object):
                 msg = 'vr_id arg must be an Integer, found: {t}'.format(t=vr_id.__class__.__name__)
                 raise Cons3rtApiError(msg)
 
-        # List runs in the virtualization realm
-        try:
-            drs = self.list_deployment_runs_in_virtualization_realm(vr_id=vr_id, search_type='SEARCH_INACTIVE')
-        except Cons3rtApiError:
-            _, ex, trace = sys.exc_info()
-            msg = 'Cons3rtApiError: There was a problem listing inactive deployment runs in VR ID: {i}\n{e}'.format(
-                i=str(vr_id), e=str(ex))
-            raise Cons3rtApiError, msg, trace
-
         # Delete each inactive run
-        log.debug('Found inactive runs in VR ID {i}:\n{r}'.format(i=str(vr_id), r=str(drs)))
         log.info('Attempting to delete inactive runs from VR ID: {i}'.format(i=str(vr_id)))
-        for dr in drs:
-            try:
-                dr_id = dr['id']
-            except KeyError:
-                log.warn('Unable to determine the run ID from run: {r}'.format(r=str(dr)))
-                continue
-            try:
-                self.delete_inactive_run(dr_id=dr_id)
-            except Cons3rtApiError:
-                _, ex, trace = sys.exc_info()
-                log.warn('Cons3rtApiError: Unable to delete run ID: {i}\n{e}'.format(i=str(dr_id), e=str(ex)))
-                continue
+        result = self.run_journaled_job(
+            job='delete_inactive_runs',
+            vr_id=vr_id,
+            list_dr_ids=lambda: self.list_dr_ids_in_virtualization_realm(vr_id=vr_id, search_type='SEARCH_INACTIVE'),
+            action=lambda dr_id: self.delete_inactive_run(dr_id=dr_id),
+            is_done=lambda dr_id: self.is_deployment_run_gone(dr_id=dr_id),
+            journal_file=journal_file
+        )
+        for dr_id, err in result['failed'].iteritems():
+            log.warn('Cons3rtApiError: Unable to delete run ID: {i}\n{e}'.format(i=str(dr_id), e=err))
+        for dr_id, err in result['abandoned'].iteritems():
+            log.warn('Gave up deleting run ID: {i}\n{e}'.format(i=str(dr_id), e=err))
         log.info('Completed deleting inactive DRs in VR ID: {i}'.format(i=str(vr_id)))
 
-    def release_active_runs_in_virtualization_realm(self, vr_id):
+    def release_active_runs_in_virtualization_realm(self, vr_id, journal_file=None):
         """Releases all active runs in a virtualization realm
 
         :param vr_id: (int) virtualization realm ID
+        :param journal_file: (str) path to a journal file to resume the job if it stops part way
         :return: None
         """
         log = logging.getLogger(self.cls_logger + '.release_active_runs_in_virtualization_realm')
@@ -1883,31 +2651,20 @@ class Cons3rtApi(object):
                 msg = 'vr_id arg must be an Integer, found: {t}'.format(t=vr_id.__class__.__name__)
                 raise Cons3rtApiError(msg)
 
-        # List active runs in the virtualization realm
-        try:
-            drs = self.list_deployment_runs_in_virtualization_realm(vr_id=vr_id, search_type='SEARCH_ACTIVE')
-        except Cons3rtApiError:
-            _, ex, trace = sys.exc_info()
-            msg = 'Cons3rtApiError: There was a problem listing active deployment runs in VR ID: {i}\n{e}'.format(
-                i=str(vr_id), e=str(ex))
-            raise Cons3rtApiError, msg, trace
-
         # Release or cancel each active run
-        log.debug('Found active runs in VR ID {i}:\n{r}'.format(i=str(vr_id), r=str(drs)))
         log.info('Attempting to release or cancel active runs from VR ID: {i}'.format(i=str(vr_id)))
-        for dr in drs:
-            try:
-                dr_id = dr['id']
-            except KeyError:
-                log.warn('Unable to determine the run ID from run: {r}'.format(r=str(dr)))
-                continue
-            try:
-                self.release_deployment_run(dr_id=dr_id)
-            except Cons3rtApiError:
-                _, ex, trace = sys.exc_info()
-                log.warn('Cons3rtApiError: Unable to release or cancel run ID: {i}\n{e}'.format(
-                    i=str(dr_id), e=str(ex)))
-                continue
+        result = self.run_journaled_job(
+            job='release_active_runs',
+            vr_id=vr_id,
+            list_dr_ids=lambda: self.list_dr_ids_in_virtualization_realm(vr_id=vr_id, search_type='SEARCH_ACTIVE'),
+            action=lambda dr_id: self.release_deployment_run(dr_id=dr_id),
+            is_done=lambda dr_id: self.is_deployment_run_gone(dr_id=dr_id, released_ok=True),
+            journal_file=journal_file
+        )
+        for dr_id, err in result['failed'].iteritems():
+            log.warn('Cons3rtApiError: Unable to release or cancel run ID: {i}\n{e}'.format(i=str(dr_id), e=err))
+        for dr_id, err in result['abandoned'].iteritems():
+            log.warn('Gave up releasing or cancelling run ID: {i}\n{e}'.format(i=str(dr_id), e=err))
         log.info('Completed releasing or cancelling active DRs in VR ID: {i}'.format(i=str(vr_id)))
 
     def list_networks_in_virtualization_realm(self, vr_id):
@@ -2089,3 +2846,7 @@ class Cons3rtApi(object):
                 i=str(dr_id), e=str(ex))
             raise Cons3rtApiError, msg, trace
         return result
+
+
+# Record each Cons3rtApi method call as a span when a tracer is set
+trace_methods(Cons3rtApi, get_tracer=Cons3rtApi.get_tracer)
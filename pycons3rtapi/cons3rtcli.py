@@ -1,20 +1,146 @@
 #!/usr/bin/env python
 
+import csv
+import json
 import sys
+import threading
+import time
+from cStringIO import StringIO
 
 from cons3rtapi import Cons3rtApi
-from pycons3rtlibs import Cons3rtApiError
+from pycons3rtlibs import Cons3rtApiError, Cons3rtClientError, map_concurrently
+
+# Valid output formats for list actions
+output_formats = ['table', 'json', 'jsonl', 'csv']
+
+# Columns for each type of listing as: (header, path to the value, table separator, table blank)
+dr_columns = [
+    ('ID', ['id'], '\t', '      '),
+    ('Name', ['name'], '\t\t\t\t\t\t', '                '),
+    ('Status', ['fapStatus'], '\t\t', '              '),
+    ('Project', ['project', 'name'], '\t\t', '                 '),
+    ('Creator', ['creator', 'username'], '', '         ')
+]
+
+# Columns for runs listed from several cloudspaces into one json, jsonl, or csv document
+cloudspace_dr_columns = [('Cloudspace ID', ['cloudspaceId'], '\t', '      ')] + dr_columns
+
+project_columns = [
+    ('ID', ['id'], '\t', '      '),
+    ('Name', ['name'], '', '                ')
+]
+
+cloud_columns = [
+    ('ID', ['id'], '\t', '      '),
+    ('Name', ['name'], '\t\t\t', '                '),
+    ('Type', ['cloudType'], '', '           ')
+]
+
+team_columns = [
+    ('ID', ['id'], '\t', '      '),
+    ('Name', ['name'], '', '                ')
+]
 
 
 class Cons3rtCliError(Exception):
     pass
 
 
+class OutputWriter(object):
+    """Writes records one row at a time in the table, json, jsonl, or csv output format.
+    Writes are locked so one writer can be shared by threads listing records.
+    """
+
+    def __init__(self, output_format, columns, out):
+        """
+        :param output_format: (str) one of output_formats
+        :param columns: (list) of column tuples used for table and csv output
+        :param out: function that outputs a single line
+        """
+        self.output_format = output_format
+        self.columns = columns
+        self.out = out
+        self.pending_json = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_value(record, path):
+        value = record
+        for key in path:
+            if not isinstance(value, dict) or key not in value:
+                return None
+            value = value[key]
+        return value
+
+    @staticmethod
+    def csv_line(values):
+        encoded = []
+        for value in values:
+            if value is None:
+                value = ''
+            elif isinstance(value, unicode):
+                value = value.encode('utf-8')
+            encoded.append(value)
+        line = StringIO()
+        csv.writer(line, lineterminator='').writerow(encoded)
+        return line.getvalue()
+
+    def start(self):
+        if self.output_format == 'table':
+            self.out(''.join(header + separator for header, _, separator, _ in self.columns))
+        elif self.output_format == 'csv':
+            self.out(self.csv_line([column[0] for column in self.columns]))
+        elif self.output_format == 'json':
+            self.out('[')
+
+    def write(self, record):
+        with self.lock:
+            self.write_record(record)
+
+    def write_record(self, record):
+        if self.output_format == 'table':
+            row = ''
+            for _, path, separator, blank in self.columns:
+                value = self.get_value(record, path)
+                row += (blank if value is None else unicode(value)) + separator
+            self.out(row)
+        elif self.output_format == 'csv':
+            self.out(self.csv_line([self.get_value(record, column[1]) for column in self.columns]))
+        elif self.output_format == 'jsonl':
+            self.out(json.dumps(record))
+        elif self.output_format == 'json':
+            # Hold one record back so the last one is written without a trailing comma
+            if self.pending_json is not None:
+                self.out('  ' + self.pending_json + ',')
+            self.pending_json = json.dumps(record)
+
+    def finish(self):
+        with self.lock:
+            if self.output_format == 'json':
+                if self.pending_json is not None:
+                    self.out('  ' + self.pending_json)
+                    self.pending_json = None
+                self.out(']')
+
+
 class Cons3rtCli(object):
 
-    def __init__(self, args):
+    def __init__(self, args, c5t=None, stdout=None, stderr=None):
+        """Processes CLI args
+
+        :param args: (argparse.Namespace) parsed CLI args
+        :param c5t: (Cons3rtApi) API to use, one is created from your config file if None
+        :param stdout: (file) output stream, default sys.stdout
+        :param stderr: (file) status stream for machine-readable output formats, default sys.stderr
+        """
         self.args = args
         self.ids = []
+        self.output = threading.local()
+        self.stdout = stdout if stdout else sys.stdout
+        self.stderr = stderr if stderr else sys.stderr
+        if c5t is not None:
+            self.c5t = c5t
+            return
         try:
             self.c5t = Cons3rtApi()
         except Cons3rtApiError:
@@ -26,10 +152,17 @@ class Cons3rtCli(object):
         try:
             self.validate_ids()
             self.validate_id()
+            self.validate_output()
         except Cons3rtCliError:
             return False
         return True
 
+    def validate_output(self):
+        if self.args.output not in output_formats:
+            msg = 'Output format must be one of: {f}'.format(f=', '.join(output_formats))
+            self.err(msg)
+            raise Cons3rtCliError(msg)
+
     def validate_id(self):
         if self.args.id:
             try:
@@ -72,100 +205,131 @@ class Cons3rtCli(object):
     def sort_by_id(unsorted_list):
         return sorted(unsorted_list, key=Cons3rtCli.dict_id_comparator)
 
-    @staticmethod
-    def err(msg):
-        print('ERROR: {m}'.format(m=msg))
-
-    @staticmethod
-    def print_drs(dr_list):
-        msg = 'ID\tName\t\t\t\t\t\tStatus\t\tProject\t\tCreator\n'
-        for dr_info in dr_list:
-
-            if 'id' in dr_info:
-                msg += str(dr_info['id'])
-            else:
-                msg += '      '
-            msg += '\t'
-            if 'name' in dr_info:
-                msg += dr_info['name']
-            else:
-                msg += '                '
-            msg += '\t\t\t\t\t\t'
-            if 'fapStatus' in dr_info:
-                msg += dr_info['fapStatus']
-            else:
-                msg += '              '
-            msg += '\t\t'
-            if 'project' in dr_info:
-                msg += dr_info['project']['name']
-            else:
-                msg += '                 '
-            msg += '\t\t'
-            if 'creator' in dr_info:
-                msg += dr_info['creator']['username']
-            else:
-                msg += '         '
-            msg += '\n'
-        print(msg)
-
-    @staticmethod
-    def print_projects(project_list):
-        msg = 'ID\tName\n'
-        for project in project_list:
-            if 'id' in project:
-                msg += str(project['id'])
-            else:
-                msg += '      '
-            msg += '\t'
-            if 'name' in project:
-                msg += project['name']
-            else:
-                msg += '                '
-            msg += '\n'
-        print(msg)
-
-    @staticmethod
-    def print_clouds(cloud_list):
-        msg = 'ID\tName\t\t\t\tType\n'
-        for cloud in cloud_list:
-            if 'id' in cloud:
-                msg += str(cloud['id'])
-            else:
-                msg += '      '
-            msg += '\t'
-            if 'name' in cloud:
-                msg += cloud['name']
-            else:
-                msg += '                '
-            msg += '\t\t\t'
-            if 'cloudType' in cloud:
-                msg += cloud['cloudType']
-            else:
-                msg += '           '
-            msg += '\n'
-        print(msg)
-
-    @staticmethod
-    def print_teams(teams_list):
-        msg = 'ID\tName\n'
-        for team in teams_list:
-            if 'id' in team:
-                msg += str(team['id'])
-            else:
-                msg += '      '
-            msg += '\t'
-            if 'name' in team:
-                msg += team['name']
-            else:
-                msg += '                '
-            msg += '\n'
-        print(msg)
+    def out(self, msg):
+        """Prints the message, or adds it to the output buffer for the current thread
+        when one was started with start_buffer
+
+        :param msg: (str) message to output
+        :return: None
+        """
+        if isinstance(msg, unicode):
+            msg = msg.encode('utf-8')
+        lines = getattr(self.output, 'lines', None)
+        if lines is None:
+            self.write_line(msg)
+        else:
+            lines.append(msg)
+
+    def write_line(self, msg):
+        """Prints the message to stdout without buffering
+
+        :param msg: (str) message to output
+        :return: None
+        """
+        if isinstance(msg, unicode):
+            msg = msg.encode('utf-8')
+        self.stdout.write(msg + '\n')
+        self.stdout.flush()
+
+    def info(self, msg):
+        """Outputs a status message, which goes to stderr for machine-readable output formats
+        to keep stdout parseable, or is added to the status buffer for the current thread when
+        one was started with start_buffer
+
+        :param msg: (str) message to output
+        :return: None
+        """
+        if self.args.output == 'table':
+            self.out(msg)
+            return
+        status_lines = getattr(self.output, 'status_lines', None)
+        if status_lines is None:
+            self.stderr.write(msg + '\n')
+        else:
+            status_lines.append(msg)
+
+    def start_buffer(self):
+        self.output.lines = []
+        self.output.status_lines = []
+
+    def stop_buffer(self):
+        """Stops buffering output for the current thread
+
+        :return: (tuple) of buffered output (str), and buffered status messages (list) for
+            machine-readable output formats
+        """
+        lines = self.output.lines
+        status_lines = self.output.status_lines
+        self.output.lines = None
+        self.output.status_lines = None
+        return '\n'.join(lines), status_lines
+
+    def err(self, msg):
+        self.info('ERROR: {m}'.format(m=msg))
+
+    def get_fields(self, columns):
+        """Returns the record keys needed for the output format, so the table and csv
+        formats only keep the columns they print
+
+        :param columns: (list) of column tuples
+        :return: (tuple) of keys, or None for all keys
+        """
+        if self.args.output in ['json', 'jsonl']:
+            return None
+        return tuple(set(column[1][0] for column in columns))
+
+    def get_shared_writer(self, columns):
+        """Returns a started writer for records from several IDs, so the json and csv formats
+        print a single document, or None for the table format which prints each ID's records
+        as their own table.  Call finish on the writer when done.
+
+        :param columns: (list) of column tuples for the csv format
+        :return: (OutputWriter) or None
+        """
+        if self.args.output == 'table':
+            return None
+        writer = OutputWriter(output_format=self.args.output, columns=columns, out=self.write_line)
+        writer.start()
+        return writer
+
+    def write_records(self, records, columns, writer=None):
+        """Writes records in the requested output format.  The json, jsonl, and csv formats
+        write each record as it is received, the table format is sorted by ID.
+
+        :param records: (iterable) of record dicts, may be a generator of paged results
+        :param columns: (list) of column tuples for the table and csv formats
+        :param writer: (OutputWriter) shared writer from get_shared_writer, None to write the
+            records as a complete document
+        :return: (int) number of records written
+        """
+        if self.args.output == 'table':
+            records = self.sort_by_id(records)
+            if len(records) < 1:
+                return 0
+        count = 0
+        if writer is not None:
+            for record in records:
+                writer.write(record)
+                count += 1
+            return count
+        writer = OutputWriter(output_format=self.args.output, columns=columns, out=self.out)
+        writer.start()
+        try:
+            for record in records:
+                writer.write(record)
+                count += 1
+        finally:
+            writer.finish()
+        return count
 
 
 class CloudspaceCli(Cons3rtCli):
 
-    def __init__(self, args):
-        Cons3rtCli.__init__(self, args)
+    def __init__(self, args, c5t=None, stdout=None, stderr=None):
+        Cons3rtCli.__init__(self, args, c5t=c5t, stdout=stdout, stderr=stderr)
+
+        # Writer shared by the listings of every cloudspace ID, see get_shared_writer
+        self.runs_writer = None
 
     def process_args(self):
         if not self.validate_args():
@@ -173,6 +337,11 @@ class CloudspaceCli(Cons3rtCli):
         if len(self.ids) < 1:
             self.err('No Cloudspace ID(s) provided, use --id=123 or --ids=3,4,5')
             return False
+        if self.args.parallel is not None:
+            if self.args.parallel < 1:
+                self.err('The --parallel option must be at least 1, found: {n}'.format(n=str(self.args.parallel)))
+                return False
+            return self.process_cloudspaces_in_parallel()
         if self.args.list_active_runs or self.args.list:
             try:
                 self.list_active_runs()
@@ -190,25 +359,117 @@ class CloudspaceCli(Cons3rtCli):
                 return False
         return True
 
+    def process_cloudspace(self, cloudspace_id):
+        """Runs each requested action on a single cloudspace, buffering the output
+
+        :param cloudspace_id: (int) cloudspace ID
+        :return: (tuple) of success (bool), buffered output (str), buffered status messages
+            (list), runs listed for the shared writer (list), and elapsed seconds (float)
+        """
+        start_time = time.time()
+        self.start_buffer()
+
+        # Runs for the shared writer are held until every cloudspace is done, so they are
+        # written grouped by cloudspace
+        self.output.runs = []
+        success = True
+        try:
+            if self.args.list_active_runs or self.args.list:
+                self.list_active_runs_in_cloudspace(cloudspace_id)
+            if self.args.release_active_runs:
+                self.release_active_runs_from_cloudspace(cloudspace_id)
+                self.info('Released active runs from cloudspace ID: {i}'.format(i=str(cloudspace_id)))
+            if self.args.delete_inactive_runs:
+                self.delete_inactive_runs_from_cloudspace(cloudspace_id)
+                self.info('Deleted inactive runs from cloudspace ID: {i}'.format(i=str(cloudspace_id)))
+        except Cons3rtCliError:
+            success = False
+        finally:
+            output, status_lines = self.stop_buffer()
+            runs = self.output.runs
+            self.output.runs = None
+        return success, output, status_lines, runs, time.time() - start_time
+
+    def process_cloudspaces_in_parallel(self):
+        """Processes up to --parallel cloudspaces at the same time, and prints the output
+        grouped by cloudspace in the order of the IDs followed by a timing summary.  Runs
+        listed from a cloudspace that failed are not written to the json, jsonl, or csv output.
+
+        :return: (bool) True if every cloudspace succeeded
+        """
+        start_time = time.time()
+        if self.args.list_active_runs or self.args.list:
+            self.runs_writer = self.get_shared_writer(columns=cloudspace_dr_columns)
+        failed_ids = []
+        try:
+            results = map_concurrently(self.process_cloudspace, self.ids, max_workers=self.args.parallel)
+            for cloudspace_id, result, ex in results:
+                self.info('===== Cloudspace ID: {i} ====='.format(i=str(cloudspace_id)))
+                if ex is not None:
+                    self.err('Unexpected error processing cloudspace ID {i}: {n}: {e}'.format(
+                        i=str(cloudspace_id), n=ex.__class__.__name__, e=str(ex)))
+                    failed_ids.append(cloudspace_id)
+                    continue
+                success, output, status_lines, runs, elapsed = result
+                if output:
+                    self.out(output)
+                for msg in status_lines:
+                    self.info(msg)
+                if success and self.runs_writer is not None:
+                    for run in runs:
+                        self.runs_writer.write(run)
+                self.info('Cloudspace ID {i} {r} in {t} seconds'.format(
+                    i=str(cloudspace_id), r='completed' if success else 'FAILED', t=str(round(elapsed, 2))))
+                if not success:
+                    failed_ids.append(cloudspace_id)
+        finally:
+            if self.runs_writer is not None:
+                self.runs_writer.finish()
+                self.runs_writer = None
+        self.info('Processed {n} cloudspaces in {t} seconds with up to {p} in parallel: {s} succeeded, {f} failed'.format(
+            n=str(len(self.ids)), t=str(round(time.time() - start_time, 2)), p=str(self.args.parallel),
+            s=str(len(self.ids) - len(failed_ids)), f=str(len(failed_ids))))
+        if len(failed_ids) > 0:
+            self.err('Failed cloudspace IDs: {i}'.format(i=','.join(str(an_id) for an_id in failed_ids)))
+            return False
+        return True
+
     def list_active_runs(self):
-        for cloudspace_id in self.ids:
-            self.list_active_runs_in_cloudspace(cloudspace_id)
+        self.runs_writer = self.get_shared_writer(columns=cloudspace_dr_columns)
+        try:
+            for cloudspace_id in self.ids:
+                self.list_active_runs_in_cloudspace(cloudspace_id)
+        finally:
+            if self.runs_writer is not None:
+                self.runs_writer.finish()
+                self.runs_writer = None
 
     def list_active_runs_in_cloudspace(self, cloudspace_id):
         try:
-            drs = self.c5t.list_deployment_runs_in_virtualization_realm(
+            records = self.c5t.iter_deployment_runs_in_virtualization_realm(
                 vr_id=cloudspace_id,
-                search_type='SEARCH_ACTIVE'
+                search_type='SEARCH_ACTIVE',
+                fields=self.get_fields(dr_columns)
             )
-        except Cons3rtApiError:
+            if self.runs_writer is None:
+                count = self.write_records(records=records, columns=dr_columns)
+            else:
+                # Runs from several cloudspaces share one document, so each says which cloudspace it is in
+                records = (dict(record, cloudspaceId=cloudspace_id) for record in records)
+                runs = getattr(self.output, 'runs', None)
+                if runs is None:
+                    count = self.write_records(records=records, columns=cloudspace_dr_columns, writer=self.runs_writer)
+                else:
+                    listed_before = len(runs)
+                    runs.extend(records)
+                    count = len(runs) - listed_before
+        except (Cons3rtApiError, Cons3rtClientError):
             _, ex, trace = sys.exc_info()
-            msg = 'There was a problem deleting inactive runs from cloudspace ID: {i}\n{e}'.format(
+            msg = 'There was a problem listing active runs in cloudspace ID: {i}\n{e}'.format(
                 i=str(cloudspace_id), e=str(ex))
             self.err(msg)
             raise Cons3rtCliError, msg, trace
-        print('Found {n} active runs in Cloudspace ID: {i}'.format(n=str(len(drs)), i=str(cloudspace_id)))
-        if len(drs) > 0:
-            self.print_drs(dr_list=drs)
+        self.info('Found {n} active runs in Cloudspace ID: {i}'.format(n=str(count), i=str(cloudspace_id)))
 
     def delete_inactive_runs(self):
         for cloudspace_id in self.ids:
@@ -216,7 +477,7 @@ class CloudspaceCli(Cons3rtCli):
 
     def delete_inactive_runs_from_cloudspace(self, cloudspace_id):
         try:
-            self.c5t.delete_inactive_runs_in_virtualization_realm(vr_id=cloudspace_id)
+            self.c5t.delete_inactive_runs_in_virtualization_realm(vr_id=cloudspace_id, journal_file=self.args.journal)
         except Cons3rtApiError:
             _, ex, trace = sys.exc_info()
             msg = 'There was a problem deleting inactive runs from cloudspace ID: {i}\n{e}'.format(
@@ -230,7 +491,7 @@ class CloudspaceCli(Cons3rtCli):
 
     def release_active_runs_from_cloudspace(self, cloudspace_id):
         try:
-            self.c5t.release_active_runs_in_virtualization_realm(vr_id=cloudspace_id)
+            self.c5t.release_active_runs_in_virtualization_realm(vr_id=cloudspace_id, journal_file=self.args.journal)
         except Cons3rtApiError:
             _, ex, trace = sys.exc_info()
             msg = 'There was a problem releasing active runs from cloudspace ID: {i}\n{e}'.format(
@@ -241,8 +502,8 @@ class CloudspaceCli(Cons3rtCli):
 
 class ProjectCli(Cons3rtCli):
 
-    def __init__(self, args):
-        Cons3rtCli.__init__(self, args)
+    def __init__(self, args, c5t=None, stdout=None, stderr=None):
+        Cons3rtCli.__init__(self, args, c5t=c5t, stdout=stdout, stderr=stderr)
 
     def process_args(self):
         if not self.validate_args():
@@ -255,33 +516,33 @@ class ProjectCli(Cons3rtCli):
         return True
 
     def list_projects(self):
-        projects = []
+        member_count = [0]
+
+        fields = self.get_fields(project_columns)
+
+        def iter_projects():
+            for project in self.c5t.iter_projects(fields=fields):
+                member_count[0] += 1
+                yield project
+            if not self.args.my:
+                for project in self.c5t.iter_expanded_projects(fields=fields):
+                    yield project
+
         try:
-            projects += self.c5t.list_projects()
-        except Cons3rtApiError:
+            count = self.write_records(records=iter_projects(), columns=project_columns)
+        except (Cons3rtApiError, Cons3rtClientError):
             _, ex, trace = sys.exc_info()
             msg = 'There was a problem listing projects\n{e}'.format(e=str(ex))
             self.err(msg)
             raise Cons3rtCliError, msg, trace
-        print('You are a member of {n} projects'.format(n=str(len(projects))))
-        if not self.args.my:
-            try:
-                projects += self.c5t.list_expanded_projects()
-            except Cons3rtApiError:
-                _, ex, trace = sys.exc_info()
-                msg = 'There was a problem listing projects\n{e}'.format(e=str(ex))
-                self.err(msg)
-                raise Cons3rtCliError, msg, trace
-        if len(projects) > 0:
-            projects = self.sort_by_id(projects)
-            self.print_projects(project_list=projects)
-        print('Total number of projects found: {n}'.format(n=str(len(projects))))
+        self.info('You are a member of {n} projects'.format(n=str(member_count[0])))
+        self.info('Total number of projects found: {n}'.format(n=str(count)))
 
 
 class CloudCli(Cons3rtCli):
 
-    def __init__(self, args):
-        Cons3rtCli.__init__(self, args)
+    def __init__(self, args, c5t=None, stdout=None, stderr=None):
+        Cons3rtCli.__init__(self, args, c5t=c5t, stdout=stdout, stderr=stderr)
 
     def process_args(self):
         if not self.validate_args():
@@ -294,24 +555,21 @@ class CloudCli(Cons3rtCli):
         return True
 
     def list_clouds(self):
-        clouds = []
         try:
-            clouds += self.c5t.list_clouds()
-        except Cons3rtApiError:
+            count = self.write_records(records=self.c5t.iter_clouds(fields=self.get_fields(cloud_columns)),
+                                       columns=cloud_columns)
+        except (Cons3rtApiError, Cons3rtClientError):
             _, ex, trace = sys.exc_info()
             msg = 'There was a problem listing clouds\n{e}'.format(e=str(ex))
             self.err(msg)
             raise Cons3rtCliError, msg, trace
-        if len(clouds) > 0:
-            clouds = self.sort_by_id(clouds)
-            self.print_clouds(cloud_list=clouds)
-        print('Total number of clouds found: {n}'.format(n=str(len(clouds))))
+        self.info('Total number of clouds found: {n}'.format(n=str(count)))
 
 
 class TeamCli(Cons3rtCli):
 
-    def __init__(self, args):
-        Cons3rtCli.__init__(self, args)
+    def __init__(self, args, c5t=None, stdout=None, stderr=None):
+        Cons3rtCli.__init__(self, args, c5t=c5t, stdout=stdout, stderr=stderr)
 
     def process_args(self):
         if not self.validate_args():
@@ -324,15 +582,12 @@ class TeamCli(Cons3rtCli):
         return True
 
     def list_teams(self):
-        teams = []
         try:
-            teams += self.c5t.list_teams()
-        except Cons3rtApiError:
+            count = self.write_records(records=self.c5t.iter_teams(fields=self.get_fields(team_columns)),
+                                       columns=team_columns)
+        except (Cons3rtApiError, Cons3rtClientError):
             _, ex, trace = sys.exc_info()
             msg = 'There was a problem listing teams\n{e}'.format(e=str(ex))
             self.err(msg)
             raise Cons3rtCliError, msg, trace
-        if len(teams) > 0:
-            teams = self.sort_by_id(teams)
-            self.print_teams(teams_list=teams)
-        print('Total number of clouds teams: {n}'.format(n=str(len(teams))))
+        self.info('Total number of teams found: {n}'.format(n=str(count)))
@@ -1,10 +1,13 @@
 #!/usr/bin/python
 
+import copy
 import json
 import sys
+import threading
+import time
 
 from httpclient import Client
-from pycons3rtlibs import Cons3rtClientError
+from pycons3rtlibs import Cons3rtClientError, SingleFlight, decode_json
 
 
 class Cons3rtClient:
@@ -13,10 +16,92 @@ class Cons3rtClient:
         self.base = base
         self.user = user
         self.http_client = Client(base)
+        self.in_flight_reads = SingleFlight()
+
+        # Seconds to cache GET content, 0 disables the cache.  Cached content is dropped
+        # after any PUT, POST, or DELETE made through this client.
+        self.read_cache_ttl_sec = 0
+        self.read_cache = {}
+        self.read_cache_lock = threading.Lock()
 
     def set_user(self, user):
         self.user = user
 
+    def for_user(self, user):
+        """Returns a client for another user that shares this client's HTTP client and
+        caches, which are keyed by user
+
+        :param user: (RestUser) user for the new client
+        :return: (Cons3rtClient)
+        """
+        client = copy.copy(self)
+        client.user = user
+        return client
+
+    def get_content(self, target):
+        """Makes an HTTP GET to the target and returns the response content.  Concurrent
+        calls for the same user and target share a single HTTP request and its result, and
+        content is reused for read_cache_ttl_sec seconds when the read cache is enabled.
+
+        :param target: (str) ReST API target URL
+        :return: (str) response content
+        :raises: Cons3rtClientError
+        """
+        user = self.user
+        key = (user.token, user.username, user.cert_file_path, target)
+
+        # Reads started after a write returned do not join a read started before it
+        write_count = self.http_client.write_count
+
+        if self.read_cache_ttl_sec > 0:
+            content = self.get_cached_content(key=key)
+            metrics = self.http_client.metrics
+            if metrics is not None:
+                metrics.inc('cons3rt_cache_requests_total',
+                            labels={'cache': 'read', 'result': 'miss' if content is None else 'hit'})
+            if content is not None:
+                return content
+
+        def read():
+            response = self.http_client.http_get(rest_user=user, target=target)
+            content = self.http_client.parse_response(response=response)
+            if self.read_cache_ttl_sec > 0:
+                now = time.time()
+                with self.read_cache_lock:
+                    for cached_key, cached in self.read_cache.items():
+                        if now - cached[0] > self.read_cache_ttl_sec:
+                            del self.read_cache[cached_key]
+
+                    # Content read while a write returned may predate the write, do not cache it
+                    if self.http_client.write_count == write_count:
+                        self.read_cache[key] = (now, write_count, content)
+            return content
+
+        return self.in_flight_reads.do(key=key + (write_count,), func=read)
+
+    def get_cached_content(self, key):
+        """Returns cached content for the key, or None if it is missing or stale
+
+        :param key: (tuple) read cache key
+        :return: (str) response content or None
+        """
+        now = time.time()
+        with self.read_cache_lock:
+            if self.read_cache.get(key) is None:
+                return None
+            cached_time, write_count, content = self.read_cache[key]
+            if write_count != self.http_client.write_count:
+                self.read_cache.clear()
+                return None
+            if now - cached_time > self.read_cache_ttl_sec:
+                del self.read_cache[key]
+                return None
+            return content
+
+    def clear_read_cache(self):
+        with self.read_cache_lock:
+            self.read_cache.clear()
+
     def register_cloud(self, cloud_file):
         """Registers a Cloud using info in the provided JSON file
 
@@ -106,6 +191,36 @@ class Cons3rtClient:
             msg = '{n}: The HTTP response contains a bad status code:\n{e}'.format(n=ex.__class__.__name__, e=str(ex))
             raise Cons3rtClientError, msg, trace
 
+    def create_user_from_data(self, user_data):
+        """Creates a CONS3RT User using the provided data
+
+        :param user_data: (dict) user data
+        :return:  None
+        :raises: Cons3rtClientError
+        """
+        if self.user is None:
+            raise Cons3rtClientError('Cons3rtClient was initialized with an invalid user')
+        if self.base is None:
+            raise Cons3rtClientError('Cons3rtClient was initialized with an invalid base')
+
+        # Create the user
+        try:
+            response = self.http_client.http_post(rest_user=self.user, target='users',
+                                                  content_data=json.dumps(user_data))
+        except Cons3rtClientError:
+            _, ex, trace = sys.exc_info()
+            msg = '{n}: Unable to create User: {u}:\n{e}'.format(
+                n=ex.__class__.__name__, u=str(user_data.get('username')), e=str(ex))
+            raise Cons3rtClientError, msg, trace
+
+        # Check the response
+        try:
+            self.http_client.parse_response(response=response)
+        except Cons3rtClientError:
+            _, ex, trace = sys.exc_info()
+            msg = '{n}: The HTTP response contains a bad status code:\n{e}'.format(n=ex.__class__.__name__, e=str(ex))
+            raise Cons3rtClientError, msg, trace
+
     def add_user_to_project(self, username, project_id):
         """Adds the username to the project ID
 
@@ -322,43 +437,40 @@ class Cons3rtClient:
     def get_cloud_id(self, cloud_name):
         retval = None
 
-        response = self.http_client.http_get(rest_user=self.user, target='clouds')
-        content = self.http_client.parse_response(response=response)
-        clouds = json.loads(content)
+        content = self.get_content(target='clouds')
+        clouds = decode_json(content)
         for cloud in clouds:
             if cloud['name'] == cloud_name:
                 retval = cloud['id']
 
         return retval
 
-    def list_projects(self, max_results=40, page_num=0):
+    def list_projects(self, max_results=40, page_num=0, fields=None):
         """Queries CONS3RT for a list of projects for the current user
 
         :param max_results (int) maximum results to provide in the response
         :param page_num (int) page number to return
+        :param fields: (tuple) of keys to keep in each record, None for all keys
         :return: (list) of projects
         """
-        response = self.http_client.http_get(
-            rest_user=self.user,
+        content = self.get_content(
             target='projects?maxresults={m}&page={p}'.format(m=str(max_results), p=str(page_num))
         )
-        content = self.http_client.parse_response(response=response)
-        teams = json.loads(content)
+        teams = decode_json(content, fields=fields)
         return teams
 
-    def list_expanded_projects(self, max_results=40, page_num=0):
+    def list_expanded_projects(self, max_results=40, page_num=0, fields=None):
         """Queries CONS3RT for a list of projects the user is not a member of
 
         :param max_results (int) maximum results to provide in the response
         :param page_num (int) page number to return
+        :param fields: (tuple) of keys to keep in each record, None for all keys
         :return: (list) of projects
         """
-        response = self.http_client.http_get(
-            rest_user=self.user,
+        content = self.get_content(
             target='projects/expanded?maxresults={m}&page={p}'.format(m=str(max_results), p=str(page_num))
         )
-        content = self.http_client.parse_response(response=response)
-        projects = json.loads(content)
+        projects = decode_json(content, fields=fields)
         return projects
 
     def get_project_details(self, project_id):
@@ -367,9 +479,8 @@ class Cons3rtClient:
         :param project_id: (int) ID of the project
         :return: (dict) containing project details
         """
-        response = self.http_client.http_get(rest_user=self.user, target='projects/{i}'.format(i=str(project_id)))
-        content = self.http_client.parse_response(response=response)
-        project_details = json.loads(content)
+        content = self.get_content(target='projects/{i}'.format(i=str(project_id)))
+        project_details = decode_json(content)
         return project_details
 
     def get_virtualization_realm_details(self, vr_id):
@@ -378,40 +489,37 @@ class Cons3rtClient:
         :param vr_id: (int) ID of the virtualization realm
         :return: (dict) containing virtualization realm details
         """
-        response = self.http_client.http_get(rest_user=self.user, target='virtualizationrealms/{i}'.format(
+        content = self.get_content(target='virtualizationrealms/{i}'.format(
             i=str(vr_id)))
-        content = self.http_client.parse_response(response=response)
-        vr_details = json.loads(content)
+        vr_details = decode_json(content)
         return vr_details
 
-    def list_clouds(self, max_results=40, page_num=0):
+    def list_clouds(self, max_results=40, page_num=0, fields=None):
         """Queries CONS3RT for a list of Clouds
 
         :param max_results (int) maximum results to provide in the response
         :param page_num (int) page number to return
+        :param fields: (tuple) of keys to keep in each record, None for all keys
         :return: (dict) Containing Cloud info
         """
-        response = self.http_client.http_get(
-            rest_user=self.user,
+        content = self.get_content(
             target='clouds?maxresults={m}&page={p}'.format(m=str(max_results), p=str(page_num))
         )
-        content = self.http_client.parse_response(response=response)
-        clouds = json.loads(content)
+        clouds = decode_json(content, fields=fields)
         return clouds
 
-    def list_teams(self, max_results=40, page_num=0):
+    def list_teams(self, max_results=40, page_num=0, fields=None):
         """Queries CONS3RT for a list of Teams
 
         :param max_results (int) maximum results to provide in the response
         :param page_num (int) page number to return
+        :param fields: (tuple) of keys to keep in each record, None for all keys
         :return: (list) Teams
         """
-        response = self.http_client.http_get(
-            rest_user=self.user,
+        content = self.get_content(
             target='teams?maxresults={m}&page={p}'.format(m=str(max_results), p=str(page_num))
         )
-        content = self.http_client.parse_response(response=response)
-        teams = json.loads(content)
+        teams = decode_json(content, fields=fields)
         return teams
 
     def get_team_details(self, team_id):
@@ -420,9 +528,8 @@ class Cons3rtClient:
         :param team_id: (int) ID of the team
         :return: (dict) containing team details
         """
-        response = self.http_client.http_get(rest_user=self.user, target='teams/{i}'.format(i=str(team_id)))
-        content = self.http_client.parse_response(response=response)
-        team_details = json.loads(content)
+        content = self.get_content(target='teams/{i}'.format(i=str(team_id)))
+        team_details = decode_json(content)
         return team_details
 
     def get_system_details(self, system_id):
@@ -431,9 +538,8 @@ class Cons3rtClient:
         :param system_id (int) ID of the system to retrieve
         :return: (dict) containing system details
         """
-        response = self.http_client.http_get(rest_user=self.user, target='systems/{i}'.format(i=str(system_id)))
-        content = self.http_client.parse_response(response=response)
-        system_details = json.loads(content)
+        content = self.get_content(target='systems/{i}'.format(i=str(system_id)))
+        system_details = decode_json(content)
         return system_details
 
     def list_scenarios(self):
@@ -441,9 +547,8 @@ class Cons3rtClient:
 
         :return: (list) Containing Scenario info
         """
-        response = self.http_client.http_get(rest_user=self.user, target='scenarios?maxresults=0')
-        content = self.http_client.parse_response(response=response)
-        scenarios = json.loads(content)
+        content = self.get_content(target='scenarios?maxresults=0')
+        scenarios = decode_json(content)
         return scenarios
 
     def get_scenario_details(self, scenario_id):
@@ -452,9 +557,8 @@ class Cons3rtClient:
         :param scenario_id (int) ID of the scenario to retrieve
         :return: (dict) containing scenario details
         """
-        response = self.http_client.http_get(rest_user=self.user, target='scenarios/{i}'.format(i=str(scenario_id)))
-        content = self.http_client.parse_response(response=response)
-        scenario_details = json.loads(content)
+        content = self.get_content(target='scenarios/{i}'.format(i=str(scenario_id)))
+        scenario_details = decode_json(content)
         return scenario_details
 
     def list_deployments(self):
@@ -462,9 +566,8 @@ class Cons3rtClient:
 
         :return: (list) Containing Deployment info
         """
-        response = self.http_client.http_get(rest_user=self.user, target='deployments?maxresults=0')
-        content = self.http_client.parse_response(response=response)
-        deployments = json.loads(content)
+        content = self.get_content(target='deployments?maxresults=0')
+        deployments = decode_json(content)
         return deployments
 
     def get_deployment_details(self, deployment_id):
@@ -473,9 +576,8 @@ class Cons3rtClient:
         :param deployment_id (int) ID of the deployment to retrieve
         :return: (dict) containing deployment details
         """
-        response = self.http_client.http_get(rest_user=self.user, target='deployments/{i}'.format(i=str(deployment_id)))
-        content = self.http_client.parse_response(response=response)
-        deployment_details = json.loads(content)
+        content = self.get_content(target='deployments/{i}'.format(i=str(deployment_id)))
+        deployment_details = decode_json(content)
         return deployment_details
 
     def get_deployment_bindings_for_virtualization_realm(self, deployment_id, vr_id):
@@ -485,12 +587,10 @@ class Cons3rtClient:
         :param vr_id (int) ID of the virtualization realm to retrieve bindings from
         :return: (dict) containing deployment binding details
         """
-        response = self.http_client.http_get(
-            rest_user=self.user,
+        content = self.get_content(
             target='deployments/{i}/bindings?virtualizationRealmId={v}'.format(
                 i=str(deployment_id), v=str(vr_id)))
-        content = self.http_client.parse_response(response=response)
-        deployment_bindings = json.loads(content)
+        deployment_bindings = decode_json(content)
         return deployment_bindings
 
     def retrieve_deployment_run_details(self, dr_id):
@@ -499,41 +599,36 @@ class Cons3rtClient:
         :param: (int) deployment run ID
         :return: (list) Containing Deployment info
         """
-        response = self.http_client.http_get(rest_user=self.user, target='drs/{i}'.format(i=str(dr_id)))
-        content = self.http_client.parse_response(response=response)
-        dr_details = json.loads(content)
+        content = self.get_content(target='drs/{i}'.format(i=str(dr_id)))
+        dr_details = decode_json(content)
         return dr_details
 
     def get_virtualization_realm_id(self, cloud_id, vr_name):
         retval = None
 
-        response = self.http_client.http_get(
-            rest_user=self.user,
-            target='clouds/' + str(cloud_id) + '/virtualizationrealms')
-        content = self.http_client.parse_response(response=response)
-        vrs = json.loads(content)
+        content = self.get_content(target='clouds/' + str(cloud_id) + '/virtualizationrealms')
+        vrs = decode_json(content)
         for vr in vrs:
             if vr['name'] == vr_name:
                 retval = vr['id']
         return retval
 
-    def list_virtualization_realms_for_cloud(self, cloud_id, max_results=40, page_num=0):
+    def list_virtualization_realms_for_cloud(self, cloud_id, max_results=40, page_num=0, fields=None):
         """Queries CONS3RT for a list of Virtualization Realms for a specified Cloud ID
 
         :param cloud_id: (int) Cloud ID to query
         :param max_results: (int) maximum results to return
         :param page_num: (int) page number
+        :param fields: (tuple) of keys to keep in each record, None for all keys
         :return:
         """
-        response = self.http_client.http_get(
-            rest_user=self.user,
+        content = self.get_content(
             target='clouds/{c}/virtualizationrealms?maxresults={m}&page={p}'.format(
                 c=str(cloud_id),
                 m=str(max_results),
                 p=str(page_num)
             ))
-        content = self.http_client.parse_response(response=response)
-        vrs = json.loads(content)
+        vrs = decode_json(content, fields=fields)
         return vrs
 
     def add_virtualization_realm_admin(self, vr_id, username):
@@ -557,16 +652,14 @@ class Cons3rtClient:
         result = self.http_client.parse_response(response=response)
         return result
 
-    def list_projects_in_virtualization_realm(self, vr_id, max_results=40, page_num=0):
-        response = self.http_client.http_get(
-            rest_user=self.user,
+    def list_projects_in_virtualization_realm(self, vr_id, max_results=40, page_num=0, fields=None):
+        result = self.get_content(
             target='virtualizationrealms/{v}/projects?maxresults={m}&page={p}'.format(
                 v=str(vr_id),
                 m=str(max_results),
                 p=str(page_num)
             ))
-        result = self.http_client.parse_response(response=response)
-        projects = json.loads(result)
+        projects = decode_json(result, fields=fields)
         return projects
 
     def remove_project_from_virtualization_realm(self, vr_id, project_id):
@@ -576,48 +669,41 @@ class Cons3rtClient:
         result = self.http_client.parse_response(response=response)
         return result
 
-    def list_deployment_runs_in_virtualization_realm(self, vr_id, search_type='SEARCH_ALL', max_results=40, page_num=0):
-        response = self.http_client.http_get(
-            rest_user=self.user,
-            target='virtualizationrealms/{i}/deploymentruns?search_type={s}&maxresults={m}&page={p}'.format(
-                i=str(vr_id), s=search_type, m=str(max_results), p=str(page_num))
-        )
+    def list_deployment_runs_in_virtualization_realm(self, vr_id, search_type='SEARCH_ALL', max_results=40, page_num=0,
+                                                     fields=None):
         try:
-            result = self.http_client.parse_response(response=response)
+            result = self.get_content(
+                target='virtualizationrealms/{i}/deploymentruns?search_type={s}&maxresults={m}&page={p}'.format(
+                    i=str(vr_id), s=search_type, m=str(max_results), p=str(page_num))
+            )
         except Cons3rtClientError:
             _, ex, trace = sys.exc_info()
             msg = '{n}: The HTTP response contains a bad status code\n{e}'.format(n=ex.__class__.__name__, e=str(ex))
             raise Cons3rtClientError, msg, trace
-        drs = json.loads(result)
+        drs = decode_json(result, fields=fields)
         return drs
 
     def list_networks_in_virtualization_realm(self, vr_id):
-        response = self.http_client.http_get(
-            rest_user=self.user,
-            target='virtualizationrealms/{i}/networks'.format(i=str(vr_id))
-        )
         try:
-            result = self.http_client.parse_response(response=response)
+            result = self.get_content(target='virtualizationrealms/{i}/networks'.format(i=str(vr_id)))
         except Cons3rtClientError:
             _, ex, trace = sys.exc_info()
             msg = '{n}: The HTTP response contains a bad status code\n{e}'.format(n=ex.__class__.__name__, e=str(ex))
             raise Cons3rtClientError, msg, trace
-        networks = json.loads(result)
+        networks = decode_json(result)
         return networks
 
     def list_templates_in_virtualization_realm(self, vr_id):
-        response = self.http_client.http_get(
-            rest_user=self.user,
-            target='virtualizationrealms/{i}/templates?include_registrations=true&include_subscriptions=true'.format(
-                i=str(vr_id))
-        )
         try:
-            result = self.http_client.parse_response(response=response)
+            result = self.get_content(
+                target='virtualizationrealms/{i}/templates?include_registrations=true&include_subscriptions=true'.format(
+                    i=str(vr_id))
+            )
         except Cons3rtClientError:
             _, ex, trace = sys.exc_info()
             msg = '{n}: The HTTP response contains a bad status code\n{e}'.format(n=ex.__class__.__name__, e=str(ex))
             raise Cons3rtClientError, msg, trace
-        templates = json.loads(result)
+        templates = decode_json(result)
         return templates
 
     def release_deployment_run(self, dr_id):
@@ -860,9 +946,10 @@ class Cons3rtClient:
             msg = '{n}: The HTTP response contains a bad status code\n{e}'.format(n=ex.__class__.__name__, e=str(ex))
             raise Cons3rtClientError, msg, trace
 
-    def retrieve_all_users(self):
+    def retrieve_all_users(self, fields=None):
         """Query CONS3RT to retrieve all site users
 
+        :param fields: (tuple) of keys to keep in each record, None for all keys
         :return: (list) Containing all site users
         :raises: Cons3rtClientError
         """
@@ -871,17 +958,13 @@ class Cons3rtClient:
         while True:
             target = 'users?maxresults=100&page={p}'.format(p=str(page_num))
             try:
-                response = self.http_client.http_get(
-                    rest_user=self.user,
-                    target=target
-                )
+                result = self.get_content(target=target)
             except Cons3rtClientError:
                 _, ex, trace = sys.exc_info()
                 msg = '{n}: The HTTP response contains a bad status code\n{e}'.format(
                     n=ex.__class__.__name__, e=str(ex))
                 raise Cons3rtClientError, msg, trace
-            result = self.http_client.parse_response(response=response)
-            found_users = json.loads(result)
+            found_users = decode_json(result, fields=fields)
             users += found_users
             if len(found_users) < 100:
                 break
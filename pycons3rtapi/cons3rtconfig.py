@@ -8,12 +8,18 @@ import json
 import logging
 import shutil
 
-from pycons3rt.logify import Logify
-from pycons3rt.bash import mkdir_p
 
+def get_mod_logger():
+    """Returns the logger name for this module
+
+    pycons3rt sets up its logging when it is imported, so it is only imported
+    here by the functions that log, not by manual_config
+
+    :return: (str) logger name
+    """
+    from pycons3rt.logify import Logify
+    return Logify.get_name() + '.pycons3rtapi.cons3rtapi'
 
-# Set up logger name for this module
-mod_logger = Logify.get_name() + '.pycons3rtapi.cons3rtapi'
 
 # List of site URLs
 site_urls = {
@@ -149,7 +155,8 @@ def asset_config(config_file_path, cert_file_path=None):
     :param: config_file_path (str) name of the config file
     :return: None
     """
-    log = logging.getLogger(mod_logger + '.config_pycons3rtapi')
+    from pycons3rt.bash import mkdir_p
+    log = logging.getLogger(get_mod_logger() + '.config_pycons3rtapi')
 
     # Create the pycons3rtapi directory
     log.info('Creating directory: {d}'.format(d=cons3rtapi_config_dir))
@@ -191,7 +198,7 @@ def set_config(config_data):
     :return: None
     :raises Cons3rtConfigError
     """
-    log = logging.getLogger(mod_logger + '.set_config')
+    log = logging.getLogger(get_mod_logger() + '.set_config')
 
     cons3rt_config = {}
 
@@ -0,0 +1,386 @@
+#!/usr/bin/env python
+"""
+Background daemon for the cons3rt CLI
+
+The daemon keeps a Cons3rtApi loaded with pooled connections and a short-lived
+read cache, and runs CLI commands sent over a Unix socket in your cons3rt config
+directory.  The cons3rt command uses the daemon when it is running, and runs
+in process when it is not.
+
+Start the daemon in the foreground:
+
+    $ cons3rt daemon
+
+Each request is a line of JSON with the CLI args, and the daemon replies with
+lines of JSON carrying stdout and stderr output followed by the exit code.
+"""
+
+import errno
+import json
+import logging
+import os
+import socket
+import SocketServer
+import sys
+import threading
+import time
+
+from cons3rtconfig import cons3rtapi_config_dir, cons3rtapi_config_file
+
+
+# Unix socket the daemon listens on
+daemon_socket = os.path.join(cons3rtapi_config_dir, 'cons3rt.sock')
+
+# Seconds the daemon reuses GET content before querying the site again
+daemon_read_cache_ttl_sec = 30
+
+# Commands that are always run by the cons3rt command instead of the daemon
+local_commands = [
+    'setup',
+    'config',
+    'configure',
+    'daemon'
+]
+
+
+class Cons3rtDaemonError(Exception):
+    """This class is an Exception type for handling errors with the cons3rt daemon
+    """
+    pass
+
+
+def get_mod_logger():
+    """Returns the logger name for this module, the client side of the daemon
+    does not import pycons3rt so the cons3rt command starts quickly
+
+    :return: (str) logger name
+    """
+    from pycons3rt.logify import Logify
+    return Logify.get_name() + '.pycons3rtapi.cons3rtdaemon'
+
+
+def send_message(wfile, message):
+    """Writes a message as a line of JSON
+
+    :param wfile: (file) socket file to write
+    :param message: (dict) message
+    :return: None
+    """
+    wfile.write(json.dumps(message) + '\n')
+    wfile.flush()
+
+
+def connect(socket_path=daemon_socket):
+    """Connects to the daemon
+
+    :param socket_path: (str) path to the daemon socket
+    :return: (socket.socket) connected socket, or None if the daemon is not running
+    :raises: Cons3rtDaemonError
+    """
+    if not os.path.exists(socket_path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except socket.error as ex:
+        sock.close()
+        if ex.errno in [errno.ENOENT, errno.ECONNREFUSED]:
+            return None
+        raise Cons3rtDaemonError('Unable to connect to the cons3rt daemon socket {s}: {e}'.format(
+            s=socket_path, e=str(ex)))
+    return sock
+
+
+def request(message, socket_path=daemon_socket, stdout=None, stderr=None):
+    """Sends a request to the daemon and writes output as it arrives
+
+    :param message: (dict) request message
+    :param socket_path: (str) path to the daemon socket
+    :param stdout: (file) output stream, default sys.stdout
+    :param stderr: (file) status stream, default sys.stderr
+    :return: (dict) final reply message, or None if the daemon is not running
+    :raises: Cons3rtDaemonError
+    """
+    stdout = stdout if stdout else sys.stdout
+    stderr = stderr if stderr else sys.stderr
+    sock = connect(socket_path=socket_path)
+    if sock is None:
+        return None
+    try:
+        sock_file = sock.makefile('rwb')
+        send_message(sock_file, message)
+        for line in sock_file:
+            reply = json.loads(line)
+            if 'stdout' in reply:
+                stdout.write(reply['stdout'].encode('utf-8'))
+                stdout.flush()
+            elif 'stderr' in reply:
+                stderr.write(reply['stderr'].encode('utf-8'))
+                stderr.flush()
+            else:
+                return reply
+    except (socket.error, ValueError) as ex:
+        raise Cons3rtDaemonError('Lost connection to the cons3rt daemon: {e}'.format(e=str(ex)))
+    finally:
+        sock.close()
+
+    # The command may have partially run, so do not fall back to running it again
+    raise Cons3rtDaemonError('The cons3rt daemon closed the connection before the command completed')
+
+
+def run_in_daemon(argv, socket_path=daemon_socket, stdout=None, stderr=None):
+    """Runs CLI args in the daemon
+
+    :param argv: (list) of CLI args, not including the program name
+    :param socket_path: (str) path to the daemon socket
+    :param stdout: (file) output stream, default sys.stdout
+    :param stderr: (file) status stream, default sys.stderr
+    :return: (int) exit code, or None if the daemon is not running
+    :raises: Cons3rtDaemonError
+    """
+    reply = request(message={'argv': argv}, socket_path=socket_path, stdout=stdout, stderr=stderr)
+    if reply is None:
+        return None
+    return reply.get('exit_code', 1)
+
+
+def stop_daemon(socket_path=daemon_socket):
+    """Stops the daemon
+
+    :param socket_path: (str) path to the daemon socket
+    :return: (int) exit code
+    """
+    try:
+        reply = request(message={'stop': True}, socket_path=socket_path)
+    except Cons3rtDaemonError as ex:
+        print('ERROR: {e}'.format(e=str(ex)))
+        return 1
+    if reply is None:
+        print('The cons3rt daemon is not running')
+        return 0
+    print('Stopped the cons3rt daemon')
+    return 0
+
+
+def daemon_status(socket_path=daemon_socket):
+    """Prints the daemon status
+
+    :param socket_path: (str) path to the daemon socket
+    :return: (int) exit code, 0 if the daemon is running
+    """
+    try:
+        reply = request(message={'status': True}, socket_path=socket_path)
+    except Cons3rtDaemonError as ex:
+        print('ERROR: {e}'.format(e=str(ex)))
+        return 1
+    if reply is None:
+        print('The cons3rt daemon is not running')
+        return 1
+    status = reply['status']
+    print('The cons3rt daemon is running with PID {p} on socket: {s}'.format(p=str(status['pid']), s=socket_path))
+    print('Uptime: {t} seconds, commands run: {n}, active: {a}'.format(
+        t=str(int(status['uptime_sec'])), n=str(status['commands_run']), a=str(status['commands_active'])))
+    return 0
+
+
+def run_daemon(socket_path=daemon_socket, read_cache_ttl_sec=daemon_read_cache_ttl_sec):
+    """Runs the daemon in the foreground until it is stopped
+
+    :param socket_path: (str) path to the daemon socket
+    :param read_cache_ttl_sec: (int) seconds to reuse GET content
+    :return: (int) exit code
+    """
+    try:
+        server = Cons3rtDaemon(socket_path=socket_path, read_cache_ttl_sec=read_cache_ttl_sec)
+    except Cons3rtDaemonError as ex:
+        print('ERROR: {e}'.format(e=str(ex)))
+        return 1
+    print('The cons3rt daemon is listening on socket: {s}'.format(s=socket_path))
+
+    # Load the API and open connections before the first command
+    from pycons3rtlibs import Cons3rtApiError
+    try:
+        server.get_api()
+    except Cons3rtApiError as ex:
+        print('WARNING: Unable to load the CONS3RT API config, commands will fail until it is fixed\n'
+              '{e}'.format(e=str(ex)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+class StreamWriter(object):
+    """File-like object that sends each write to the client as a message
+    """
+
+    def __init__(self, wfile, stream, lock):
+        self.wfile = wfile
+        self.stream = stream
+        self.lock = lock
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.decode('utf-8', 'replace')
+        with self.lock:
+            send_message(self.wfile, {self.stream: data})
+
+    def flush(self):
+        pass
+
+
+class Cons3rtDaemonHandler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        log = logging.getLogger(self.server.cls_logger + '.handle')
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            message = json.loads(line)
+        except ValueError:
+            log.warn('Received an invalid request: {r}'.format(r=line[:200]))
+            return
+
+        if message.get('stop'):
+            send_message(self.wfile, {'stopped': True})
+            threading.Thread(target=self.server.shutdown).start()
+        elif message.get('status'):
+            send_message(self.wfile, {'status': self.server.get_status()})
+        elif 'argv' in message:
+            lock = threading.Lock()
+            stdout = StreamWriter(wfile=self.wfile, stream='stdout', lock=lock)
+            stderr = StreamWriter(wfile=self.wfile, stream='stderr', lock=lock)
+            exit_code = self.server.run_command(argv=message['argv'], stdout=stdout, stderr=stderr)
+            send_message(self.wfile, {'exit_code': exit_code})
+
+
+class Cons3rtDaemon(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, socket_path=daemon_socket, read_cache_ttl_sec=daemon_read_cache_ttl_sec):
+        """Serves CLI commands on a Unix socket using a shared Cons3rtApi
+
+        :param socket_path: (str) path to the daemon socket
+        :param read_cache_ttl_sec: (int) seconds to reuse GET content
+        :raises: Cons3rtDaemonError
+        """
+        self.cls_logger = get_mod_logger() + '.Cons3rtDaemon'
+        self.socket_path = socket_path
+        self.read_cache_ttl_sec = read_cache_ttl_sec
+        self.c5t = None
+        self.config_mtime = None
+        self.api_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.start_time = time.time()
+        self.commands_run = 0
+        self.commands_active = 0
+
+        # Remove the socket left behind by a daemon that did not exit cleanly
+        sock = connect(socket_path=socket_path)
+        if sock is not None:
+            sock.close()
+            raise Cons3rtDaemonError('The cons3rt daemon is already running on socket: {s}'.format(s=socket_path))
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+        if not os.path.isdir(os.path.dirname(socket_path)):
+            os.makedirs(os.path.dirname(socket_path))
+
+        # Only the owner may connect, commands run with the owner's credentials
+        old_umask = os.umask(0o077)
+        try:
+            SocketServer.UnixStreamServer.__init__(self, socket_path, Cons3rtDaemonHandler)
+        except socket.error as ex:
+            raise Cons3rtDaemonError('Unable to listen on socket {s}: {e}'.format(s=socket_path, e=str(ex)))
+        finally:
+            os.umask(old_umask)
+
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def get_api(self):
+        """Returns the shared Cons3rtApi, and loads it again when the config file changes
+
+        :return: (Cons3rtApi)
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.get_api')
+        from cons3rtapi import Cons3rtApi
+        from pycons3rtlibs import Cons3rtApiError, default_max_workers
+        try:
+            config_mtime = os.path.getmtime(cons3rtapi_config_file)
+        except OSError:
+            config_mtime = None
+        with self.api_lock:
+            if self.c5t is None or config_mtime != self.config_mtime:
+                log.info('Loading the CONS3RT API config file: {f}'.format(f=cons3rtapi_config_file))
+                c5t = Cons3rtApi()
+                c5t.cons3rt_client.read_cache_ttl_sec = self.read_cache_ttl_sec
+                try:
+                    c5t.warm_up(connections=default_max_workers)
+                except Cons3rtApiError as ex:
+                    log.warn('Unable to warm up connections, they will open on first use\n{e}'.format(e=str(ex)))
+                self.c5t = c5t
+                self.config_mtime = config_mtime
+            return self.c5t
+
+    def get_status(self):
+        with self.stats_lock:
+            return {
+                'pid': os.getpid(),
+                'uptime_sec': time.time() - self.start_time,
+                'commands_run': self.commands_run,
+                'commands_active': self.commands_active
+            }
+
+    def run_command(self, argv, stdout, stderr):
+        """Runs CLI args using the shared Cons3rtApi
+
+        :param argv: (list) of CLI args, not including the program name
+        :param stdout: (file) output stream
+        :param stderr: (file) status stream
+        :return: (int) exit code
+        """
+        log = logging.getLogger(self.cls_logger + '.run_command')
+        from cons3rt import get_parser, run_command
+        from pycons3rtlibs import Cons3rtApiError
+
+        try:
+            args = get_parser().parse_args(argv)
+        except SystemExit:
+            stderr.write('ERROR: Invalid args for the cons3rt daemon: {a}\n'.format(a=' '.join(argv)))
+            return 2
+        if args.command in local_commands:
+            stderr.write('ERROR: The {c} command is not run by the cons3rt daemon\n'.format(c=args.command))
+            return 1
+
+        try:
+            c5t = self.get_api()
+        except Cons3rtApiError as ex:
+            stderr.write('ERROR: Missing or incomplete authentication information, run [cons3rt config] to fix\n'
+                         '{e}\n'.format(e=str(ex)))
+            return 1
+
+        log.info('Running command: {a}'.format(a=' '.join(argv)))
+        with self.stats_lock:
+            self.commands_active += 1
+        start_time = time.time()
+        try:
+            return run_command(args, c5t=c5t, stdout=stdout, stderr=stderr)
+        except Exception as ex:
+            log.error('{n}: Command failed: {a}\n{e}'.format(n=ex.__class__.__name__, a=' '.join(argv), e=str(ex)))
+            stderr.write('ERROR: {n}: {e}\n'.format(n=ex.__class__.__name__, e=str(ex)))
+            return 1
+        finally:
+            with self.stats_lock:
+                self.commands_active -= 1
+                self.commands_run += 1
+            log.info('Completed command in {t} seconds: {a}'.format(
+                t=str(round(time.time() - start_time, 2)), a=' '.join(argv)))
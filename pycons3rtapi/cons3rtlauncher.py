@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+Launches many runs of a deployment with bounded concurrency and a rate limit
+
+Each launch is recorded in a journal file before and after it is submitted.
+Running the same campaign again with the same journal skips runs that were
+already launched, so a campaign interrupted by a crash can be resumed.
+
+    launcher = BulkLauncher(cons3rt_api=c5t, deployment_id=10, journal_file='campaign.journal')
+    results = launcher.launch(run_options_list=[options_1, options_2, options_3])
+"""
+
+import hashlib
+import json
+import logging
+import sys
+import time
+
+from pycons3rt.logify import Logify
+
+from pycons3rtlibs import Cons3rtApiError, Journal, RateLimiter, map_concurrently
+
+
+# Set up logger name for this module
+mod_logger = Logify.get_name() + '.pycons3rtapi.cons3rtlauncher'
+
+
+class BulkLauncher(object):
+
+    def __init__(self, cons3rt_api, deployment_id, journal_file, max_workers=4, rate_per_sec=1.0, burst=1):
+        """Launches runs of a deployment
+
+        :param cons3rt_api: (Cons3rtApi) API used to launch the runs
+        :param deployment_id: (int) ID of the deployment to launch
+        :param journal_file: (str) path to the journal file for this campaign
+        :param max_workers: (int) maximum number of launches in progress at once
+        :param rate_per_sec: (float) maximum launches submitted per second, None for no limit
+        :param burst: (int) launches that may be submitted at once after an idle period
+        """
+        self.cls_logger = mod_logger + '.BulkLauncher'
+        self.cons3rt_api = cons3rt_api
+        try:
+            self.deployment_id = int(deployment_id)
+        except (TypeError, ValueError):
+            raise Cons3rtApiError('deployment_id arg must be an Integer, found: {t}'.format(
+                t=deployment_id.__class__.__name__))
+        self.journal = Journal(journal_file=journal_file)
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate_per_sec=rate_per_sec, burst=burst)
+
+    @staticmethod
+    def get_run_key(index, run_options):
+        """Returns the key identifying a run in the journal, so a changed list of run options
+        does not match runs launched from a different entry
+
+        :param index: (int) position in the list of run options
+        :param run_options: (dict) run options
+        :return: (str) key
+        """
+        digest = hashlib.sha1(json.dumps(run_options, sort_keys=True)).hexdigest()
+        return '{i}:{d}'.format(i=str(index), d=digest)
+
+    def load_state(self):
+        """Reads the journal for this deployment
+
+        :return: (dict) of run key to its last journal entry
+        :raises: Cons3rtApiError
+        """
+        state = {}
+        for entry in self.journal.read():
+            if entry.get('event') == 'campaign':
+                if entry.get('deployment_id') != self.deployment_id:
+                    raise Cons3rtApiError('Journal file {f} is for deployment ID {j}, not {i}'.format(
+                        f=self.journal.journal_file, j=str(entry.get('deployment_id')), i=str(self.deployment_id)))
+                continue
+            state[entry['key']] = entry
+        return state
+
+    def launch(self, run_options_list, retry_unknown=False):
+        """Launches a run for each set of run options, skipping runs the journal shows were
+        already launched
+
+        A run is unknown when the journal shows it was submitted but has no result, because
+        the process stopped during the request.  Unknown runs may have launched, check the
+        site before setting retry_unknown.
+
+        :param run_options_list: (list) of run options dicts
+        :param retry_unknown: (bool) set True to submit unknown runs again
+        :return: (list) of dicts in the order of run_options_list with keys: index, key, dr_id,
+            status (launched, resumed, failed, or unknown), and error
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.launch')
+        start_time = time.time()
+        state = self.load_state()
+        if not state:
+            self.journal.append({'event': 'campaign', 'deployment_id': self.deployment_id, 'time': time.time()})
+
+        results = []
+        to_launch = []
+        for index, run_options in enumerate(run_options_list):
+            if not isinstance(run_options, dict):
+                raise Cons3rtApiError('run_options at index {i} must be a dict, found: {t}'.format(
+                    i=str(index), t=run_options.__class__.__name__))
+            key = self.get_run_key(index=index, run_options=run_options)
+            result = {'index': index, 'key': key, 'dr_id': None, 'status': None, 'error': None}
+            results.append(result)
+            entry = state.get(key)
+            if entry is not None and entry['event'] == 'launched':
+                result['dr_id'] = entry['dr_id']
+                result['status'] = 'resumed'
+            elif entry is not None and entry['event'] == 'submitting' and not retry_unknown:
+                result['status'] = 'unknown'
+                log.warn('Run at index {i} was submitted but its result was not recorded, skipping'.format(
+                    i=str(index)))
+            else:
+                to_launch.append((result, run_options))
+
+        log.info('Launching {n} runs of deployment ID {d}, {r} already launched'.format(
+            n=str(len(to_launch)), d=str(self.deployment_id),
+            r=str(len([r for r in results if r['status'] == 'resumed']))))
+
+        # Record each result as soon as it is known, so a crash loses at most the runs in flight
+        def launch_one(item):
+            result, run_options = item
+            self.rate_limiter.acquire()
+            self.journal.append({'event': 'submitting', 'key': result['key'], 'index': result['index'],
+                                 'time': time.time()})
+            try:
+                dr_id = self.cons3rt_api.run_deployment(deployment_id=self.deployment_id, run_options=run_options)
+            except Cons3rtApiError:
+                _, ex, _ = sys.exc_info()
+                result['status'] = 'failed'
+                result['error'] = '{n}: {e}'.format(n=ex.__class__.__name__, e=str(ex))
+                log.warn('Unable to launch run at index {i}\n{e}'.format(i=str(result['index']), e=result['error']))
+                self.journal.append({'event': 'failed', 'key': result['key'], 'index': result['index'],
+                                     'error': result['error'], 'time': time.time()})
+                return
+            result['dr_id'] = dr_id
+            result['status'] = 'launched'
+            self.journal.append({'event': 'launched', 'key': result['key'], 'index': result['index'],
+                                 'dr_id': dr_id, 'time': time.time()})
+
+        # Other errors, such as a journal that cannot be written, leave the run unknown
+        for item, _, ex in map_concurrently(launch_one, to_launch, max_workers=self.max_workers):
+            if ex is not None:
+                result = item[0]
+                result['status'] = 'unknown'
+                result['error'] = '{n}: {e}'.format(n=ex.__class__.__name__, e=str(ex))
+                log.warn('Launch of run at index {i} stopped with an error\n{e}'.format(
+                    i=str(result['index']), e=result['error']))
+
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        log.info('Finished launching runs of deployment ID {d} in {t} seconds: {c}'.format(
+            d=str(self.deployment_id), t=str(round(time.time() - start_time, 1)),
+            c=', '.join('{s}: {n}'.format(s=s, n=str(n)) for s, n in sorted(counts.items()))))
+        return results
+
+    def get_dr_ids(self):
+        """Returns the IDs of runs launched in this campaign according to the journal
+
+        :return: (list) of deployment run IDs in launch order
+        :raises: Cons3rtApiError
+        """
+        entries = sorted([e for e in self.load_state().values() if e['event'] == 'launched'],
+                         key=lambda e: e['index'])
+        return [entry['dr_id'] for entry in entries]
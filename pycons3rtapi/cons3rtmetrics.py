@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+"""
+Metrics for long-running processes that use Cons3rtApi
+
+Metrics are off until a MetricsRegistry is set.  The registry then counts
+requests, retries, and cache hits and misses, keeps latency histograms by
+endpoint, adds up bytes sent and received, and reports connection pool use
+when it is scraped.  MetricsServer serves the metrics in the Prometheus text
+exposition format from a local HTTP port:
+
+    registry = MetricsRegistry()
+    c5t = Cons3rtApi()
+    c5t.set_metrics(registry)
+    server = MetricsServer(registry=registry, port=9464)
+    server.start()
+
+Endpoints are ReST API targets with numeric IDs replaced by {id}, so the
+number of label values stays bounded.
+"""
+
+import BaseHTTPServer
+import logging
+import SocketServer
+import sys
+import threading
+
+from pycons3rt.logify import Logify
+
+from pycons3rtlibs import Cons3rtApiError
+
+
+# Set up logger name for this module
+mod_logger = Logify.get_name() + '.pycons3rtapi.cons3rtmetrics'
+
+# Content type of the Prometheus text exposition format
+exposition_content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds in seconds of the request latency histogram buckets
+default_latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Metrics recorded by pycons3rtapi, tuples of name, type, and help text
+cons3rt_metrics = [
+    ('cons3rt_http_requests_total', 'counter', 'HTTP requests by method, endpoint, and status'),
+    ('cons3rt_http_request_duration_seconds', 'histogram', 'HTTP request latency by method and endpoint'),
+    ('cons3rt_http_requests_in_flight', 'gauge', 'HTTP requests waiting for a response'),
+    ('cons3rt_http_sent_bytes_total', 'counter', 'Bytes of request bodies sent by method and endpoint'),
+    ('cons3rt_http_received_bytes_total', 'counter', 'Bytes of response bodies received on the wire by endpoint'),
+    ('cons3rt_http_decoded_bytes_total', 'counter', 'Bytes of response bodies after decompression by endpoint'),
+    ('cons3rt_retries_total', 'counter', 'Retries by operation'),
+    ('cons3rt_cache_requests_total', 'counter', 'Cache lookups by cache (read or validator) and result'),
+    ('cons3rt_http_pool_maxsize', 'gauge', 'Maximum connections kept in the pool for each host'),
+    ('cons3rt_http_pool_connections', 'gauge', 'Connections in the pool for each host by state (in_use or idle)')
+]
+
+
+def format_labels(labels):
+    """Returns labels in the exposition format
+
+    :param labels: (tuple) of (name, value) tuples sorted by name
+    :return: (str) e.g. {method="GET",status="200"}, or an empty string for no labels
+    """
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append('{n}="{v}"'.format(n=name, v=value))
+    return '{' + ','.join(parts) + '}'
+
+
+def format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry(object):
+
+    def __init__(self, latency_buckets=default_latency_buckets):
+        """Holds counters, gauges, and histograms with labels
+
+        :param latency_buckets: (tuple) of histogram bucket upper bounds in seconds
+        """
+        self.cls_logger = mod_logger + '.MetricsRegistry'
+        self.latency_buckets = tuple(sorted(latency_buckets))
+        self.lock = threading.Lock()
+
+        # Dict of name to (type, help text) for each described metric
+        self.descriptions = {}
+
+        # Dict of name to a dict of labels tuple to value for counters and gauges, or to
+        # [bucket counts, sum, count] for histograms
+        self.values = {}
+
+        # Functions called on each scrape that return a list of (name, labels, value) gauges
+        self.collectors = []
+
+        for name, metric_type, help_text in cons3rt_metrics:
+            self.describe(name=name, metric_type=metric_type, help_text=help_text)
+
+    def describe(self, name, metric_type, help_text):
+        """Adds a metric
+
+        :param name: (str) metric name
+        :param metric_type: (str) counter, gauge, or histogram
+        :param help_text: (str) description
+        :return: None
+        :raises: Cons3rtApiError
+        """
+        if metric_type not in ['counter', 'gauge', 'histogram']:
+            raise Cons3rtApiError('metric_type must be counter, gauge, or histogram, found: {t}'.format(
+                t=metric_type))
+        with self.lock:
+            self.descriptions[name] = (metric_type, help_text)
+            self.values.setdefault(name, {})
+
+    @staticmethod
+    def get_label_key(labels):
+        if not labels:
+            return ()
+        return tuple(sorted(labels.items()))
+
+    def inc(self, name, labels=None, amount=1):
+        """Adds to a counter or gauge
+
+        :param name: (str) metric name
+        :param labels: (dict) label names and values
+        :param amount: (float) amount to add, negative to decrease a gauge
+        :return: None
+        """
+        key = self.get_label_key(labels)
+        with self.lock:
+            values = self.values.setdefault(name, {})
+            values[key] = values.get(key, 0) + amount
+
+    def set(self, name, value, labels=None):
+        """Sets a gauge
+
+        :param name: (str) metric name
+        :param value: (float) value
+        :param labels: (dict) label names and values
+        :return: None
+        """
+        key = self.get_label_key(labels)
+        with self.lock:
+            self.values.setdefault(name, {})[key] = value
+
+    def observe(self, name, value, labels=None):
+        """Adds a value to a histogram
+
+        :param name: (str) metric name
+        :param value: (float) observed value, e.g. seconds
+        :param labels: (dict) label names and values
+        :return: None
+        """
+        key = self.get_label_key(labels)
+        with self.lock:
+            values = self.values.setdefault(name, {})
+            histogram = values.get(key)
+            if histogram is None:
+                histogram = values[key] = [[0] * len(self.latency_buckets), 0.0, 0]
+            for index, bound in enumerate(self.latency_buckets):
+                if value <= bound:
+                    histogram[0][index] += 1
+                    break
+            histogram[1] += value
+            histogram[2] += 1
+
+    def add_collector(self, collector):
+        """Adds a function called on each scrape to report gauges, such as connection pool use
+
+        :param collector: function with no args that returns a list of (name, labels dict,
+            value) tuples
+        :return: None
+        """
+        with self.lock:
+            if collector not in self.collectors:
+                self.collectors.append(collector)
+
+    def collect(self):
+        """Runs the collectors and sets the gauges they report
+
+        :return: None
+        """
+        log = logging.getLogger(self.cls_logger + '.collect')
+        with self.lock:
+            collectors = list(self.collectors)
+        for collector in collectors:
+            try:
+                gauges = collector()
+            except Exception:
+                _, ex, _ = sys.exc_info()
+                log.warn('{n}: Metrics collector failed\n{e}'.format(n=ex.__class__.__name__, e=str(ex)))
+                continue
+            for name, labels, value in gauges:
+                self.set(name=name, value=value, labels=labels)
+
+    def render(self):
+        """Returns all metrics in the Prometheus text exposition format
+
+        :return: (str) metrics text
+        """
+        self.collect()
+        lines = []
+        with self.lock:
+            for name in sorted(self.values.keys()):
+                metric_type, help_text = self.descriptions.get(name, ('untyped', ''))
+                if help_text:
+                    lines.append('# HELP {n} {h}'.format(n=name, h=help_text))
+                lines.append('# TYPE {n} {t}'.format(n=name, t=metric_type))
+                for key in sorted(self.values[name].keys()):
+                    value = self.values[name][key]
+                    if metric_type != 'histogram':
+                        lines.append('{n}{l} {v}'.format(n=name, l=format_labels(key), v=format_value(value)))
+                        continue
+                    bucket_counts, total, count = value
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.latency_buckets, bucket_counts):
+                        cumulative += bucket_count
+                        lines.append('{n}_bucket{l} {v}'.format(
+                            n=name, l=format_labels(key + (('le', format_value(bound)),)), v=str(cumulative)))
+                    lines.append('{n}_bucket{l} {v}'.format(
+                        n=name, l=format_labels(key + (('le', '+Inf'),)), v=str(count)))
+                    lines.append('{n}_sum{l} {v}'.format(n=name, l=format_labels(key), v=format_value(total)))
+                    lines.append('{n}_count{l} {v}'.format(n=name, l=format_labels(key), v=str(count)))
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ['/', '/metrics']:
+            self.send_error(404)
+            return
+        body = self.server.registry.render()
+        self.send_response(200)
+        self.send_header('Content-Type', exposition_content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log = logging.getLogger(mod_logger + '.MetricsRequestHandler')
+        log.debug(format % args)
+
+
+class ThreadingMetricsHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class MetricsServer(object):
+
+    def __init__(self, registry, port=9464, host='127.0.0.1'):
+        """Serves the registry metrics at /metrics from a background thread
+
+        :param registry: (MetricsRegistry) metrics to serve
+        :param port: (int) port to listen on, 0 to pick a free port
+        :param host: (str) address to listen on, defaults to local connections only
+        """
+        self.cls_logger = mod_logger + '.MetricsServer'
+        self.registry = registry
+        self.port = port
+        self.host = host
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        """Starts listening
+
+        :return: (int) port the server listens on
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.start')
+        if self.httpd is not None:
+            return self.port
+        try:
+            self.httpd = ThreadingMetricsHTTPServer((self.host, self.port), MetricsRequestHandler)
+        except (OSError, IOError):
+            _, ex, trace = sys.exc_info()
+            msg = '{n}: Unable to listen for metrics scrapes on {h}:{p}\n{e}'.format(
+                n=ex.__class__.__name__, h=self.host, p=str(self.port), e=str(ex))
+            raise Cons3rtApiError, msg, trace
+        self.httpd.registry = self.registry
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='cons3rt-metrics')
+        self.thread.daemon = True
+        self.thread.start()
+        log.info('Serving metrics at http://{h}:{p}/metrics'.format(h=self.host, p=str(self.port)))
+        return self.port
+
+    def stop(self):
+        if self.httpd is None:
+            return
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+        self.httpd = None
+        self.thread = None
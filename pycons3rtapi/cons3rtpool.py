@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+Runs calls for many projects at the same time
+
+Cons3rtApi uses one project token at a time, and set_project_token changes it
+for every caller.  The pool keeps a Cons3rtApi for each configured project,
+created on first use, so calls for different projects can run concurrently
+each with its own token.  All of them share the process-wide connection pools.
+
+    pool = Cons3rtApiPool(cons3rt_api=Cons3rtApi())
+    batch = pool.map_projects(lambda c5t: c5t.list_projects_in_virtualization_realm(vr_id=5))
+    for project_name, projects in batch['results'].iteritems():
+        ...
+"""
+
+import logging
+import time
+
+from pycons3rt.logify import Logify
+
+from pycons3rtlibs import Cons3rtApiError, default_max_workers, map_concurrently
+
+
+# Set up logger name for this module
+mod_logger = Logify.get_name() + '.pycons3rtapi.cons3rtpool'
+
+
+class Cons3rtApiPool(object):
+
+    def __init__(self, cons3rt_api, max_workers=default_max_workers):
+        """Pool of Cons3rtApi instances, one for each project in the config data
+
+        :param cons3rt_api: (Cons3rtApi) loaded from the config file, each project's Cons3rtApi
+            is a view of it from get_project_api
+        :param max_workers: (int) maximum number of concurrent calls
+        """
+        self.cls_logger = mod_logger + '.Cons3rtApiPool'
+        self.cons3rt_api = cons3rt_api
+        self.max_workers = max_workers
+
+    def get_project_names(self):
+        """Returns the names of the configured projects
+
+        :return: (list) of project names
+        """
+        return [rest_user.project_name for rest_user in self.cons3rt_api.user_list]
+
+    def get_api(self, project_name):
+        """Returns the Cons3rtApi for a project, creating it on first use
+
+        :param project_name: (str) name of a configured project
+        :return: (Cons3rtApi)
+        :raises: Cons3rtApiError
+        """
+        return self.cons3rt_api.get_project_api(project_name=project_name)
+
+    def map_projects(self, func, project_names=None):
+        """Calls func concurrently with the Cons3rtApi for each project
+
+        :param func: function that takes a Cons3rtApi
+        :param project_names: (list) of project names, all configured projects if None
+        :return: (dict) with keys: results (dict of project name to result), and errors (dict of
+            project name to error message)
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.map_projects')
+        if project_names is None:
+            project_names = self.get_project_names()
+        if not project_names:
+            raise Cons3rtApiError('No projects are configured')
+
+        # Create every Cons3rtApi first so unknown projects fail before any call is made
+        apis = dict((project_name, self.get_api(project_name=project_name)) for project_name in project_names)
+
+        start_time = time.time()
+        batch = {'results': {}, 'errors': {}}
+        for project_name, result, ex in map_concurrently(
+                lambda name: func(apis[name]), project_names, max_workers=self.max_workers):
+            if ex is None:
+                batch['results'][project_name] = result
+            else:
+                batch['errors'][project_name] = '{n}: {e}'.format(n=ex.__class__.__name__, e=str(ex))
+        log.info('Ran calls for {n} projects in {t} seconds with {e} errors'.format(
+            n=str(len(project_names)), t=str(round(time.time() - start_time, 2)), e=str(len(batch['errors']))))
+        return batch
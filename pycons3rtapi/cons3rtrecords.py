@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+"""
+Compact record types for listing results
+
+Listing calls return a dict for each record with the full nested payload.
+Processes that hold many records can request these instead, which keep a
+few typed attributes in __slots__ and the payload as compact JSON text that
+is only decoded when .raw is accessed.
+
+    runs = c5t.list_deployment_runs_in_virtualization_realm(vr_id=5, as_records=True)
+    active = [run.id for run in runs if run.fap_status == 'RESERVED']
+"""
+
+import json
+
+from pycons3rtlibs import decode_json
+
+
+def get_path(data, path):
+    """Returns the value at a path of keys in nested dicts
+
+    :param data: (dict) record data
+    :param path: (tuple) of keys
+    :return: value, or None when a key is missing
+    """
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+class Record(object):
+    """Base class for compact records
+
+    Subclasses define specs as (attribute, path) tuples, and set __slots__ to the
+    attribute names with record_slots(specs).
+    """
+    __slots__ = ('_raw',)
+    specs = ()
+
+    def __init__(self, data, keep_raw=True):
+        """Creates a record from a listing dict
+
+        :param data: (dict) record data from the API
+        :param keep_raw: (bool) set False to drop the payload and keep only the attributes
+        """
+        for attribute, path in self.specs:
+            setattr(self, attribute, get_path(data, path))
+        if keep_raw:
+            self._raw = json.dumps(data, separators=(',', ':'))
+        else:
+            self._raw = None
+
+    @property
+    def raw(self):
+        """Returns the full payload, decoded on each access so it is not held in memory
+
+        :return: (dict) record data, or None if the record was created with keep_raw=False
+        """
+        if self._raw is None:
+            return None
+        return decode_json(self._raw)
+
+    def __getitem__(self, key):
+        """Supports dict-style access to top-level keys for code written for listing dicts
+
+        :param key: (str) top-level key from the API payload
+        :return: value
+        :raises: KeyError
+        """
+        for attribute, path in self.specs:
+            if path == (key,):
+                return getattr(self, attribute)
+        raw = self.raw
+        if raw is None:
+            raise KeyError(key)
+        return raw[key]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        """Returns the typed attributes as a dict
+
+        :return: (dict) of attribute name to value
+        """
+        return dict((attribute, getattr(self, attribute)) for attribute, _ in self.specs)
+
+    def __repr__(self):
+        return '{c}(id={i}, name={n})'.format(
+            c=self.__class__.__name__, i=str(getattr(self, 'id', None)), n=repr(getattr(self, 'name', None)))
+
+
+def record_slots(specs):
+    return tuple(attribute for attribute, _ in specs)
+
+
+class DeploymentRunRecord(Record):
+    specs = (
+        ('id', ('id',)),
+        ('name', ('name',)),
+        ('fap_status', ('fapStatus',)),
+        ('deployment_run_status', ('deploymentRunStatus',)),
+        ('project_id', ('project', 'id')),
+        ('project_name', ('project', 'name')),
+        ('creator_username', ('creator', 'username'))
+    )
+    __slots__ = record_slots(specs)
+
+
+class ProjectRecord(Record):
+    specs = (
+        ('id', ('id',)),
+        ('name', ('name',)),
+        ('description', ('description',))
+    )
+    __slots__ = record_slots(specs)
+
+
+class VirtualizationRealmRecord(Record):
+    specs = (
+        ('id', ('id',)),
+        ('name', ('name',)),
+        ('state', ('state',)),
+        ('virtualization_realm_type', ('virtualizationRealmType',)),
+        ('remote_access_status', ('remoteAccessStatus',))
+    )
+    __slots__ = record_slots(specs)
+
+
+class CloudRecord(Record):
+    specs = (
+        ('id', ('id',)),
+        ('name', ('name',)),
+        ('cloud_type', ('cloudType',))
+    )
+    __slots__ = record_slots(specs)
+
+
+class TeamRecord(Record):
+    specs = (
+        ('id', ('id',)),
+        ('name', ('name',))
+    )
+    __slots__ = record_slots(specs)
+
+
+class UserRecord(Record):
+    specs = (
+        ('id', ('id',)),
+        ('username', ('username',)),
+        ('email', ('email',)),
+        ('firstname', ('firstname',)),
+        ('lastname', ('lastname',))
+    )
+    __slots__ = record_slots(specs)
+
+    def __repr__(self):
+        return 'UserRecord(id={i}, username={u})'.format(i=str(self.id), u=repr(self.username))
+
+
+def to_records(record_class, data):
+    """Converts a page of listing dicts to records
+
+    :param record_class: (type) Record subclass
+    :param data: (list) of dicts
+    :return: (list) of records
+    """
+    return [record_class(item) for item in data]
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+"""
+Places deployment runs on the least loaded virtualization realm
+
+The load of each VR is its number of active runs plus the runs placed on it
+since its last refresh.  VR state is cached and only VRs older than the
+refresh interval are queried again, so placing many runs does not query
+every VR for each placement.  Runs that cannot be placed because every
+eligible VR is at its limit stay queued until run_pending is called again.
+
+    scheduler = DeploymentScheduler(cons3rt_api=c5t, vr_ids=[5, 6, 7], max_active_per_vr=20)
+    scheduler.submit(deployment_id=10, run_options=options)
+    launched = scheduler.run_pending()
+"""
+
+import logging
+import sys
+import threading
+import time
+from collections import deque
+
+from pycons3rt.logify import Logify
+
+from pycons3rtlibs import Cons3rtApiError, Cons3rtClientError, default_max_workers, map_concurrently
+
+
+# Set up logger name for this module
+mod_logger = Logify.get_name() + '.pycons3rtapi.cons3rtscheduler'
+
+# Run option that selects the virtualization realm for a deployment run
+vr_id_run_option = 'virtualizationRealmId'
+
+
+class DeploymentScheduler(object):
+
+    def __init__(self, cons3rt_api, vr_ids, max_active_per_vr=10, refresh_interval_sec=300,
+                 search_type='SEARCH_ACTIVE', eligible_states=None, max_workers=default_max_workers):
+        """Places deployment runs on virtualization realms
+
+        :param cons3rt_api: (Cons3rtApi) API used to query the site and launch runs
+        :param vr_ids: (list) of virtualization realm IDs runs may be placed on
+        :param max_active_per_vr: (int) maximum active runs in each VR, or (dict) of VR ID to
+            the maximum, VRs not in the dict have no limit
+        :param refresh_interval_sec: (float) seconds before the cached state of a VR is queried again
+        :param search_type: (str) search type used to count the active runs in a VR
+        :param eligible_states: (list) of VR states runs may be placed in, None for any state
+        :param max_workers: (int) maximum number of concurrent queries when refreshing VRs
+        """
+        self.cls_logger = mod_logger + '.DeploymentScheduler'
+        self.cons3rt_api = cons3rt_api
+        self.vr_ids = [int(vr_id) for vr_id in vr_ids]
+        self.max_active_per_vr = max_active_per_vr
+        self.refresh_interval_sec = refresh_interval_sec
+        self.search_type = search_type
+        self.eligible_states = eligible_states
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+
+        # Cached VR state, dict of VR ID to a dict with keys: details, active, placed (list of
+        # placement times since the last refresh), and refresh_time
+        self.vrs = {}
+
+        # Cached bindings, dict of (deployment ID, VR ID) to True when the deployment can run in the VR
+        self.bindings = {}
+
+        # Launches waiting for a VR with capacity
+        self.pending = deque()
+
+    def get_limit(self, vr_id):
+        """Returns the maximum number of active runs for a VR
+
+        :param vr_id: (int) virtualization realm ID
+        :return: (int) maximum, or None for no limit
+        """
+        if isinstance(self.max_active_per_vr, dict):
+            return self.max_active_per_vr.get(vr_id)
+        return self.max_active_per_vr
+
+    def query_vr(self, vr_id):
+        """Queries the details and active run count of a VR
+
+        :param vr_id: (int) virtualization realm ID
+        :return: (dict) VR state
+        :raises: Cons3rtApiError
+        """
+        start_time = time.time()
+        details = self.cons3rt_api.get_virtualization_realm_details(vr_id=vr_id)
+        active = 0
+        for _ in self.cons3rt_api.iter_deployment_runs_in_virtualization_realm(
+                vr_id=vr_id, search_type=self.search_type, fields=('id',)):
+            active += 1
+        return {'details': details, 'active': active, 'placed': [], 'refresh_time': start_time}
+
+    def refresh(self, force=False):
+        """Queries VRs whose cached state is older than the refresh interval
+
+        :param force: (bool) set True to query every VR
+        :return: (list) of VR IDs that were refreshed
+        """
+        log = logging.getLogger(self.cls_logger + '.refresh')
+        now = time.time()
+        with self.lock:
+            stale = [vr_id for vr_id in self.vr_ids if force or vr_id not in self.vrs or
+                     now - self.vrs[vr_id]['refresh_time'] > self.refresh_interval_sec]
+        if not stale:
+            return []
+
+        refreshed = []
+        for vr_id, state, ex in map_concurrently(self.query_vr, stale, max_workers=self.max_workers):
+            if ex is not None:
+                log.warn('{n}: Unable to refresh VR ID {v}, runs will not be placed on it until it is '
+                         'refreshed\n{e}'.format(n=ex.__class__.__name__, v=str(vr_id), e=str(ex)))
+                with self.lock:
+                    self.vrs.pop(vr_id, None)
+                continue
+            with self.lock:
+                # Keep placements made during the query, the listing may not include them
+                previous = self.vrs.get(vr_id)
+                if previous is not None:
+                    state['placed'] = [t for t in previous['placed'] if t >= state['refresh_time']]
+                self.vrs[vr_id] = state
+            refreshed.append(vr_id)
+        log.info('Refreshed {n} of {t} virtualization realms'.format(n=str(len(refreshed)), t=str(len(self.vr_ids))))
+        return refreshed
+
+    def get_eligible_vr_ids(self, deployment_id):
+        """Returns the VRs the deployment has bindings in, querying bindings only once per VR
+
+        :param deployment_id: (int) deployment ID
+        :return: (list) of VR IDs
+        """
+        log = logging.getLogger(self.cls_logger + '.get_eligible_vr_ids')
+        unknown = [vr_id for vr_id in self.vr_ids if (deployment_id, vr_id) not in self.bindings]
+
+        def has_bindings(vr_id):
+            return bool(self.cons3rt_api.get_deployment_bindings_for_virtualization_realm(
+                deployment_id=deployment_id, vr_id=vr_id))
+
+        for vr_id, bound, ex in map_concurrently(has_bindings, unknown, max_workers=self.max_workers):
+            if ex is not None:
+                log.warn('{n}: Unable to query bindings for deployment ID {d} in VR ID {v}\n{e}'.format(
+                    n=ex.__class__.__name__, d=str(deployment_id), v=str(vr_id), e=str(ex)))
+                continue
+            self.bindings[(deployment_id, vr_id)] = bound
+        return [vr_id for vr_id in self.vr_ids if self.bindings.get((deployment_id, vr_id))]
+
+    def get_loads(self):
+        """Returns the cached load of each VR
+
+        :return: (dict) of VR ID to the number of active and newly placed runs
+        """
+        with self.lock:
+            return dict((vr_id, state['active'] + len(state['placed'])) for vr_id, state in self.vrs.iteritems())
+
+    def place(self, deployment_id):
+        """Reserves capacity for a run on the least loaded eligible VR
+
+        :param deployment_id: (int) deployment ID
+        :return: (int) VR ID, or None if every eligible VR is at its limit
+        """
+        self.refresh()
+        eligible = self.get_eligible_vr_ids(deployment_id=deployment_id)
+        with self.lock:
+            best_vr_id = None
+            best_load = None
+            for vr_id in eligible:
+                state = self.vrs.get(vr_id)
+                if state is None:
+                    continue
+                if self.eligible_states is not None and state['details'].get('state') not in self.eligible_states:
+                    continue
+                load = state['active'] + len(state['placed'])
+                limit = self.get_limit(vr_id)
+                if limit is not None and load >= limit:
+                    continue
+                if best_load is None or load < best_load:
+                    best_vr_id = vr_id
+                    best_load = load
+            if best_vr_id is not None:
+                self.vrs[best_vr_id]['placed'].append(time.time())
+        return best_vr_id
+
+    def release(self, vr_id):
+        """Returns capacity reserved by place when a run was not launched or has been released,
+        until the next refresh counts the active runs
+
+        :param vr_id: (int) virtualization realm ID
+        :return: None
+        """
+        with self.lock:
+            state = self.vrs.get(vr_id)
+            if state is not None and state['placed']:
+                state['placed'].pop()
+            elif state is not None and state['active'] > 0:
+                state['active'] -= 1
+
+    def submit(self, deployment_id, run_options):
+        """Queues a run to launch on the least loaded eligible VR
+
+        :param deployment_id: (int) deployment ID
+        :param run_options: (dict) run options, the VR is set when the run is placed
+        :return: (dict) launch with keys: deployment_id, run_options, vr_id, dr_id, and error,
+            updated when the run is launched
+        :raises: Cons3rtApiError
+        """
+        try:
+            deployment_id = int(deployment_id)
+        except (TypeError, ValueError):
+            raise Cons3rtApiError('deployment_id arg must be an Integer, found: {t}'.format(
+                t=deployment_id.__class__.__name__))
+        if not isinstance(run_options, dict):
+            raise Cons3rtApiError('run_options arg must be a dict, found: {t}'.format(
+                t=run_options.__class__.__name__))
+        launch = {'deployment_id': deployment_id, 'run_options': run_options, 'vr_id': None, 'dr_id': None,
+                  'error': None}
+        self.pending.append(launch)
+        return launch
+
+    def run_pending(self):
+        """Places and launches queued runs in order, leaving runs that do not fit queued
+
+        :return: (list) of launches that were submitted to the site, check error for failures
+        """
+        log = logging.getLogger(self.cls_logger + '.run_pending')
+        submitted = []
+        waiting = deque()
+        while self.pending:
+            launch = self.pending.popleft()
+            vr_id = self.place(deployment_id=launch['deployment_id'])
+            if vr_id is None:
+                waiting.append(launch)
+                continue
+            run_options = dict(launch['run_options'])
+            run_options[vr_id_run_option] = vr_id
+            launch['vr_id'] = vr_id
+            try:
+                launch['dr_id'] = self.cons3rt_api.run_deployment(
+                    deployment_id=launch['deployment_id'], run_options=run_options)
+            except (Cons3rtApiError, Cons3rtClientError):
+                _, ex, _ = sys.exc_info()
+                launch['error'] = '{n}: {e}'.format(n=ex.__class__.__name__, e=str(ex))
+                log.warn('Unable to launch deployment ID {d} in VR ID {v}\n{e}'.format(
+                    d=str(launch['deployment_id']), v=str(vr_id), e=launch['error']))
+                self.release(vr_id=vr_id)
+            submitted.append(launch)
+        self.pending = waiting
+        log.info('Launched {n} runs, {w} runs are waiting for capacity'.format(
+            n=str(len([l for l in submitted if l['error'] is None])), w=str(len(waiting))))
+        return submitted
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Runs the same calls against several CONS3RT sites
+
+Each site has its own Cons3rtApi loaded from its own config file, with its
+own connection pool size, request rate limit, and read cache.  Sites are
+queried concurrently and results are returned per site.
+
+Site config files use the same format as ~/.cons3rt/config.json, and by
+default are found at ~/.cons3rt/<site>.json for each site in site_urls:
+
+    manager = Cons3rtSiteManager()
+    manager.add_configured_sites(rate_per_sec=5)
+    batch = manager.map_sites(lambda c5t: c5t.list_projects(fields=('id', 'name')))
+    for site_name, projects in batch['results'].iteritems():
+        ...
+"""
+
+import logging
+import os
+import threading
+import time
+
+from pycons3rt.logify import Logify
+
+from cons3rtapi import Cons3rtApi
+from cons3rtconfig import cons3rtapi_config_dir, site_urls
+from pycons3rtlibs import Cons3rtApiError, RateLimiter, default_max_workers, map_concurrently
+
+
+# Set up logger name for this module
+mod_logger = Logify.get_name() + '.pycons3rtapi.cons3rtsites'
+
+
+def get_site_config_file(site_name):
+    """Returns the default config file path for a site
+
+    :param site_name: (str) site name, e.g. hmc or qa
+    :return: (str) path to ~/.cons3rt/<site>.json
+    """
+    return os.path.join(cons3rtapi_config_dir, '{s}.json'.format(s=site_name))
+
+
+class Cons3rtSiteManager(object):
+
+    def __init__(self, max_workers=default_max_workers):
+        """Holds a Cons3rtApi for each site
+
+        :param max_workers: (int) maximum number of sites queried at once
+        """
+        self.cls_logger = mod_logger + '.Cons3rtSiteManager'
+        self.max_workers = max_workers
+        self.sites = {}
+        self.lock = threading.Lock()
+
+    def add_site(self, site_name, cons3rt_api=None, config_file=None, rate_per_sec=None,
+                 pool_maxsize=default_max_workers, read_cache_ttl_sec=0):
+        """Adds a site
+
+        :param site_name: (str) name used for the site in results
+        :param cons3rt_api: (Cons3rtApi) for the site, loaded from config_file if None
+        :param config_file: (str) path to the site config file, defaults to ~/.cons3rt/<site>.json
+        :param rate_per_sec: (float) maximum requests per second to the site, None for no limit
+        :param pool_maxsize: (int) connections to keep open to the site
+        :param read_cache_ttl_sec: (int) seconds to cache GET content from the site, 0 to disable
+        :return: (Cons3rtApi) for the site
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.add_site')
+        if cons3rt_api is None:
+            if config_file is None:
+                config_file = get_site_config_file(site_name=site_name)
+            cons3rt_api = Cons3rtApi(config_file=config_file)
+        http_client = cons3rt_api.cons3rt_client.http_client
+        http_client.pool_maxsize = pool_maxsize
+        if rate_per_sec:
+            http_client.rate_limiter = RateLimiter(rate_per_sec=rate_per_sec)
+        cons3rt_api.cons3rt_client.read_cache_ttl_sec = read_cache_ttl_sec
+        with self.lock:
+            self.sites[site_name] = cons3rt_api
+        log.info('Added site {s} with URL: {u}'.format(s=site_name, u=cons3rt_api.url_base))
+        return cons3rt_api
+
+    def add_configured_sites(self, **kwargs):
+        """Adds each site in site_urls that has a config file at ~/.cons3rt/<site>.json
+
+        :param kwargs: settings passed to add_site for each site
+        :return: (list) of site names added
+        :raises: Cons3rtApiError
+        """
+        added = []
+        for site_name in sorted(site_urls.keys()):
+            if os.path.isfile(get_site_config_file(site_name=site_name)):
+                self.add_site(site_name=site_name, **kwargs)
+                added.append(site_name)
+        return added
+
+    def get_site_names(self):
+        with self.lock:
+            return sorted(self.sites.keys())
+
+    def get_api(self, site_name):
+        """Returns the Cons3rtApi for a site
+
+        :param site_name: (str) site name
+        :return: (Cons3rtApi)
+        :raises: Cons3rtApiError
+        """
+        with self.lock:
+            cons3rt_api = self.sites.get(site_name)
+        if cons3rt_api is None:
+            raise Cons3rtApiError('Site not added: {s}'.format(s=site_name))
+        return cons3rt_api
+
+    def map_sites(self, func, site_names=None):
+        """Calls func concurrently with the Cons3rtApi for each site
+
+        :param func: function that takes a Cons3rtApi
+        :param site_names: (list) of site names, all added sites if None
+        :return: (dict) with keys: results (dict of site name to result), and errors (dict of
+            site name to error message)
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.map_sites')
+        if site_names is None:
+            site_names = self.get_site_names()
+        if not site_names:
+            raise Cons3rtApiError('No sites have been added')
+        apis = dict((site_name, self.get_api(site_name=site_name)) for site_name in site_names)
+
+        start_time = time.time()
+        batch = {'results': {}, 'errors': {}}
+        for site_name, result, ex in map_concurrently(
+                lambda name: func(apis[name]), site_names, max_workers=self.max_workers):
+            if ex is None:
+                batch['results'][site_name] = result
+            else:
+                batch['errors'][site_name] = '{n}: {e}'.format(n=ex.__class__.__name__, e=str(ex))
+                log.warn('Call failed for site {s}\n{e}'.format(s=site_name, e=batch['errors'][site_name]))
+        log.info('Ran calls for {n} sites in {t} seconds with {e} errors'.format(
+            n=str(len(site_names)), t=str(round(time.time() - start_time, 2)), e=str(len(batch['errors']))))
+        return batch
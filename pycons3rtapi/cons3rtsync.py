@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+"""
+Incremental inventory sync for a CONS3RT site
+
+Summaries are listed on every sync, and details are only re-fetched for
+records whose summary changed since the last snapshot.  Each sync returns
+a change feed of added, removed, and modified entities.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+
+from pycons3rt.logify import Logify
+
+from pycons3rtlibs import Cons3rtApiError, Cons3rtClientError, default_max_workers
+
+
+# Set up logger name for this module
+mod_logger = Logify.get_name() + '.pycons3rtapi.cons3rtsync'
+
+# Entity types tracked by the inventory sync
+entity_types = [
+    'project',
+    'virtualization_realm',
+    'deployment_run'
+]
+
+
+class InventorySync(object):
+
+    def __init__(self, cons3rt_api, vr_ids=None, search_type='SEARCH_ALL', summary_fields=None,
+                 fetch_details=True, max_workers=default_max_workers, member_projects_only=False):
+        """Tracks site inventory between syncs
+
+        :param cons3rt_api: (Cons3rtApi) API used to query the site
+        :param vr_ids: (list) of virtualization realm IDs to track, all VRs in all clouds if None
+        :param search_type: (str) search type used to list deployment runs in each VR
+        :param summary_fields: (dict) of entity type to a list of summary fields used to detect
+            changes, the full summary is compared for entity types not included
+        :param fetch_details: (bool) set False to track summaries only
+        :param max_workers: (int) maximum number of concurrent detail requests
+        :param member_projects_only: (bool) set True to track only the projects the user is a
+            member of, all projects on the site are tracked by default
+        """
+        self.cls_logger = mod_logger + '.InventorySync'
+        self.cons3rt_api = cons3rt_api
+        self.vr_ids = vr_ids
+        self.search_type = search_type
+        self.summary_fields = summary_fields if summary_fields else {}
+        self.fetch_details = fetch_details
+        self.max_workers = max_workers
+        self.member_projects_only = member_projects_only
+        self.snapshot = {}
+        for entity_type in entity_types:
+            self.snapshot[entity_type] = {}
+        self.last_sync_time = None
+
+        # Details already fetched by the last list_summaries, dict of entity type to a dict
+        # of ID to details, reused by sync instead of fetching them again
+        self.listed_details = {}
+
+    def fingerprint(self, entity_type, summary):
+        """Returns a fingerprint of the summary fields used to detect changes
+
+        :param entity_type: (str) entity type
+        :param summary: (dict) summary record from a listing
+        :return: (str) fingerprint
+        """
+        fields = self.summary_fields.get(entity_type)
+        if fields:
+            summary = dict((field, summary.get(field)) for field in fields)
+        return hashlib.sha1(json.dumps(summary, sort_keys=True)).hexdigest()
+
+    def list_summaries(self):
+        """Lists summaries for each tracked entity type
+
+        :return: (dict) of entity type to a dict of ID to summary
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.list_summaries')
+        summaries = {}
+        self.listed_details = {}
+        for entity_type in entity_types:
+            summaries[entity_type] = {}
+            self.listed_details[entity_type] = {}
+
+        try:
+            if self.member_projects_only:
+                projects = self.cons3rt_api.list_projects()
+            else:
+                projects = self.cons3rt_api.list_all_projects()
+            if self.vr_ids is None:
+                vrs = []
+                for cloud in self.cons3rt_api.list_clouds():
+                    vrs += self.cons3rt_api.list_virtualization_realms_for_cloud(cloud_id=cloud['id'])
+            else:
+                # There is no listing of selected VRs, so their details are fetched concurrently
+                # and used as both the summary and the details
+                batch = self.cons3rt_api.fetch_batch(
+                    fetch=lambda vr_id: self.cons3rt_api.get_virtualization_realm_details(vr_id=vr_id),
+                    ids=self.vr_ids,
+                    max_workers=self.max_workers
+                )
+                if batch['errors']:
+                    raise Cons3rtApiError('Unable to retrieve details for VR IDs: {e}'.format(e=str(batch['errors'])))
+                vrs = batch['results'].values()
+                self.listed_details['virtualization_realm'] = dict((vr['id'], vr) for vr in vrs)
+        except (Cons3rtApiError, Cons3rtClientError):
+            _, ex, trace = sys.exc_info()
+            msg = '{n}: There was a problem listing project and virtualization realm summaries\n{e}'.format(
+                n=ex.__class__.__name__, e=str(ex))
+            raise Cons3rtApiError, msg, trace
+
+        for project in projects:
+            summaries['project'][project['id']] = project
+        for vr in vrs:
+            summaries['virtualization_realm'][vr['id']] = vr
+
+        for vr_id in summaries['virtualization_realm'].keys():
+            try:
+                drs = self.cons3rt_api.list_deployment_runs_in_virtualization_realm(
+                    vr_id=vr_id, search_type=self.search_type)
+            except (Cons3rtApiError, Cons3rtClientError):
+                _, ex, trace = sys.exc_info()
+                msg = '{n}: There was a problem listing deployment runs in VR ID: {i}\n{e}'.format(
+                    n=ex.__class__.__name__, i=str(vr_id), e=str(ex))
+                raise Cons3rtApiError, msg, trace
+            for dr in drs:
+                summaries['deployment_run'][dr['id']] = dr
+
+        log.debug('Listed summaries for {p} projects, {v} virtualization realms, and {d} runs'.format(
+            p=str(len(summaries['project'])), v=str(len(summaries['virtualization_realm'])),
+            d=str(len(summaries['deployment_run']))))
+        return summaries
+
+    def get_details(self, entity_type, entity_id):
+        """Queries details for a single entity
+
+        :param entity_type: (str) entity type
+        :param entity_id: (int) ID of the entity
+        :return: (dict) details
+        :raises: Cons3rtApiError
+        """
+        if entity_type == 'project':
+            return self.cons3rt_api.get_project_details(project_id=entity_id)
+        elif entity_type == 'virtualization_realm':
+            return self.cons3rt_api.get_virtualization_realm_details(vr_id=entity_id)
+        elif entity_type == 'deployment_run':
+            return self.cons3rt_api.retrieve_deployment_run_details(dr_id=entity_id)
+        raise Cons3rtApiError('Unknown entity type: {t}'.format(t=entity_type))
+
+    def sync(self):
+        """Compares current summaries to the last snapshot, fetches details for added
+        and modified entities, and updates the snapshot
+
+        :return: (list) of change dicts with keys: entity_type, id, change (added, removed,
+            or modified), summary, and details
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.sync')
+        start_time = time.time()
+        summaries = self.list_summaries()
+        changes = []
+
+        for entity_type in entity_types:
+            previous = self.snapshot[entity_type]
+            current = {}
+            changed = {}
+            for entity_id, summary in summaries[entity_type].iteritems():
+                fingerprint = self.fingerprint(entity_type=entity_type, summary=summary)
+                record = previous.get(entity_id)
+                if record is not None and record['fingerprint'] == fingerprint:
+                    current[entity_id] = record
+                else:
+                    changed[entity_id] = fingerprint
+
+            # Fetch details for added and modified entities concurrently, reusing details
+            # already fetched to list the summaries
+            details = {}
+            listed = self.listed_details.get(entity_type, {})
+            if self.fetch_details:
+                details = dict((entity_id, listed[entity_id]) for entity_id in changed if entity_id in listed)
+            to_fetch = [entity_id for entity_id in changed if entity_id not in details]
+            if self.fetch_details and to_fetch:
+                batch = self.cons3rt_api.fetch_batch(
+                    fetch=lambda an_id, t=entity_type: self.get_details(entity_type=t, entity_id=an_id),
+                    ids=to_fetch,
+                    max_workers=self.max_workers
+                )
+                details.update(batch['results'])
+                for entity_id, err in batch['errors'].iteritems():
+                    log.warn('Unable to retrieve details for {t} ID {i}, will retry on the next sync\n{e}'.format(
+                        t=entity_type, i=str(entity_id), e=err))
+                    if entity_id in previous:
+                        current[entity_id] = previous[entity_id]
+                    del changed[entity_id]
+
+            for entity_id, fingerprint in changed.iteritems():
+                summary = summaries[entity_type][entity_id]
+                current[entity_id] = {
+                    'fingerprint': fingerprint,
+                    'summary': summary,
+                    'details': details.get(entity_id)
+                }
+                changes.append({
+                    'entity_type': entity_type,
+                    'id': entity_id,
+                    'change': 'added' if entity_id not in previous else 'modified',
+                    'summary': summary,
+                    'details': details.get(entity_id)
+                })
+            for entity_id, record in previous.iteritems():
+                if entity_id not in summaries[entity_type]:
+                    changes.append({
+                        'entity_type': entity_type,
+                        'id': entity_id,
+                        'change': 'removed',
+                        'summary': record['summary'],
+                        'details': record['details']
+                    })
+            self.snapshot[entity_type] = current
+
+        self.last_sync_time = time.time()
+        log.info('Inventory sync found {n} changes in {t} seconds'.format(
+            n=str(len(changes)), t=str(round(self.last_sync_time - start_time, 2))))
+        return changes
+
+    def get_inventory(self, entity_type):
+        """Returns the details (or summaries if details were not fetched) from the last snapshot
+
+        :param entity_type: (str) entity type
+        :return: (dict) of ID to details
+        """
+        inventory = {}
+        for entity_id, record in self.snapshot[entity_type].iteritems():
+            inventory[entity_id] = record['details'] if record['details'] is not None else record['summary']
+        return inventory
+
+    def save_snapshot(self, snapshot_file):
+        """Saves the snapshot so a later process can resume incremental syncs
+
+        :param snapshot_file: (str) path to the snapshot file
+        :return: None
+        :raises: Cons3rtApiError
+        """
+        data = {'last_sync_time': self.last_sync_time, 'snapshot': self.snapshot}
+        try:
+            with open(snapshot_file, 'w') as f:
+                json.dump(data, f)
+        except (OSError, IOError):
+            _, ex, trace = sys.exc_info()
+            msg = 'Unable to write the inventory snapshot file: {f}\n{e}'.format(f=snapshot_file, e=str(ex))
+            raise Cons3rtApiError, msg, trace
+
+    def load_snapshot(self, snapshot_file):
+        """Loads a snapshot saved by save_snapshot
+
+        :param snapshot_file: (str) path to the snapshot file
+        :return: None
+        :raises: Cons3rtApiError
+        """
+        if not os.path.isfile(snapshot_file):
+            raise Cons3rtApiError('Inventory snapshot file not found: {f}'.format(f=snapshot_file))
+        try:
+            with open(snapshot_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, IOError, ValueError):
+            _, ex, trace = sys.exc_info()
+            msg = 'Unable to read the inventory snapshot file: {f}\n{e}'.format(f=snapshot_file, e=str(ex))
+            raise Cons3rtApiError, msg, trace
+
+        # JSON object keys are strings, restore the int IDs
+        for entity_type in entity_types:
+            self.snapshot[entity_type] = {}
+            for entity_id, record in data['snapshot'].get(entity_type, {}).iteritems():
+                self.snapshot[entity_type][int(entity_id)] = record
+        self.last_sync_time = data.get('last_sync_time')
@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+"""
+Timing spans for Cons3rtApi methods and the HTTP requests they make
+
+Tracing is off until a Tracer is set.  Each Cons3rtApi method call and each
+HTTP request is then recorded as a span with its parent, start and end times,
+and attributes such as the endpoint, IDs, HTTP status, and retries.  Time a
+span spent outside its child spans is time spent in local work or sleeping
+between retries, which are recorded as their own sleep spans.
+
+Spans are kept per thread, so calls made from worker threads, such as those
+in map_concurrently, start their own traces.  When the first span of a trace
+ends, the whole trace is passed to the exporter:
+
+    c5t = Cons3rtApi()
+    c5t.set_tracer(Tracer(exporter=JsonFileExporter(trace_file='traces.jsonl')))
+    c5t.toggle_remote_access(vr_id=5)
+"""
+
+import functools
+import inspect
+import json
+import logging
+import sys
+import threading
+import time
+import types
+import uuid
+
+from pycons3rt.logify import Logify
+
+from pycons3rtlibs import Cons3rtApiError
+
+
+# Set up logger name for this module
+mod_logger = Logify.get_name() + '.pycons3rtapi.cons3rttracing'
+
+
+class Span(object):
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        """Timing of a single operation
+
+        :param name: (str) operation name
+        :param trace_id: (str) ID of the trace the span belongs to
+        :param parent_id: (str) ID of the parent span, None for the first span of a trace
+        :param attributes: (dict) attributes of the operation
+        """
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes) if attributes else {}
+        self.start_time = time.time()
+        self.end_time = None
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def increment_attribute(self, key, amount=1):
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def to_dict(self):
+        """Returns the span as a JSON serializable dict
+
+        :return: (dict) span with times in epoch seconds and its duration in milliseconds
+        """
+        span = {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'duration_ms': None,
+            'attributes': self.attributes,
+            'error': self.error
+        }
+        if self.end_time is not None:
+            span['duration_ms'] = round((self.end_time - self.start_time) * 1000, 3)
+        return span
+
+
+class JsonFileExporter(object):
+
+    def __init__(self, trace_file):
+        """Appends each trace to a file as one line of JSON with keys: trace_id, and spans
+        (list of span dicts in the order they started)
+
+        :param trace_file: (str) path to the trace file
+        """
+        self.trace_file = trace_file
+        self.lock = threading.Lock()
+
+    def export(self, trace_id, spans):
+        """Writes a trace
+
+        :param trace_id: (str) trace ID
+        :param spans: (list) of span dicts
+        :return: None
+        :raises: Cons3rtApiError
+        """
+        line = json.dumps({'trace_id': trace_id, 'spans': spans}, sort_keys=True, default=str) + '\n'
+        with self.lock:
+            try:
+                with open(self.trace_file, 'a') as f:
+                    f.write(line)
+            except (OSError, IOError):
+                _, ex, trace = sys.exc_info()
+                msg = 'Unable to write to trace file: {f}\n{e}'.format(f=self.trace_file, e=str(ex))
+                raise Cons3rtApiError, msg, trace
+
+
+class Tracer(object):
+
+    def __init__(self, exporter=None):
+        """Records spans and passes each finished trace to the exporter
+
+        :param exporter: object with an export(trace_id, spans) method, e.g. JsonFileExporter,
+            None to only keep finished traces in memory, see get_traces
+        """
+        self.cls_logger = mod_logger + '.Tracer'
+        self.exporter = exporter
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+        # Finished spans of traces still in progress, dict of trace ID to a list of span dicts
+        self.open_traces = {}
+
+        # Finished traces when there is no exporter, list of (trace ID, spans) tuples
+        self.traces = []
+
+    def get_stack(self):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def current_span(self):
+        """Returns the innermost open span in this thread
+
+        :return: (Span) or None
+        """
+        stack = self.get_stack()
+        return stack[-1] if stack else None
+
+    def start_span(self, name, **attributes):
+        """Starts a span as a child of the current span in this thread, call end_span with
+        it when the operation is done
+
+        :param name: (str) operation name
+        :param attributes: attributes of the operation
+        :return: (Span)
+        """
+        parent = self.current_span()
+        if parent is None:
+            span = Span(name=name, trace_id=uuid.uuid4().hex, attributes=attributes)
+        else:
+            span = Span(name=name, trace_id=parent.trace_id, parent_id=parent.span_id, attributes=attributes)
+        self.get_stack().append(span)
+        return span
+
+    def end_span(self, span, error=None):
+        """Ends a span, exporting its trace when it is the first span of the trace
+
+        :param span: (Span) span from start_span
+        :param error: (Exception) error the operation ended with, if any
+        :return: None
+        """
+        log = logging.getLogger(self.cls_logger + '.end_span')
+        span.end_time = time.time()
+        if error is not None:
+            span.error = '{n}: {e}'.format(n=error.__class__.__name__, e=str(error))
+        stack = self.get_stack()
+        if span in stack:
+            del stack[stack.index(span):]
+        with self.lock:
+            spans = self.open_traces.setdefault(span.trace_id, [])
+            spans.append(span.to_dict())
+            if span.parent_id is not None:
+                return
+            del self.open_traces[span.trace_id]
+            spans.sort(key=lambda s: s['start_time'])
+            if self.exporter is None:
+                self.traces.append((span.trace_id, spans))
+                return
+        try:
+            self.exporter.export(trace_id=span.trace_id, spans=spans)
+        except Cons3rtApiError:
+            _, ex, _ = sys.exc_info()
+            log.warn('Unable to export trace {t}\n{e}'.format(t=span.trace_id, e=str(ex)))
+
+    def get_traces(self):
+        """Returns and clears the finished traces kept when there is no exporter
+
+        :return: (list) of (trace ID, list of span dicts) tuples
+        """
+        with self.lock:
+            traces = self.traces
+            self.traces = []
+        return traces
+
+    def span(self, name, **attributes):
+        """Returns a context manager that records a span around a block
+
+        :param name: (str) operation name
+        :param attributes: attributes of the operation
+        :return: (SpanContext)
+        """
+        return SpanContext(tracer=self, name=name, attributes=attributes)
+
+
+class SpanContext(object):
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.span = None
+
+    def __enter__(self):
+        self.span = self.tracer.start_span(self.name, **self.attributes)
+        return self.span
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.tracer.end_span(self.span, error=exc_value)
+        return False
+
+
+def untraced(func):
+    """Marks a method that trace_methods should leave unwrapped
+
+    :param func: function
+    :return: func
+    """
+    func.untraced = True
+    return func
+
+
+def get_id_attributes(arg_names, args, kwargs):
+    """Returns the ID args of a call as span attributes, e.g. vr_id and dr_id
+
+    :param arg_names: (list) of positional arg names, without self
+    :param args: (tuple) positional args, without self
+    :param kwargs: (dict) keyword args
+    :return: (dict) of arg name to value
+    """
+    attributes = {}
+    values = dict(zip(arg_names, args))
+    values.update(kwargs)
+    for name, value in values.iteritems():
+        if name == 'id' or name.endswith('_id') or name.endswith('_name'):
+            if value is None or isinstance(value, (basestring, int, long)):
+                attributes[name] = value
+    return attributes
+
+
+def trace_methods(cls, get_tracer):
+    """Wraps the public methods of a class so each call is recorded as a span when
+    get_tracer returns a Tracer.  Generator methods are not wrapped, the requests they
+    make are recorded under the caller's span.
+
+    :param cls: class to wrap
+    :param get_tracer: function that takes an instance of cls and returns its Tracer or None
+    :return: cls
+    """
+    def wrap(name, func):
+        arg_names = inspect.getargspec(func).args[1:]
+        span_name = '{c}.{n}'.format(c=cls.__name__, n=name)
+
+        @functools.wraps(func)
+        def traced(self, *args, **kwargs):
+            tracer = get_tracer(self)
+            if tracer is None:
+                return func(self, *args, **kwargs)
+            with tracer.span(span_name, **get_id_attributes(arg_names, args, kwargs)):
+                return func(self, *args, **kwargs)
+        return traced
+
+    for name, func in cls.__dict__.items():
+        if name.startswith('_') or not isinstance(func, types.FunctionType):
+            continue
+        if getattr(func, 'untraced', False) or inspect.isgeneratorfunction(func):
+            continue
+        setattr(cls, name, wrap(name, func))
+    return cls
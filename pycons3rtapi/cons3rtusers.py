@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Bulk user provisioning and project membership
+
+Reads users from a CSV or JSON lines file, creates the users that do not
+exist yet, and adds every user to their projects.  Existing users are found
+from a single listing of all site users, and requests run concurrently with
+an optional rate limit.
+
+CSV files have a header row.  The projects column holds project IDs separated
+by semicolons, and the other columns are sent as the user data:
+
+    username,email,firstname,lastname,projects
+    jsmith,jsmith@example.com,Jane,Smith,12;14
+
+JSON lines files have one user per line, with projects as a list of IDs:
+
+    {"username": "jsmith", "email": "jsmith@example.com", "projects": [12, 14]}
+"""
+
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from pycons3rt.logify import Logify
+
+from pycons3rtlibs import Cons3rtApiError, RateLimiter, default_max_workers, map_concurrently
+
+
+# Set up logger name for this module
+mod_logger = Logify.get_name() + '.pycons3rtapi.cons3rtusers'
+
+
+def read_users_file(users_file):
+    """Reads users from a CSV or JSON lines file, by file extension (.csv, or .jsonl/.json)
+
+    :param users_file: (str) path to the users file
+    :return: (list) of dicts with keys: user_data (dict) and projects (list of int project IDs)
+    :raises: Cons3rtApiError
+    """
+    if not os.path.isfile(users_file):
+        raise Cons3rtApiError('Users file not found: {f}'.format(f=users_file))
+    users = []
+    try:
+        with open(users_file, 'r') as f:
+            if users_file.lower().endswith('.csv'):
+                for row in csv.DictReader(f):
+                    projects = [p.strip() for p in (row.pop('projects', None) or '').split(';') if p.strip()]
+                    row = dict((key.strip(), value.strip()) for key, value in row.iteritems()
+                               if key and value is not None and value.strip())
+                    users.append({'user_data': row, 'projects': projects})
+            else:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    row = json.loads(line)
+                    projects = row.pop('projects', None) or []
+                    users.append({'user_data': row, 'projects': projects})
+    except (OSError, IOError, ValueError, csv.Error):
+        _, ex, trace = sys.exc_info()
+        msg = '{n}: Unable to read users file: {f}\n{e}'.format(n=ex.__class__.__name__, f=users_file, e=str(ex))
+        raise Cons3rtApiError, msg, trace
+
+    for line_num, user in enumerate(users):
+        if not user['user_data'].get('username'):
+            raise Cons3rtApiError('Entry {n} in users file {f} has no username'.format(
+                n=str(line_num + 1), f=users_file))
+        try:
+            user['projects'] = [int(project_id) for project_id in user['projects']]
+        except (TypeError, ValueError):
+            raise Cons3rtApiError('Projects for username {u} must be Integer project IDs, found: {p}'.format(
+                u=user['user_data']['username'], p=str(user['projects'])))
+    return users
+
+
+class UserProvisioner(object):
+
+    def __init__(self, cons3rt_api, max_workers=default_max_workers, rate_per_sec=None):
+        """Creates users and adds them to projects
+
+        :param cons3rt_api: (Cons3rtApi) API used to provision the users
+        :param max_workers: (int) maximum number of concurrent requests
+        :param rate_per_sec: (float) maximum requests per second, None for no limit
+        """
+        self.cls_logger = mod_logger + '.UserProvisioner'
+        self.cons3rt_api = cons3rt_api
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate_per_sec=rate_per_sec)
+        self.usernames = None
+        self.usernames_lock = threading.Lock()
+
+    def get_usernames(self, refresh=False):
+        """Returns the usernames on the site, listing all users once and caching the result
+
+        :param refresh: (bool) set True to list the users again
+        :return: (set) of usernames
+        :raises: Cons3rtApiError
+        """
+        with self.usernames_lock:
+            if self.usernames is None or refresh:
+                users = self.cons3rt_api.retrieve_all_users(fields=('username',))
+                self.usernames = set(user['username'] for user in users if user.get('username'))
+            return self.usernames
+
+    def provision(self, users):
+        """Creates users that do not exist and adds each user to their projects
+
+        :param users: (list) of dicts with keys: user_data (dict with at least username) and
+            projects (list of int project IDs), as returned by read_users_file
+        :return: (dict) summary with keys: created, existing, and failed (lists of usernames),
+            memberships_added (int), and errors (dict of username to a list of error messages)
+        :raises: Cons3rtApiError if the site users cannot be listed
+        """
+        log = logging.getLogger(self.cls_logger + '.provision')
+        start_time = time.time()
+        existing = self.get_usernames()
+        summary = {'created': [], 'existing': [], 'failed': [], 'memberships_added': 0, 'errors': {}}
+
+        def add_error(username, ex):
+            summary['errors'].setdefault(username, []).append('{n}: {e}'.format(n=ex.__class__.__name__, e=str(ex)))
+
+        # Create the new users, listing each username only once
+        to_create = []
+        seen = set()
+        for user in users:
+            username = user['user_data']['username']
+            if username in seen:
+                continue
+            seen.add(username)
+            if username in existing:
+                summary['existing'].append(username)
+            else:
+                to_create.append(user['user_data'])
+
+        def create(user_data):
+            self.rate_limiter.acquire()
+            self.cons3rt_api.create_user(user_data=user_data)
+
+        log.info('Creating {n} users, {e} users already exist'.format(
+            n=str(len(to_create)), e=str(len(summary['existing']))))
+        for user_data, _, ex in map_concurrently(create, to_create, max_workers=self.max_workers):
+            if ex is None:
+                summary['created'].append(user_data['username'])
+                with self.usernames_lock:
+                    existing.add(user_data['username'])
+            else:
+                summary['failed'].append(user_data['username'])
+                add_error(user_data['username'], ex)
+
+        # Add memberships for users that exist now
+        failed = set(summary['failed'])
+        memberships = []
+        seen = set()
+        for user in users:
+            username = user['user_data']['username']
+            if username in failed:
+                continue
+            for project_id in user['projects']:
+                if (username, project_id) not in seen:
+                    seen.add((username, project_id))
+                    memberships.append((username, project_id))
+
+        def add_membership(membership):
+            self.rate_limiter.acquire()
+            self.cons3rt_api.add_user_to_project(username=membership[0], project_id=membership[1])
+
+        for membership, _, ex in map_concurrently(add_membership, memberships, max_workers=self.max_workers):
+            if ex is None:
+                summary['memberships_added'] += 1
+            else:
+                add_error(membership[0], ex)
+
+        log.info('Provisioned users in {t} seconds: {c} created, {e} existing, {f} failed, {m} of {n} project '
+                 'memberships added'.format(t=str(round(time.time() - start_time, 1)), c=str(len(summary['created'])),
+                                            e=str(len(summary['existing'])), f=str(len(summary['failed'])),
+                                            m=str(summary['memberships_added']), n=str(len(memberships))))
+        return summary
+
+    def provision_file(self, users_file):
+        """Provisions the users in a CSV or JSON lines file
+
+        :param users_file: (str) path to the users file
+        :return: (dict) summary, see provision
+        :raises: Cons3rtApiError
+        """
+        return self.provision(users=read_users_file(users_file=users_file))
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+"""
+Waits for deployment runs to reach a fapStatus
+
+Tracks many deployment runs at once.  Runs in the same virtualization realm
+are polled together with one run listing for the VR, and details are only
+queried for runs whose VR is not known yet or that are missing from the
+listing.  The poll interval starts short, backs off while nothing changes,
+and resets when a run changes status.
+
+    waiter = DeploymentRunWaiter(cons3rt_api=c5t, on_transition=report)
+    waiter.add(dr_id=c5t.run_deployment(deployment_id=10, run_options=options), fap_statuses='RESERVED')
+    statuses = waiter.wait(timeout_sec=3600)
+"""
+
+import logging
+import sys
+import threading
+import time
+
+from pycons3rt.logify import Logify
+
+from cons3rtrecords import get_path
+from pycons3rtlibs import Cons3rtApiError, Cons3rtClientError, default_max_workers
+
+
+# Set up logger name for this module
+mod_logger = Logify.get_name() + '.pycons3rtapi.cons3rtwaiter'
+
+# Fields needed from each run in a VR run listing
+listing_fields = ('id', 'fapStatus', 'deploymentRunStatus')
+
+# Runs per page of a VR run listing, see Cons3rtApi.iter_deployment_runs_in_virtualization_realm
+listing_page_size = 40
+
+
+class DeploymentRunWaiter(object):
+
+    def __init__(self, cons3rt_api, min_interval_sec=5, max_interval_sec=60, backoff=1.5,
+                 search_type='SEARCH_ALL', min_runs_for_listing=2, on_transition=None, on_done=None,
+                 max_workers=default_max_workers, max_listing_pages=3):
+        """Waits for deployment runs to reach a fapStatus
+
+        :param cons3rt_api: (Cons3rtApi) API used to query the site
+        :param min_interval_sec: (float) seconds between polls after a run changes status
+        :param max_interval_sec: (float) maximum seconds between polls while nothing changes
+        :param backoff: (float) multiplier for the poll interval after a poll with no changes
+        :param search_type: (str) search type for VR run listings
+        :param min_runs_for_listing: (int) minimum number of tracked runs in a VR to poll them
+            with a VR run listing instead of a details query for each run
+        :param on_transition: function called as on_transition(dr_id, old_status, new_status, run)
+            when a run's fapStatus changes, old_status is None the first time a run is seen
+        :param on_done: function called as on_done(dr_id, status, run) when a run reaches one of
+            its fapStatus values
+        :param max_workers: (int) maximum number of concurrent details queries
+        :param max_listing_pages: (int) maximum pages of a VR run listing to read in each poll,
+            tracked runs not found in them are queried with details instead
+        """
+        self.cls_logger = mod_logger + '.DeploymentRunWaiter'
+        self.cons3rt_api = cons3rt_api
+        self.min_interval_sec = min_interval_sec
+        self.max_interval_sec = max_interval_sec
+        self.backoff = backoff
+        self.search_type = search_type
+        self.min_runs_for_listing = min_runs_for_listing
+        self.on_transition = on_transition
+        self.on_done = on_done
+        self.max_workers = max_workers
+        self.max_listing_pages = max_listing_pages
+        self.interval_sec = min_interval_sec
+
+        # Tracked runs, dict of DR ID to a dict with keys: fap_statuses, vr_id, status
+        self.pending = {}
+
+        # Runs that reached a fapStatus, dict of DR ID to the fapStatus
+        self.done = {}
+        self.stopped = threading.Event()
+
+    def add(self, dr_id, fap_statuses, vr_id=None):
+        """Tracks a deployment run until it reaches one of the fapStatus values
+
+        :param dr_id: (int) deployment run ID
+        :param fap_statuses: (str) or (list) of fapStatus values to wait for
+        :param vr_id: (int) ID of the run's virtualization realm, found from the run details if None
+        :return: None
+        :raises: Cons3rtApiError
+        """
+        try:
+            dr_id = int(dr_id)
+        except (TypeError, ValueError):
+            raise Cons3rtApiError('dr_id arg must be an Integer, found: {t}'.format(t=dr_id.__class__.__name__))
+        if isinstance(fap_statuses, basestring):
+            fap_statuses = [fap_statuses]
+        if not fap_statuses:
+            raise Cons3rtApiError('At least one fapStatus is required for deployment run ID: {i}'.format(
+                i=str(dr_id)))
+        self.pending[dr_id] = {
+            'fap_statuses': [status.upper() for status in fap_statuses],
+            'vr_id': int(vr_id) if vr_id is not None else None,
+            'status': None
+        }
+        self.done.pop(dr_id, None)
+        self.interval_sec = self.min_interval_sec
+
+    def remove(self, dr_id):
+        """Stops tracking a deployment run
+
+        :param dr_id: (int) deployment run ID
+        :return: None
+        """
+        self.pending.pop(int(dr_id), None)
+
+    def stop(self):
+        """Stops a wait in progress, may be called from a callback or another thread
+
+        :return: None
+        """
+        self.stopped.set()
+
+    def list_statuses(self, vr_id, dr_ids):
+        """Returns runs from a VR run listing, stopping at the last page with a tracked run or
+        after max_listing_pages pages, whichever comes first
+
+        :param vr_id: (int) virtualization realm ID
+        :param dr_ids: (list) of tracked deployment run IDs in the VR
+        :return: (dict) of DR ID to run
+        :raises: Cons3rtApiError
+        """
+        remaining = set(dr_ids)
+        runs = {}
+        max_runs = self.max_listing_pages * listing_page_size
+        for count, run in enumerate(self.cons3rt_api.iter_deployment_runs_in_virtualization_realm(
+                vr_id=vr_id, search_type=self.search_type, fields=listing_fields)):
+            if run['id'] in remaining:
+                runs[run['id']] = run
+                remaining.discard(run['id'])
+            if not remaining or count + 1 >= max_runs:
+                break
+        return runs
+
+    def poll(self):
+        """Queries the status of every pending run once and fires callbacks
+
+        :return: (int) number of runs that changed status
+        :raises: Cons3rtApiError
+        """
+        log = logging.getLogger(self.cls_logger + '.poll')
+
+        # Group pending runs by VR, listing VRs with enough tracked runs
+        by_vr = {}
+        for dr_id, tracked in self.pending.iteritems():
+            if tracked['vr_id'] is not None:
+                by_vr.setdefault(tracked['vr_id'], []).append(dr_id)
+        runs = {}
+        for vr_id, dr_ids in by_vr.iteritems():
+            if len(dr_ids) < self.min_runs_for_listing:
+                continue
+            try:
+                runs.update(self.list_statuses(vr_id=vr_id, dr_ids=dr_ids))
+            except (Cons3rtApiError, Cons3rtClientError):
+                _, ex, trace = sys.exc_info()
+                log.warn('{n}: Unable to list runs in VR ID {v}, querying run details instead\n{e}'.format(
+                    n=ex.__class__.__name__, v=str(vr_id), e=str(ex)))
+
+        # Query details for the rest, which also finds the VR of new runs
+        detail_ids = [dr_id for dr_id in self.pending.keys() if dr_id not in runs]
+        if detail_ids:
+            batch = self.cons3rt_api.retrieve_deployment_run_details_batch(
+                dr_ids=detail_ids, max_workers=self.max_workers)
+            for dr_id, err in batch['errors'].iteritems():
+                log.warn('Unable to retrieve details for deployment run ID {i}, will retry on the next poll\n'
+                         '{e}'.format(i=str(dr_id), e=err))
+            for dr_id, run in batch['results'].iteritems():
+                runs[dr_id] = run
+                vr_id = get_path(run, ('virtualizationRealm', 'id'))
+                if vr_id is not None and self.pending[dr_id]['vr_id'] is None:
+                    self.pending[dr_id]['vr_id'] = vr_id
+
+        transitions = 0
+        for dr_id, run in runs.iteritems():
+            tracked = self.pending.get(dr_id)
+            if tracked is None:
+                continue
+            status = run.get('fapStatus')
+            if status != tracked['status']:
+                transitions += 1
+                old_status = tracked['status']
+                tracked['status'] = status
+                log.info('Deployment run ID {i} changed fapStatus from {o} to {s}'.format(
+                    i=str(dr_id), o=str(old_status), s=str(status)))
+                self.call(self.on_transition, dr_id, old_status, status, run)
+
+                # The callback may have removed or re-added the run
+                if self.pending.get(dr_id) is not tracked:
+                    continue
+            if status in tracked['fap_statuses']:
+                self.pending.pop(dr_id, None)
+                self.done[dr_id] = status
+                self.call(self.on_done, dr_id, status, run)
+
+        # Poll again soon after a change, otherwise back off
+        if transitions:
+            self.interval_sec = self.min_interval_sec
+        else:
+            self.interval_sec = min(self.interval_sec * self.backoff, self.max_interval_sec)
+        return transitions
+
+    def call(self, callback, *args):
+        """Calls a callback, logging errors so one bad callback does not stop the wait
+
+        :param callback: function or None
+        :return: None
+        """
+        if callback is None:
+            return
+        log = logging.getLogger(self.cls_logger + '.call')
+        try:
+            callback(*args)
+        except Exception:
+            _, ex, _ = sys.exc_info()
+            log.warn('{n}: Callback {c} failed for deployment run ID {i}\n{e}'.format(
+                n=ex.__class__.__name__, c=getattr(callback, '__name__', str(callback)), i=str(args[0]), e=str(ex)))
+
+    def wait(self, timeout_sec=3600):
+        """Polls until every tracked run reaches one of its fapStatus values
+
+        :param timeout_sec: (float) maximum seconds to wait, None to wait forever
+        :return: (dict) of DR ID to the fapStatus it reached
+        :raises: Cons3rtApiError if the timeout passes first, pending runs stay tracked
+        """
+        log = logging.getLogger(self.cls_logger + '.wait')
+        start_time = time.time()
+        self.stopped.clear()
+        log.info('Waiting for {n} deployment runs'.format(n=str(len(self.pending))))
+        while self.pending and not self.stopped.is_set():
+            self.poll()
+            if not self.pending:
+                break
+            elapsed = time.time() - start_time
+            if timeout_sec is not None and elapsed >= timeout_sec:
+                raise Cons3rtApiError('Deployment run IDs {i} did not reach their fapStatus in {t} seconds'.format(
+                    i=', '.join(str(dr_id) for dr_id in sorted(self.pending.keys())), t=str(timeout_sec)))
+            sleep_sec = self.interval_sec
+            if timeout_sec is not None:
+                sleep_sec = min(sleep_sec, timeout_sec - elapsed)
+            self.stopped.wait(sleep_sec)
+        log.info('Finished waiting after {t} seconds with {n} runs pending'.format(
+            t=str(round(time.time() - start_time, 1)), n=str(len(self.pending))))
+        return dict(self.done)
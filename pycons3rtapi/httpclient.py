@@ -1,37 +1,396 @@
 #!/usr/bin/env python
 
+import cookielib
 import logging
+from collections import OrderedDict
+import re
+import ssl
 import sys
+import threading
 import time
 
 from requests_toolbelt import MultipartEncoder
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException, SSLError
+from requests.packages.urllib3.util.request import ACCEPT_ENCODING
+from requests.packages.urllib3.util.ssl_ import create_urllib3_context
 
 from pycons3rt.logify import Logify
 
-from pycons3rtlibs import Cons3rtClientError
+from pycons3rtlibs import Cons3rtClientError, default_log_body_limit, default_max_workers, \
+    default_validator_cache_max_bytes, default_validator_cache_size, map_concurrently, truncate_body
 
 # Set up logger name for this module
 mod_logger = Logify.get_name() + '.pycons3rtapi.httpclient'
 
+# Sessions shared by every Client in this process, keyed by the client cert and key paths
+sessions = {}
+
+# SSL contexts with a loaded client cert, keyed by the client cert and key paths
+ssl_contexts = {}
+
+# Lock for creating sessions and SSL contexts, reentrant so a session can load its SSL
+# context while holding it
+sessions_lock = threading.RLock()
+
+# Number of hosts each session keeps connection pools for, so clients for several sites
+# sharing a session do not close each other's connections
+pool_hosts = 10
+
+# Seconds to wait for each warm up request, and for the other warm up requests to return
+warm_up_timeout_sec = 30
+
+# Path segments replaced by {id} when grouping requests by endpoint
+id_segment_pattern = re.compile(r'^\d+$')
+
+
+def get_endpoint(target):
+    """Returns the endpoint of a ReST API target without the query string and with
+    numeric IDs replaced, to group requests for different resources of the same kind
+
+    :param target: (str) ReST API target, e.g. virtualizationrealms/5/deploymentruns?page=0
+    :return: (str) endpoint, e.g. virtualizationrealms/{id}/deploymentruns
+    """
+    path = target.split('?', 1)[0].strip('/')
+    return '/'.join('{id}' if id_segment_pattern.match(segment) else segment for segment in path.split('/'))
+
+
+class CertAdapter(HTTPAdapter):
+    """HTTPAdapter that presents a client cert from an SSL context loaded once, instead
+    of reading the cert file for each new connection
+    """
+
+    def __init__(self, ssl_context, **kwargs):
+        self.ssl_context = ssl_context
+        HTTPAdapter.__init__(self, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self.ssl_context
+        return HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        kwargs['ssl_context'] = self.ssl_context
+        return HTTPAdapter.proxy_manager_for(self, *args, **kwargs)
+
+
+def get_ssl_context(cert_file_path, key_file_path=None):
+    """Returns an SSL context with the client cert loaded, loading it on first use
+
+    :param cert_file_path: (str) path to the client cert in PEM format
+    :param key_file_path: (str) path to the key, None if the key is in the cert file
+    :return: (ssl.SSLContext)
+    :raises: Cons3rtClientError
+    """
+    key = (cert_file_path, key_file_path)
+    with sessions_lock:
+        if key not in ssl_contexts:
+            context = create_urllib3_context()
+            try:
+                context.load_cert_chain(cert_file_path, key_file_path)
+            except (IOError, OSError, ssl.SSLError):
+                _, ex, trace = sys.exc_info()
+                msg = '{n}: Unable to load the client certificate: {c}\n{e}'.format(
+                    n=ex.__class__.__name__, c=cert_file_path, e=str(ex))
+                raise Cons3rtClientError, msg, trace
+            ssl_contexts[key] = context
+        return ssl_contexts[key]
+
+
+def get_session(cert_file_path=None, key_file_path=None, pool_maxsize=default_max_workers):
+    """Returns the shared session for a client cert, or for token auth when cert_file_path is
+    None.  Sessions pool connections and do not keep cookies, so each request is authenticated
+    only by its headers and cert.
+
+    :param cert_file_path: (str) path to the client cert in PEM format
+    :param key_file_path: (str) path to the key, None if the key is in the cert file
+    :param pool_maxsize: (int) connections to keep per host
+    :return: (requests.Session)
+    :raises: Cons3rtClientError
+    """
+    key = (cert_file_path, key_file_path, pool_maxsize)
+
+    # Sessions are never removed, so one lookup without the lock finds an existing session
+    session = sessions.get(key)
+    if session is not None:
+        return session
+    with sessions_lock:
+        if key not in sessions:
+            if cert_file_path:
+                adapter = CertAdapter(
+                    ssl_context=get_ssl_context(cert_file_path=cert_file_path, key_file_path=key_file_path),
+                    pool_connections=pool_hosts,
+                    pool_maxsize=pool_maxsize
+                )
+            else:
+                adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_maxsize)
+            session = requests.Session()
+            session.cookies.set_policy(cookielib.DefaultCookiePolicy(allowed_domains=[]))
+            session.mount('https://', adapter)
+            session.mount('http://', HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_maxsize))
+            sessions[key] = session
+        return sessions[key]
+
+
+def get_pool_gauges():
+    """Returns the connection pool use of every shared session for metrics scrapes
+
+    :return: (list) of (name, labels dict, value) tuples for the pool maxsize, and the
+        connections in use and idle for each host
+    """
+    totals = OrderedDict()
+    with sessions_lock:
+        adapters = []
+        for session in sessions.values():
+            adapters.extend(session.adapters.values())
+    for adapter in adapters:
+        try:
+            pools = [adapter.poolmanager.pools[key] for key in adapter.poolmanager.pools.keys()]
+        except (AttributeError, KeyError):
+            continue
+        for pool in pools:
+            host = '{h}:{p}'.format(h=pool.host, p=str(pool.port))
+            try:
+                idle = len([conn for conn in list(pool.pool.queue) if conn is not None])
+                in_use = pool.pool.maxsize - pool.pool.qsize()
+            except AttributeError:
+                continue
+            # Sessions for different client certs each have a pool for the same host
+            for key, value in [(('cons3rt_http_pool_maxsize', (('host', host),)), pool.pool.maxsize),
+                               (('cons3rt_http_pool_connections', (('host', host), ('state', 'in_use'))), in_use),
+                               (('cons3rt_http_pool_connections', (('host', host), ('state', 'idle'))), idle)]:
+                totals[key] = totals.get(key, 0) + value
+    return [(name, dict(labels), value) for (name, labels), value in totals.items()]
+
 
 class Client:
 
-    def __init__(self, base):
+    def __init__(self, base, pool_maxsize=default_max_workers, log_body_limit=default_log_body_limit):
         self.base = base
+        self.log_body_limit = log_body_limit
 
         if not self.base.endswith('/'):
             self.base = self.base + '/'
 
         self.cls_logger = mod_logger + '.Client'
 
+        # Connections are pooled in sessions shared across Client instances, sized for the
+        # concurrent batch calls
+        self.pool_maxsize = pool_maxsize
+
+        # Incremented when each PUT, POST, and DELETE returns so callers caching reads can
+        # tell when the site may have changed
+        self.write_count = 0
+        self.write_count_lock = threading.Lock()
+
+        # Optional RateLimiter applied to each request made by this client
+        self.rate_limiter = None
+
+        # Optional Tracer that records each request as a span, see cons3rttracing
+        self.tracer = None
+
+        # Optional MetricsRegistry that records each request, see cons3rtmetrics
+        self.metrics = None
+
+        # Bytes received on the wire and after decompression, see get_stats
+        self.stats = {
+            'responses': 0,
+            'compressed_responses': 0,
+            'bytes_received': 0,
+            'bytes_decoded': 0,
+            'not_modified': 0
+        }
+        self.stats_lock = threading.Lock()
+
+        # GET content with its ETag and Last-Modified validators, least recently used
+        # first.  Repeat GETs send the validators and reuse the content on a 304.  Set
+        # validator_cache_size to 0 to disable.
+        self.validator_cache_size = default_validator_cache_size
+        self.validator_cache_max_bytes = default_validator_cache_max_bytes
+        self.validator_cache = OrderedDict()
+        self.validator_cache_bytes = 0
+        self.validator_cache_lock = threading.Lock()
+
         # TODO Remove once cert handling is more developed
         #requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecureRequestWarning)
         #requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.InsecurePlatformWarning)
         #requests.packages.urllib3.disable_warnings(requests.packages.urllib3.exceptions.SNIMissingWarning)
 
+    def get_session(self, rest_user):
+        """Returns the shared session for the user's client cert, waiting first for the rate
+        limiter when one is set, since each request gets its session just before it is sent
+
+        :param rest_user: (RestUser) user info
+        :return: (requests.Session)
+        :raises: Cons3rtClientError
+        """
+        if rest_user is None:
+            raise Cons3rtClientError('rest_user provided was None')
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        return get_session(
+            cert_file_path=rest_user.cert_file_path,
+            key_file_path=rest_user.key_file_path,
+            pool_maxsize=self.pool_maxsize
+        )
+
+    def send_request(self, method, rest_user, target, url, prepped=None, **kwargs):
+        """Sends a request, counting each write in write_count once its response returns, or
+        it fails, so a read started before the write returned is never cached as current
+
+        :param method: (str) HTTP method
+        :param rest_user: (RestUser) user info
+        :param target: (str) ReST API target URL
+        :param url: (str) full URL
+        :param prepped: (requests.PreparedRequest) sent as is when provided
+        :param kwargs: args for requests.Session.request, e.g. headers and data
+        :return: (requests.Response)
+        :raises: Cons3rtClientError, or the requests exception from the session
+        """
+        if method == 'GET':
+            return self.send_observed_request(method, rest_user, target, url, prepped=prepped, **kwargs)
+        try:
+            return self.send_observed_request(method, rest_user, target, url, prepped=prepped, **kwargs)
+        finally:
+            with self.write_count_lock:
+                self.write_count += 1
+
+    def send_observed_request(self, method, rest_user, target, url, prepped=None, **kwargs):
+        """Sends a request with the shared session for the user.  When a tracer is set the
+        request is recorded as a span with the endpoint, HTTP status, and bytes received, and
+        when a metrics registry is set its count, latency, and bytes are recorded.  The
+        bytes received are not recorded for streamed responses, reading them would return
+        the connection to the pool before the caller is done with the response.
+
+        :param method: (str) HTTP method
+        :param rest_user: (RestUser) user info
+        :param target: (str) ReST API target URL
+        :param url: (str) full URL
+        :param prepped: (requests.PreparedRequest) sent as is when provided
+        :param kwargs: args for requests.Session.request, e.g. headers and data
+        :return: (requests.Response)
+        :raises: Cons3rtClientError, or the requests exception from the session
+        """
+        tracer = self.tracer
+        metrics = self.metrics
+        if tracer is None and metrics is None:
+            session = self.get_session(rest_user=rest_user)
+            if prepped is not None:
+                return session.send(prepped)
+            return session.request(method, url, **kwargs)
+
+        endpoint = get_endpoint(target)
+        streamed = kwargs.get('stream', False)
+        span = None
+        if tracer is not None:
+            span = tracer.start_span('http ' + method, method=method, endpoint=endpoint)
+        if metrics is not None:
+            metrics.inc('cons3rt_http_requests_in_flight')
+        start_time = time.time()
+        response = None
+        try:
+            session = self.get_session(rest_user=rest_user)
+            if prepped is not None:
+                response = session.send(prepped)
+            else:
+                response = session.request(method, url, **kwargs)
+        except Exception:
+            _, ex, _ = sys.exc_info()
+            if metrics is not None:
+                self.record_request_metrics(metrics, method, endpoint, None, kwargs.get('data'), start_time,
+                                            streamed=streamed)
+            if span is not None:
+                tracer.end_span(span, error=ex)
+            raise
+        if metrics is not None:
+            self.record_request_metrics(metrics, method, endpoint, response, kwargs.get('data'), start_time,
+                                        streamed=streamed)
+        if span is not None:
+            span.set_attribute('status', response.status_code)
+            if not streamed:
+                span.set_attribute('bytes', len(response.content or ''))
+            tracer.end_span(span)
+        return response
+
+    @staticmethod
+    def record_request_metrics(metrics, method, endpoint, response, data, start_time, streamed=False):
+        """Records the count, latency, and bytes of a request
+
+        :param metrics: (MetricsRegistry) registry
+        :param method: (str) HTTP method
+        :param endpoint: (str) endpoint from get_endpoint
+        :param response: (requests.Response) response, None if the request raised
+        :param data: (str) request body sent, if any
+        :param start_time: (float) time.time() the request started
+        :param streamed: (bool) True when the response content has not been read, its bytes
+            are not recorded
+        :return: None
+        """
+        elapsed = time.time() - start_time
+        metrics.inc('cons3rt_http_requests_in_flight', amount=-1)
+        labels = {'method': method, 'endpoint': endpoint}
+        metrics.observe('cons3rt_http_request_duration_seconds', elapsed, labels=labels)
+        if isinstance(data, basestring) and data:
+            metrics.inc('cons3rt_http_sent_bytes_total', labels=labels, amount=len(data))
+        status = 'error' if response is None else str(response.status_code)
+        metrics.inc('cons3rt_http_requests_total', labels={'method': method, 'endpoint': endpoint, 'status': status})
+        if response is None or streamed:
+            return
+        decoded = len(response.content or '')
+        try:
+            received = response.raw.tell()
+        except AttributeError:
+            received = decoded
+        metrics.inc('cons3rt_http_received_bytes_total', labels={'endpoint': endpoint}, amount=received)
+        metrics.inc('cons3rt_http_decoded_bytes_total', labels={'endpoint': endpoint}, amount=decoded)
+
+    def warm_up(self, rest_user, connections=1):
+        """Opens pooled connections to the site ahead of the first requests, so the TLS
+        handshake is not paid by the first calls.  Sends HEAD requests for the site URL and
+        holds each response until all of them return, so each request uses its own pooled
+        connection.  Each request waits for the rate limiter, and is recorded by the tracer
+        and metrics when they are set.
+
+        :param rest_user: (RestUser) user info
+        :param connections: (int) number of connections to open, up to the pool size
+        :return: (int) number of pooled connections ready for requests
+        :raises: Cons3rtClientError
+        """
+        log = logging.getLogger(self.cls_logger + '.warm_up')
+        connections = max(1, min(connections, self.pool_maxsize))
+        start_time = time.time()
+        lock = threading.Lock()
+        returned = []
+        all_returned = threading.Event()
+
+        def send_head(_):
+            response = None
+            try:
+                response = self.send_observed_request('HEAD', rest_user, '', self.base, stream=True,
+                                                      allow_redirects=False, timeout=warm_up_timeout_sec)
+            finally:
+                with lock:
+                    returned.append(response)
+                    if len(returned) == connections:
+                        all_returned.set()
+                all_returned.wait(warm_up_timeout_sec)
+
+                # Reading the response returns its connection to the pool
+                if response is not None:
+                    response.content
+            return response.status_code
+
+        results = map_concurrently(func=send_head, items=range(connections), max_workers=connections)
+        for _, _, ex in results:
+            if ex is not None:
+                msg = '{n}: Unable to open a connection to: {u}\n{e}'.format(
+                    n=ex.__class__.__name__, u=self.base, e=str(ex))
+                raise Cons3rtClientError(msg)
+        log.info('Warmed up {n} connections to {u} in {t} seconds'.format(
+            n=str(len(results)), u=self.base, t=str(round(time.time() - start_time, 3))))
+        return len(results)
+
     @staticmethod
     def get_auth_headers(rest_user):
         """Returns the auth portion of the headers including:
@@ -44,16 +403,20 @@ class Client:
         if rest_user is None:
             raise Cons3rtClientError('rest_user provided was None')
 
+        # Ask for compressed responses in every encoding urllib3 can decode, which
+        # includes br when the brotli package is installed
         if rest_user.cert_file_path:
             return {
                 'token': rest_user.token,
-                'Accept': 'application/json'
+                'Accept': 'application/json',
+                'Accept-Encoding': ACCEPT_ENCODING
             }
         else:
             return {
                 'username': rest_user.username,
                 'token': rest_user.token,
-                'Accept': 'application/json'
+                'Accept': 'application/json',
+                'Accept-Encoding': ACCEPT_ENCODING
             }
 
     @staticmethod
@@ -98,13 +461,24 @@ class Client:
 
         # Set the URL
         url = self.base + target
-        log.debug('Querying http GET with URL: {u}'.format(u=url))
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('Querying http GET with URL: {u}'.format(u=url))
 
         # Determine the headers
         headers = self.get_auth_headers(rest_user=rest_user)
 
+        # Revalidate content from an earlier GET of this URL
+        cache_key = (rest_user.token, rest_user.username, rest_user.cert_file_path, url)
+        cached = self.get_validators(cache_key=cache_key)
+        if cached is not None:
+            etag, last_modified, _ = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
         try:
-            response = requests.get(url, headers=headers, cert=rest_user.cert_file_path)
+            response = self.send_request('GET', rest_user=rest_user, target=target, url=url, headers=headers)
         except RequestException as ex:
             raise Cons3rtClientError(str(ex))
         except SSLError:
@@ -112,8 +486,69 @@ class Client:
             msg = '{n}: There was an SSL error making an HTTP GET to URL: {u}\n{e}'.format(
                 n=ex.__class__.__name__, u=url, e=str(ex))
             raise Cons3rtClientError, msg, trace
+
+        if response.status_code == requests.codes.not_modified and cached is not None:
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('Content not modified, using cached content for URL: {u}'.format(u=url))
+            response.status_code = requests.codes.ok
+            response._content = cached[2]
+            with self.stats_lock:
+                self.stats['not_modified'] += 1
+            if self.metrics is not None:
+                self.metrics.inc('cons3rt_cache_requests_total', labels={'cache': 'validator', 'result': 'hit'})
+        elif response.status_code == requests.codes.ok:
+            self.set_validators(cache_key=cache_key, response=response)
+            if self.metrics is not None and self.validator_cache_size > 0:
+                self.metrics.inc('cons3rt_cache_requests_total', labels={'cache': 'validator', 'result': 'miss'})
         return response
 
+    def get_validators(self, cache_key):
+        """Returns the validators and content cached for a GET
+
+        :param cache_key: (tuple) user and URL
+        :return: (tuple) ETag, Last-Modified, and content, or None
+        """
+        if self.validator_cache_size <= 0:
+            return None
+        with self.validator_cache_lock:
+            cached = self.validator_cache.pop(cache_key, None)
+            if cached is not None:
+                self.validator_cache[cache_key] = cached
+            return cached
+
+    def set_validators(self, cache_key, response):
+        """Caches the content of a GET response that has an ETag or Last-Modified header,
+        evicting the least recently used content over the cache size or bytes
+
+        :param cache_key: (tuple) user and URL
+        :param response: (requests.Response) OK response
+        :return: None
+        """
+        if self.validator_cache_size <= 0:
+            return
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        content = response.content
+        with self.validator_cache_lock:
+            previous = self.validator_cache.pop(cache_key, None)
+            if previous is not None:
+                self.validator_cache_bytes -= len(previous[2])
+            if not etag and not last_modified:
+                return
+            if len(content) > self.validator_cache_max_bytes:
+                return
+            self.validator_cache[cache_key] = (etag, last_modified, content)
+            self.validator_cache_bytes += len(content)
+            while len(self.validator_cache) > self.validator_cache_size or \
+                    self.validator_cache_bytes > self.validator_cache_max_bytes:
+                _, evicted = self.validator_cache.popitem(last=False)
+                self.validator_cache_bytes -= len(evicted[2])
+
+    def clear_validators(self):
+        with self.validator_cache_lock:
+            self.validator_cache.clear()
+            self.validator_cache_bytes = 0
+
     def http_delete(self, rest_user, target, content=None, keep_alive=False):
         self.validate_target(target)
 
@@ -127,10 +562,10 @@ class Client:
 
         try:
             if content is None:
-                response = requests.delete(url, headers=headers, cert=rest_user.cert_file_path)
+                response = self.send_request('DELETE', rest_user=rest_user, target=target, url=url, headers=headers)
             else:
-                response = requests.delete(
-                    url, headers=headers, data=content, cert=rest_user.cert_file_path)
+                response = self.send_request('DELETE', rest_user=rest_user, target=target, url=url, headers=headers,
+                                             data=content)
         except RequestException as ex:
             raise Cons3rtClientError(str(ex))
         except SSLError:
@@ -178,7 +613,8 @@ class Client:
 
         # Make the put request
         try:
-            response = requests.post(url, headers=headers, data=content, cert=rest_user.cert_file_path)
+            response = self.send_request('POST', rest_user=rest_user, target=target, url=url, headers=headers,
+                                         data=content)
         except SSLError:
             _, ex, trace = sys.exc_info()
             msg = '{n}: There was an SSL error making an HTTP POST to URL: {u}\n{e}'.format(
@@ -241,7 +677,8 @@ class Client:
 
         # Make the put request
         try:
-            response = requests.put(url, headers=headers, data=content, cert=rest_user.cert_file_path)
+            response = self.send_request('PUT', rest_user=rest_user, target=target, url=url, headers=headers,
+                                         data=content)
         except SSLError:
             _, ex, trace = sys.exc_info()
             msg = '{n}: There was an SSL error making an HTTP PUT to URL: {u}\n{e}'.format(
@@ -317,7 +754,6 @@ class Client:
             headers["Content-Type"] = form.content_type
 
             # Create the request
-            s = requests.Session()
             req = requests.Request(method, url, data=form, headers=headers)
             prepped = req.prepare()
             log.info('Request URL: {u}'.format(u=url))
@@ -326,10 +762,7 @@ class Client:
 
             # Send the request
             try:
-                response = s.send(
-                    prepped,
-                    cert=rest_user.cert_file_path
-                )
+                response = self.send_request(method, rest_user=rest_user, target=target, url=url, prepped=prepped)
             except SSLError:
                 self.__http_exception__(
                     exc=sys.exc_info(),
@@ -386,9 +819,45 @@ class Client:
             content_file=content_file
         )
 
+    def record_transfer(self, response):
+        """Adds the bytes received on the wire and after decompression for a response to
+        the client stats.  urllib3 decompresses the body as it is read, so the compressed
+        body is never held in memory.
+
+        :param response: (requests.Response) response with the content read
+        :return: None
+        """
+        decoded = len(response.content or '')
+        try:
+            received = response.raw.tell()
+        except AttributeError:
+            received = decoded
+        compressed = response.headers.get('Content-Encoding', 'identity') != 'identity'
+        with self.stats_lock:
+            self.stats['responses'] += 1
+            self.stats['bytes_received'] += received
+            self.stats['bytes_decoded'] += decoded
+            if compressed:
+                self.stats['compressed_responses'] += 1
+
+    def get_stats(self):
+        """Returns the transfer stats for responses parsed by this client
+
+        :return: (dict) of responses, compressed_responses, bytes_received (on the wire),
+            bytes_decoded (after decompression), and not_modified (served from the
+            validator cache)
+        """
+        with self.stats_lock:
+            return dict(self.stats)
+
     def parse_response(self, response):
         log = logging.getLogger(self.cls_logger + '.parse_response')
-        log.debug('Parsing response with content: {s}'.format(s=response.content))
+        self.record_transfer(response)
+
+        # Listing responses can be several MB, only format the body when it will be logged
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('Parsing response with content: {s}'.format(
+                s=truncate_body(response.content, limit=self.log_body_limit)))
         if response.status_code == requests.codes.ok:
             log.debug('Received an OK HTTP Response Code!')
             return response.content
@@ -399,6 +868,8 @@ class Client:
             msg = 'Received HTTP code [{n}] with headers:\n{h}'.format(
                 n=str(response.status_code), h=response.headers)
             if response.content:
-                msg += '\nand content:\n{c}'.format(c=response.content)
+                msg += '\nand content:\n{c}'.format(c=truncate_body(response.content, limit=self.log_body_limit))
             log.warn(msg)
-            raise Cons3rtClientError(msg)
+            err = Cons3rtClientError(msg)
+            err.status_code = response.status_code
+            raise err
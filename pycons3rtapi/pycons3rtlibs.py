@@ -2,6 +2,40 @@
 This module contains a shared library of classes for pycons3rtapi
 """
 
+import json
+import os
+import sys
+import threading
+import time
+
+# Use the fastest JSON backend installed to decode responses, falling back to the standard library
+json_backends = ['ujson', 'simplejson', 'json']
+json_backend = json
+for _backend_name in json_backends:
+    try:
+        json_backend = __import__(_backend_name)
+    except ImportError:
+        continue
+    break
+
+# Default number of worker threads for concurrent operations
+default_max_workers = 8
+
+# Seconds to wait on a pool of worker threads, a timeout keeps the wait interruptible
+worker_pool_timeout_sec = 86400
+
+# Maximum number of characters of a request or response body to include in logs and
+# error messages, None to include the full body
+default_log_body_limit = 2048
+
+# Number of GET responses, and total bytes of content, kept with their ETag or
+# Last-Modified validators for conditional requests
+default_validator_cache_size = 128
+default_validator_cache_max_bytes = 32 * 1024 * 1024
+
+# Seconds between checks while a SingleFlight follower waits for the call in flight
+single_flight_wait_sec = 0.5
+
 
 class Cons3rtApiError(Exception):
     """This class is an Exception type for handling errors executing commands
@@ -38,3 +72,285 @@ class RestUser:
             return base_str + ', using username auth: {u}'.format(u=self.username)
         else:
             return base_str
+
+
+class SingleFlight(object):
+    """Coalesces concurrent calls with the same key so that only one call runs, and
+    every caller receives its result or exception
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, func):
+        """Runs func unless a call with the same key is already in flight, in which
+        case this waits for that call to complete and shares its outcome
+
+        :param key: hashable key identifying identical calls
+        :param func: function with no args to run
+        :return: result of func
+        :raises: the exception raised by func
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': threading.Event(), 'result': None, 'exc_info': None}
+                self.calls[key] = call
+
+        if not leader:
+            # Wait in short intervals, an untimed wait cannot be interrupted on Python 2
+            while not call['done'].is_set():
+                call['done'].wait(single_flight_wait_sec)
+            if call['exc_info']:
+                raise call['exc_info'][0], call['exc_info'][1], call['exc_info'][2]
+            return call['result']
+
+        # Also share exceptions that are not an Exception, e.g. KeyboardInterrupt, so
+        # followers do not return None when the leader did not finish
+        try:
+            call['result'] = func()
+        except:
+            call['exc_info'] = sys.exc_info()
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call['done'].set()
+        return call['result']
+
+
+def map_concurrently(func, items, max_workers=default_max_workers):
+    """Calls func with each item using a bounded pool of worker threads
+
+    :param func: function that takes a single item
+    :param items: (iterable) of items
+    :param max_workers: (int) maximum number of concurrent calls
+    :return: (list) of (item, result, exception) tuples in the order of items, the
+        exception is None when the call succeeded
+    """
+    from multiprocessing.pool import ThreadPool
+    items = list(items)
+    if len(items) < 1:
+        return []
+
+    def call(item):
+        try:
+            return item, func(item), None
+        except Exception:
+            return item, None, sys.exc_info()[1]
+
+    pool = ThreadPool(processes=max(1, min(int(max_workers), len(items))))
+    try:
+        return pool.map_async(call, items).get(worker_pool_timeout_sec)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+class RateLimiter(object):
+    """Limits the rate of calls shared by many threads, allowing bursts of up to burst
+    calls after an idle period
+    """
+
+    def __init__(self, rate_per_sec, burst=1):
+        """
+        :param rate_per_sec: (float) calls per second, None or 0 for no limit
+        :param burst: (int) calls allowed at once after an idle period
+        """
+        self.rate_per_sec = rate_per_sec
+        self.burst = max(1, int(burst))
+        self.tokens = float(self.burst)
+        self.last_time = time.time()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a call is allowed
+
+        :return: (float) seconds waited
+        """
+        if not self.rate_per_sec:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.burst, self.tokens + (now - self.last_time) * self.rate_per_sec)
+                self.last_time = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait_sec = (1 - self.tokens) / self.rate_per_sec
+            time.sleep(wait_sec)
+            waited += wait_sec
+
+
+class Journal(object):
+    """Append-only file of JSON entries, one per line, written to disk before append
+    returns so a later process can resume work after a crash
+    """
+
+    def __init__(self, journal_file):
+        """
+        :param journal_file: (str) path to the journal file
+        """
+        self.journal_file = journal_file
+        self.lock = threading.Lock()
+
+        # Set once the end of the file has been checked for a partial line from a crash
+        self.tail_checked = False
+
+    def read(self):
+        """Returns the journal entries, ignoring a partial last line from a crash
+
+        :return: (list) of dict entries, empty if the journal does not exist
+        :raises: Cons3rtApiError
+        """
+        entries = []
+        if not os.path.isfile(self.journal_file):
+            return entries
+        try:
+            with open(self.journal_file, 'r') as f:
+                lines = f.readlines()
+        except (OSError, IOError):
+            _, ex, trace = sys.exc_info()
+            msg = 'Unable to read journal file: {f}\n{e}'.format(f=self.journal_file, e=str(ex))
+            raise Cons3rtApiError, msg, trace
+        for line_num, line in enumerate(lines):
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                if line_num == len(lines) - 1 and not line.endswith('\n'):
+                    break
+                raise Cons3rtApiError('Invalid entry on line {n} of journal file: {f}'.format(
+                    n=str(line_num + 1), f=self.journal_file))
+        return entries
+
+    def append(self, entry):
+        """Writes an entry and syncs it to disk
+
+        :param entry: (dict) JSON serializable entry
+        :return: None
+        :raises: Cons3rtApiError
+        """
+        line = json.dumps(entry, sort_keys=True) + '\n'
+        with self.lock:
+            try:
+                with open(self.journal_file, 'a+b') as f:
+                    if not self.tail_checked:
+                        self.repair_tail(f)
+                        self.tail_checked = True
+                    f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except (OSError, IOError):
+                # A failed write may leave a partial line, check the end again on the next append
+                self.tail_checked = False
+                _, ex, trace = sys.exc_info()
+                msg = 'Unable to write to journal file: {f}\n{e}'.format(f=self.journal_file, e=str(ex))
+                raise Cons3rtApiError, msg, trace
+
+    @staticmethod
+    def repair_tail(f):
+        """Ends the file on a complete line so the next entry does not join a partial line
+        left by a crash.  A partial line that read skips is dropped, and a complete entry
+        missing only its newline gets one.
+
+        :param f: (file) journal file opened in a+b mode
+        :return: None
+        """
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == '\n':
+            return
+
+        # Find the start of the last line
+        start = end
+        while start > 0:
+            block_start = max(0, start - 4096)
+            f.seek(block_start)
+            index = f.read(start - block_start).rfind('\n')
+            if index >= 0:
+                start = block_start + index + 1
+                break
+            start = block_start
+        f.seek(start)
+        fragment = f.read(end - start)
+        try:
+            json.loads(fragment)
+        except ValueError:
+            f.truncate(start)
+        else:
+            f.write('\n')
+        f.seek(0, os.SEEK_END)
+
+
+def truncate_body(body, limit=default_log_body_limit):
+    """Returns the body shortened to the limit for logs and error messages
+
+    :param body: (str) request or response body
+    :param limit: (int) maximum number of characters, None for no limit
+    :return: (str) body, with a note of the full length when truncated
+    """
+    if body is None or limit is None or len(body) <= limit:
+        return body
+    return '{b}... [truncated, {n} characters total]'.format(b=body[:limit], n=str(len(body)))
+
+
+def set_json_backend(name):
+    """Sets the module used to decode JSON responses
+
+    :param name: (str) ujson, simplejson, or json
+    :return: None
+    :raises: Cons3rtClientError
+    """
+    global json_backend
+    if name not in json_backends:
+        raise Cons3rtClientError('JSON backend must be one of: {b}'.format(b=', '.join(json_backends)))
+    try:
+        json_backend = __import__(name)
+    except ImportError:
+        _, ex, trace = sys.exc_info()
+        msg = 'JSON backend {b} is not installed\n{e}'.format(b=name, e=str(ex))
+        raise Cons3rtClientError, msg, trace
+
+
+def project_fields(data, fields):
+    """Keeps only the requested top-level keys of a record, or of each record in a list
+
+    :param data: (dict) or (list) of dict records
+    :param fields: (tuple) of keys to keep
+    :return: (dict) or (list) projected records
+    """
+    if isinstance(data, dict):
+        return dict((field, data[field]) for field in fields if field in data)
+    elif isinstance(data, list):
+        return [project_fields(record, fields) if isinstance(record, dict) else record for record in data]
+    return data
+
+
+def decode_json(content, fields=None):
+    """Decodes JSON content with the selected backend, and optionally projects the records
+    to the requested fields so callers holding many records keep only what they use
+
+    :param content: (str) JSON content
+    :param fields: (tuple) of top-level keys to keep in each record, None to keep all keys
+    :return: decoded data
+    :raises: Cons3rtClientError
+    """
+    try:
+        data = json_backend.loads(content)
+    except ValueError:
+        _, ex, trace = sys.exc_info()
+        msg = '{n}: Unable to decode JSON content: {c}\n{e}'.format(
+            n=ex.__class__.__name__, c=truncate_body(content, limit=256), e=str(ex))
+        raise Cons3rtClientError, msg, trace
+    if fields:
+        data = project_fields(data, fields)
+    return data
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Measures the CPU cost of httpclient.Client.parse_response for large bodies
+
+Compares the previous behavior, which formatted the full body into a debug
+message on every response, against the current guarded and truncated logging,
+with the pycons3rt logger at DEBUG (the pycons3rt default) and at INFO.
+
+Usage: python scripts/benchmark-parse-response.py [--runs N]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pycons3rtapi.httpclient import Client
+
+
+# Body sizes to test in bytes
+body_sizes = [
+    10 * 1024,
+    1024 * 1024,
+    8 * 1024 * 1024
+]
+
+
+class FakeResponse(object):
+
+    def __init__(self, content):
+        self.status_code = 200
+        self.headers = {'Content-Type': 'application/json'}
+        self.content = content
+
+
+def make_body(size):
+    """Returns a JSON listing of about the requested size
+
+    :param size: (int) body size in bytes
+    :return: (str) JSON body
+    """
+    record = {'id': 12345, 'name': 'deployment-run-name', 'fapStatus': 'RESERVED', 'description': 'x' * 100}
+    record_size = len(json.dumps(record)) + 2
+    return json.dumps([record] * max(1, size / record_size))
+
+
+def parse_response_before(client, response):
+    """The previous parse_response, which always formatted the full body
+
+    :param client: (Client)
+    :param response: (FakeResponse)
+    :return: (str) content
+    """
+    log = logging.getLogger(client.cls_logger + '.parse_response')
+    log.debug('Parsing response with content: {s}'.format(s=response.content))
+    log.debug('Received an OK HTTP Response Code!')
+    return response.content
+
+
+def time_cpu(func, runs):
+    """Returns the mean CPU time for a function
+
+    :param func: function to time
+    :param runs: (int) number of runs
+    :return: (float) mean CPU milliseconds per call
+    """
+    start_time = time.clock()
+    for _ in range(runs):
+        func()
+    return (time.clock() - start_time) * 1000 / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='parse_response logging benchmark')
+    parser.add_argument('--runs', help='Number of runs per case', required=False, type=int, default=20)
+    args = parser.parse_args()
+
+    client = Client('https://localhost/rest/api/')
+
+    # Only measure formatting, not writes to the pycons3rt log files
+    pycons3rt_logger = logging.getLogger('pycons3rt')
+    pycons3rt_logger.handlers = [logging.NullHandler()]
+    pycons3rt_logger.propagate = False
+
+    print('{s:>10}  {l:<6}{b:>12}{a:>12}'.format(s='body', l='level', b='before ms', a='after ms'))
+    for size in body_sizes:
+        response = FakeResponse(make_body(size))
+        for level in [logging.DEBUG, logging.INFO]:
+            pycons3rt_logger.setLevel(level)
+            before = time_cpu(lambda: parse_response_before(client, response), args.runs)
+            after = time_cpu(lambda: client.parse_response(response), args.runs)
+            print('{s:>9}K  {l:<6}{b:>12.3f}{a:>12.3f}'.format(
+                s=str(len(response.content) / 1024), l=logging.getLevelName(level), b=before, a=after))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Measures memory used to hold deployment run listings as dicts and as records
+
+Each mode runs in a fresh interpreter that decodes pages of synthetic
+deployment run JSON, keeps every run, and reports the growth in peak RSS.
+
+Usage: python scripts/benchmark-records.py [--count N]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+# Modes to compare
+modes = [
+    'dicts',
+    'records',
+    'records_no_raw'
+]
+
+
+def make_page(start_id, page_size):
+    """Returns a page of deployment run JSON shaped like a CONS3RT listing
+
+    :param start_id: (int) first run ID
+    :param page_size: (int) number of runs
+    :return: (str) JSON content
+    """
+    runs = []
+    for dr_id in range(start_id, start_id + page_size):
+        runs.append({
+            'id': dr_id,
+            'name': 'deployment-run-{i}'.format(i=str(dr_id)),
+            'description': 'Deployment run created by the nightly test pipeline for build {i}'.format(i=str(dr_id)),
+            'fapStatus': 'RESERVED' if dr_id % 3 else 'RELEASED',
+            'deploymentRunStatus': 'TESTED',
+            'startTime': 1530000000000 + dr_id,
+            'endTime': 1530000900000 + dr_id,
+            'deploymentRunType': 'DEVELOPMENT',
+            'locked': False,
+            'retainOnError': True,
+            'project': {'id': 42, 'name': 'Test Project', 'itemDeployed': True},
+            'creator': {'id': 7, 'username': 'tester', 'email': 'tester@example.com'},
+            'virtualizationRealm': {'id': 5, 'name': 'VR 5', 'virtualizationRealmType': 'VCloud'},
+            'deployment': {'id': 900 + dr_id % 50, 'name': 'Deployment {n}'.format(n=str(dr_id % 50))},
+            'properties': [{'key': 'cons3rt.prop.{n}'.format(n=str(n)), 'value': str(n)} for n in range(5)]
+        })
+    return json.dumps(runs)
+
+
+def get_maxrss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_mode(mode, count):
+    """Holds count runs in the requested mode and prints the peak RSS growth in KB
+
+    :param mode: (str) dicts, records, or records_no_raw
+    :param count: (int) number of runs
+    :return: None
+    """
+    from pycons3rtapi.pycons3rtlibs import decode_json
+    from pycons3rtapi.cons3rtrecords import DeploymentRunRecord
+
+    page_size = 40
+    pages = [make_page(start_id, page_size) for start_id in range(0, min(count, 400), page_size)]
+    start_rss = get_maxrss_kb()
+    held = []
+    for n in range(0, count, page_size):
+        page = decode_json(pages[(n / page_size) % len(pages)])
+        if mode == 'records':
+            page = [DeploymentRunRecord(run) for run in page]
+        elif mode == 'records_no_raw':
+            page = [DeploymentRunRecord(run, keep_raw=False) for run in page]
+        held += page
+    print(get_maxrss_kb() - start_rss)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='listing record memory benchmark')
+    parser.add_argument('--count', help='Number of deployment runs to hold', required=False, type=int,
+                        default=100000)
+    parser.add_argument('--mode', help=argparse.SUPPRESS, required=False)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(mode=args.mode, count=args.count)
+        return 0
+
+    results = {}
+    for mode in modes:
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--count', str(args.count),
+                                          '--mode', mode])
+        results[mode] = int(output.strip().splitlines()[-1])
+    for mode in modes:
+        print('{m:<16}{k:>10} MB{r:>8.1f}x smaller than dicts'.format(
+            m=mode, k=str(results[mode] / 1024), r=float(results['dicts']) / max(results[mode], 1)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Measures start up time of the cons3rt CLI
+
+The CLI is called from scripts many times a day, so commands that do not
+talk to CONS3RT should not load requests or pycons3rt.  This runs each
+command several times in a fresh interpreter and exits non-zero if the
+median time is over the limit.
+
+Usage: python scripts/benchmark-startup.py [--runs N] [--limit_ms MS]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+
+# Commands to time, with the stdin to send.  Blank answers to the config
+# prompts select the default site and exit before writing a config file.
+commands = [
+    ('cons3rt --help', ['--help'], ''),
+    ('cons3rt config', ['config'], '\n\n')
+]
+
+# Modules that should not be loaded by the commands above
+heavy_modules = [
+    'requests',
+    'requests_toolbelt',
+    'pycons3rt.logify',
+    'pycons3rtapi.cons3rtapi',
+    'pycons3rtapi.cons3rtcli'
+]
+
+# Repo root, so the benchmark runs against this tree rather than an installed copy
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_command(cli_args, stdin_data):
+    """Runs the CLI once in a new interpreter
+
+    :param cli_args: (list) of args for the cons3rt command
+    :param stdin_data: (str) data to send to stdin
+    :return: (float) elapsed time in milliseconds
+    """
+    cmd = [sys.executable, '-m', 'pycons3rtapi.cons3rt'] + cli_args
+    start_time = time.time()
+    proc = subprocess.Popen(cmd, cwd=repo_dir, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+    proc.communicate(stdin_data)
+    return (time.time() - start_time) * 1000
+
+
+def time_interpreter():
+    """Runs an empty interpreter once as a baseline
+
+    :return: (float) elapsed time in milliseconds
+    """
+    start_time = time.time()
+    subprocess.call([sys.executable, '-c', 'pass'])
+    return (time.time() - start_time) * 1000
+
+
+def get_loaded_heavy_modules(cli_args):
+    """Returns the heavy modules loaded by the CLI module for a command
+
+    :param cli_args: (list) of args for the cons3rt command
+    :return: (list) of module names
+    """
+    check = (
+        'import sys\n'
+        'sys.argv = ["cons3rt"] + {a}\n'
+        'sys.stdin = open(__import__("os").devnull)\n'
+        'import pycons3rtapi.cons3rt as c\n'
+        'try:\n'
+        '    c.main()\n'
+        'except (SystemExit, EOFError):\n'
+        '    pass\n'
+        'sys.stderr.write(",".join(m for m in {h} if m in sys.modules))\n'
+    ).format(a=repr(cli_args), h=repr(heavy_modules))
+    proc = subprocess.Popen([sys.executable, '-c', check], cwd=repo_dir, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+    _, err = proc.communicate()
+    loaded = err.strip().splitlines()[-1] if err.strip() else ''
+    return [m for m in loaded.split(',') if m in heavy_modules]
+
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) / 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='cons3rt CLI start up benchmark')
+    parser.add_argument('--runs', help='Number of runs per command', required=False, type=int, default=20)
+    parser.add_argument('--limit_ms', help='Maximum median time in milliseconds', required=False, type=float,
+                        default=100.0)
+    args = parser.parse_args()
+
+    # Baseline for an empty interpreter on this machine
+    baseline = median([time_interpreter() for _ in range(args.runs)])
+    print('{n:<20}{m:>10.1f} ms'.format(n='python (baseline)', m=baseline))
+
+    failed = False
+    for name, cli_args, stdin_data in commands:
+        times = [time_command(cli_args=cli_args, stdin_data=stdin_data) for _ in range(args.runs)]
+        result = median(times)
+        loaded = get_loaded_heavy_modules(cli_args=cli_args)
+        status = 'OK'
+        if result > args.limit_ms:
+            status = 'SLOW'
+            failed = True
+        if loaded:
+            status = 'LOADED: {m}'.format(m=', '.join(loaded))
+            failed = True
+        print('{n:<20}{m:>10.1f} ms  (min {f:.1f}, max {x:.1f})  {s}'.format(
+            n=name, m=result, f=min(times), x=max(times), s=status))
+    if failed:
+        print('Start up exceeded {t} ms or loaded heavy modules'.format(t=args.limit_ms))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())